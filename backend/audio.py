@@ -0,0 +1,31 @@
+"""Telephony audio as carried by Twilio Media Streams.
+
+Call audio is 8 kHz, 8-bit G.711 μ-law, mono, sent in 20 ms frames of
+160 bytes. In μ-law, 0xFF encodes zero amplitude, so it is the byte of
+silence.
+"""
+
+from typing import Iterator
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000
+MULAW_SILENCE = 0xFF
+SILENT_FRAME = bytes([MULAW_SILENCE]) * FRAME_BYTES
+
+
+def duration(audio_bytes: int) -> float:
+    """Seconds of μ-law audio in a number of bytes."""
+    return audio_bytes / SAMPLE_RATE
+
+
+def frames(audio: bytes) -> Iterator[bytes]:
+    """Split μ-law audio into frames, padding the last with silence."""
+    for start in range(0, len(audio), FRAME_BYTES):
+        frame = audio[start:start + FRAME_BYTES]
+        yield frame + SILENT_FRAME[len(frame):]
+
+
+def is_silent(frame: bytes) -> bool:
+    """Whether a μ-law frame holds only silence."""
+    return not frame.strip(b"\xff")
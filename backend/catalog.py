@@ -0,0 +1,114 @@
+"""Provider, model and voice catalog plus pre-encoded static JSON responses."""
+
+import gzip
+import hashlib
+from typing import Dict, List, Tuple
+from fastapi import Request, Response, status
+from .models.voice_assistant import ModelProvider, ModelName, ElevenLabsVoice
+
+
+# Display information for the enums in models/voice_assistant.py
+PROVIDER_NAMES: Dict[ModelProvider, str] = {
+    ModelProvider.OPENAI: "OpenAI",
+    ModelProvider.ANTHROPIC: "Anthropic",
+    ModelProvider.GOOGLE: "Google",
+    ModelProvider.GROQ: "Groq",
+}
+
+# model -> (provider, display name, description)
+MODEL_INFO: Dict[ModelName, Tuple[ModelProvider, str, str]] = {
+    ModelName.GPT_4O: (ModelProvider.OPENAI, "GPT-4o", "Most capable model"),
+    ModelName.GPT_4O_MINI: (ModelProvider.OPENAI, "GPT-4o Mini", "Fast and efficient"),
+    ModelName.GPT_4_TURBO: (ModelProvider.OPENAI, "GPT-4 Turbo", "High performance"),
+    ModelName.CLAUDE_3_5_SONNET: (ModelProvider.ANTHROPIC, "Claude 3.5 Sonnet", "Best balance"),
+    ModelName.CLAUDE_3_OPUS: (ModelProvider.ANTHROPIC, "Claude 3 Opus", "Most powerful"),
+    ModelName.CLAUDE_3_HAIKU: (ModelProvider.ANTHROPIC, "Claude 3 Haiku", "Fastest"),
+    ModelName.GEMINI_PRO: (ModelProvider.GOOGLE, "Gemini Pro", "General purpose"),
+    ModelName.GEMINI_PRO_VISION: (ModelProvider.GOOGLE, "Gemini Pro Vision", "Multimodal"),
+    ModelName.LLAMA_3_70B: (ModelProvider.GROQ, "Llama 3 70B", "Open source powerhouse"),
+    ModelName.MIXTRAL_8X7B: (ModelProvider.GROQ, "Mixtral 8x7B", "Fast MoE model"),
+}
+
+# voice -> (gender, accent)
+VOICE_INFO: Dict[ElevenLabsVoice, Tuple[str, str]] = {
+    ElevenLabsVoice.RACHEL: ("female", "American"),
+    ElevenLabsVoice.DOMI: ("female", "American"),
+    ElevenLabsVoice.BELLA: ("female", "American"),
+    ElevenLabsVoice.ANTONI: ("male", "American"),
+    ElevenLabsVoice.ELLI: ("female", "American"),
+    ElevenLabsVoice.JOSH: ("male", "American"),
+    ElevenLabsVoice.ARNOLD: ("male", "American"),
+    ElevenLabsVoice.ADAM: ("male", "American"),
+    ElevenLabsVoice.SAM: ("male", "American"),
+    ElevenLabsVoice.NICOLE: ("female", "American"),
+    ElevenLabsVoice.GLINDA: ("female", "American"),
+    ElevenLabsVoice.CLYDE: ("male", "American"),
+    ElevenLabsVoice.PAUL: ("male", "American"),
+    ElevenLabsVoice.CALLUM: ("male", "British"),
+    ElevenLabsVoice.CHARLOTTE: ("female", "British"),
+    ElevenLabsVoice.MATILDA: ("female", "Australian"),
+    ElevenLabsVoice.LILY: ("female", "British"),
+}
+
+
+def get_providers() -> List[dict]:
+    """Get all providers with their models, in enum order."""
+    return [
+        {
+            "id": provider.value,
+            "name": PROVIDER_NAMES[provider],
+            "models": [
+                {"id": model.value, "name": name, "description": description}
+                for model, (model_provider, name, description) in MODEL_INFO.items()
+                if model_provider == provider
+            ],
+        }
+        for provider in ModelProvider
+    ]
+
+
+def get_voices(include_accent: bool = True) -> List[dict]:
+    """Get all voices, in enum order."""
+    voices = []
+    for voice in ElevenLabsVoice:
+        gender, accent = VOICE_INFO[voice]
+        entry = {"id": voice.value, "name": voice.value.title(), "gender": gender}
+        if include_accent:
+            entry["accent"] = accent
+        voices.append(entry)
+    return voices
+
+
+class StaticJSON:
+    """A JSON document encoded once, with a gzip variant and strong ETags.
+
+    Requests with a matching `If-None-Match` get an empty 304.
+    """
+
+    def __init__(self, content: bytes):
+        self.body = content
+        self.gzip_body = gzip.compress(content, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+    def _matches(self, if_none_match: str) -> bool:
+        """Check an If-None-Match header against both representations."""
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags or self.gzip_etag in tags
+
+    def response(self, request: Request) -> Response:
+        """Build the response for a request, honouring ETags and gzip."""
+        use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+        headers = {
+            "ETag": self.gzip_etag if use_gzip else self.etag,
+            "Cache-Control": "public, no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self._matches(if_none_match):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=self.gzip_body, media_type="application/json", headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
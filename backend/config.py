@@ -1,7 +1,7 @@
 """Configuration settings for the Voice AI SaaS backend."""
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -11,13 +11,36 @@ class Settings(BaseSettings):
     app_name: str = "Voice AI SaaS"
     debug: bool = True
     api_v1_prefix: str = "/api/v1"
+    admin_token: Optional[str] = None  # Mounts the /admin routes, for requests sending it as X-Admin-Token
     
     # CORS
     cors_origins: list[str] = ["http://localhost:3000", "http://localhost:3001"]
     
+    # Database
+    database_backend: Literal["memory", "sqlite"] = "memory"
+    database_path: str = "voice_ai.db"
+    database_busy_timeout: float = 1.0  # Seconds a SQLite write waits for another worker's lock; blocks the event loop meanwhile
+    journal_dir: Optional[str] = None  # Enables crash recovery for the memory backend
+    journal_snapshot_interval: int = 100_000
+    journal_fsync: bool = False
+    
     # Twilio Configuration
     twilio_account_sid: Optional[str] = None
     twilio_auth_token: Optional[str] = None
+    twilio_api_base_url: Optional[str] = None  # e.g. the local fake: python -m tools.fake_twilio
+    twilio_max_concurrency: int = 8  # Concurrent Twilio API calls
+    twilio_timeout_seconds: float = 10.0
+    twilio_search_cache_ttl_seconds: float = 30.0
+    twilio_search_cache_stale_seconds: float = 120.0  # Served while refreshing
+    twilio_search_cache_max_entries: int = 256
+    twilio_search_budget_seconds: float = 3.0  # Latency budget per search request
+    twilio_breaker_failure_rate: float = 0.5
+    twilio_breaker_slow_call_seconds: float = 3.0
+    twilio_breaker_slow_call_rate: float = 0.8
+    twilio_breaker_window_size: int = 20
+    twilio_breaker_min_calls: int = 5
+    twilio_breaker_open_seconds: float = 30.0
+    public_base_url: Optional[str] = None  # e.g. https://api.example.com, as Twilio reaches us; taken from requests if unset
     
     # ElevenLabs Configuration
     elevenlabs_api_key: Optional[str] = None
@@ -26,6 +49,30 @@ class Settings(BaseSettings):
     upload_dir: str = "uploads"
     max_file_size_mb: int = 50
     allowed_file_types: list[str] = [".pdf", ".csv", ".txt", ".docx", ".doc"]
+    upload_chunk_size: int = 1024 * 1024  # Bytes read per chunk when streaming uploads to disk
+    upload_concurrency: int = 4  # Files of one upload request written at once
+    upload_session_chunk_size: int = 8 * 1024 * 1024  # Default chunk size of resumable uploads
+    upload_session_ttl_hours: int = 24  # Resumable uploads without new chunks are removed after this
+    
+    # Knowledge Base Ingestion
+    ingestion_workers: int = 2  # Processes extracting document text
+    ingestion_chunk_size: int = 1000  # Characters per text chunk
+    ingestion_chunk_overlap: int = 150  # Characters repeated from the previous chunk
+    
+    # Knowledge Base Search
+    embedding_provider: str = "hashing"  # See backend.embeddings.EMBEDDERS
+    embedding_dim: int = 256
+    vector_ivf_min_chunks: int = 20000  # Businesses with more chunks get an approximate (IVF) vector index
+    search_max_segments: int = 8  # Index segments per business before they are merged
+    vector_nprobe: int = 32  # IVF lists scanned per query; higher is slower but finds more true neighbors
+    dedup_threshold: float = 0.8  # Estimated word-trigram Jaccard similarity at which chunks are indexed once
+    
+    # Voice Calls
+    call_stt_provider: str = "fake"  # See backend.voice_providers.STT_PROVIDERS
+    call_llm_provider: Optional[str] = "fake"  # See backend.voice_providers.LLM_PROVIDERS; None uses each assistant's model_provider
+    call_tts_provider: str = "fake"  # See backend.voice_providers.TTS_PROVIDERS
+    call_metrics_window: int = 10000  # Latest latency samples per metric kept for percentiles
+    speech_cache_max_mb: int = 64  # Pre-synthesized greetings and goodbyes kept in memory, as 8 kHz μ-law
     
     class Config:
         env_file = ".env"
@@ -1,19 +1,135 @@
 """In-memory database for development. Replace with actual database in production."""
 
-from typing import Dict, List, Optional
-from datetime import datetime
+import logging
+import time
+from itertools import dropwhile, islice
+from typing import Dict, Iterable, List, Optional
 import uuid
+from .config import settings
+from .records import (
+    BusinessRecord,
+    KnowledgeBaseFileRecord,
+    PhoneNumberRecord,
+    VoiceAssistantRecord,
+    new_id,
+    now_micros,
+    format_timestamp,
+    format_id,
+    parse_id,
+    normalize_phone_number,
+)
+from .pagination import Page, InvalidCursorError, encode_cursor, decode_cursor
+from .journal import (
+    Journal,
+    OP_PUT_BUSINESS,
+    OP_DELETE_BUSINESS,
+    OP_PUT_CHILD,
+    OP_DELETE_CHILD,
+    OP_PUT_SESSION,
+)
+
+logger = logging.getLogger(__name__)
+
+# Tables holding per-business child records, removed on cascade delete
+CHILD_TABLES = ("knowledge_bases", "phone_numbers", "voice_assistants")
 
 
 class InMemoryDB:
     """Simple in-memory storage for development purposes."""
     
     def __init__(self):
-        self.businesses: Dict[str, dict] = {}
-        self.knowledge_bases: Dict[str, List[dict]] = {}
-        self.phone_numbers: Dict[str, List[dict]] = {}  # Changed to List for multiple numbers
-        self.voice_assistants: Dict[str, List[dict]] = {}  # Changed to List for multiple assistants
+        # Records are compact slotted objects (see records.py) keyed by the
+        # 16-byte form of their UUID; methods return them as plain dicts.
+        self.businesses: Dict[bytes, BusinessRecord] = {}
+        # Child records are keyed by business ID, then by record ID. Dicts keep
+        # insertion order, so listings are stable while lookups, updates and
+        # deletes by ID stay O(1).
+        self.knowledge_bases: Dict[bytes, Dict[bytes, KnowledgeBaseFileRecord]] = {}
+        self.phone_numbers: Dict[bytes, Dict[bytes, PhoneNumberRecord]] = {}
+        self.voice_assistants: Dict[bytes, Dict[bytes, VoiceAssistantRecord]] = {}
         self.onboarding_sessions: Dict[str, dict] = {}
+        self.journal: Optional[Journal] = None
+        # Inbound call routing, so answering a call needs no scan of all
+        # businesses. Derived from the tables above, so it is rebuilt on
+        # restore rather than journaled.
+        self.call_routes: Dict[str, Dict[bytes, bytes]] = {}  # Phone number -> {phone number ID: business ID}, oldest first
+        self.phone_assistants: Dict[bytes, Dict[bytes, None]] = {}  # Phone number ID -> linked assistant IDs
+        # Last `seq` given to a record; records are listed and paged in seq order
+        self.last_seq = 0
+    
+    # Journal operations
+    def restore(self, journal: Journal) -> None:
+        """Load state from a journal's snapshot and tail, then log all further mutations to it."""
+        start = time.perf_counter()
+        state = journal.read_snapshot()
+        if state:
+            for name, table in state.items():
+                setattr(self, name, table)
+        for entry in journal.read_tail():
+            self._apply(entry)
+        self._rebuild_call_routes()
+        self.last_seq = max(
+            (record.seq for records in self._all_records() for record in records),
+            default=0,
+        )
+        logger.info(
+            f"Restored {len(self.businesses)} businesses from {journal.directory} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        self.journal = journal
+        if journal.snapshot_due:
+            journal.write_snapshot(self._state())
+    
+    def _state(self) -> dict:
+        """Get copies of all tables for snapshotting.
+        
+        Only the dicts are copied, not the records, so this takes a fraction
+        of the time of the dump that then runs in the background.
+        """
+        return {
+            "businesses": dict(self.businesses),
+            "knowledge_bases": {key: dict(children) for key, children in self.knowledge_bases.items()},
+            "phone_numbers": {key: dict(children) for key, children in self.phone_numbers.items()},
+            "voice_assistants": {key: dict(children) for key, children in self.voice_assistants.items()},
+            # Sessions are plain dicts updated in place, so they are copied too
+            "onboarding_sessions": {key: dict(session) for key, session in self.onboarding_sessions.items()},
+        }
+    
+    def _apply(self, entry: tuple) -> None:
+        """Apply a journal entry to the in-memory tables."""
+        op = entry[0]
+        if op == OP_PUT_BUSINESS:
+            self.businesses[entry[1].id] = entry[1]
+        elif op == OP_DELETE_BUSINESS:
+            self._delete_business(entry[1])
+        elif op == OP_PUT_CHILD:
+            _, table, business_id, record = entry
+            getattr(self, table).setdefault(business_id, {})[record.id] = record
+        elif op == OP_DELETE_CHILD:
+            _, table, business_id, record_id = entry
+            getattr(self, table).get(business_id, {}).pop(record_id, None)
+        elif op == OP_PUT_SESSION:
+            self.onboarding_sessions[entry[1]["id"]] = entry[1]
+    
+    def _all_records(self) -> Iterable[Iterable]:
+        """Iterate over the records of every table, one iterable per business and table."""
+        yield self.businesses.values()
+        for table in CHILD_TABLES:
+            for children in getattr(self, table).values():
+                yield children.values()
+    
+    def _next_seq(self) -> int:
+        """Get the `seq` for a new record."""
+        self.last_seq += 1
+        return self.last_seq
+    
+    def _log(self, *entry) -> None:
+        """Record a mutation in the journal, compacting it in the background when due."""
+        if self.journal is None:
+            return
+        self.journal.append(entry)
+        if self.journal.snapshot_due and not self.journal.snapshot_running:
+            self.journal.start_snapshot(self._state())
     
     def generate_id(self) -> str:
         """Generate a unique ID."""
@@ -22,109 +138,189 @@ class InMemoryDB:
     # Business operations
     def create_business(self, data: dict) -> dict:
         """Create a new business record."""
-        business_id = self.generate_id()
-        business = {
-            "id": business_id,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-            **data
-        }
-        self.businesses[business_id] = business
-        return business
+        now = now_micros()
+        business = BusinessRecord(id=new_id(), created_at=now, updated_at=now, seq=self._next_seq(), **data)
+        self.businesses[business.id] = business
+        self._log(OP_PUT_BUSINESS, business)
+        return business.to_dict()
     
     def get_business(self, business_id: str) -> Optional[dict]:
         """Get a business by ID."""
-        return self.businesses.get(business_id)
+        business = self.businesses.get(parse_id(business_id))
+        return business.to_dict() if business else None
     
     def get_all_businesses(self) -> List[dict]:
         """Get all businesses."""
-        return list(self.businesses.values())
+        return [b.to_dict() for b in self.businesses.values()]
+    
+    def list_businesses(self, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of businesses."""
+        return self._page(self.businesses.values(), filters, cursor, limit)
     
     def update_business(self, business_id: str, data: dict) -> Optional[dict]:
         """Update a business record."""
-        if business_id in self.businesses:
-            self.businesses[business_id].update(data)
-            self.businesses[business_id]["updated_at"] = datetime.utcnow().isoformat()
-            return self.businesses[business_id]
-        return None
+        business = self.businesses.get(parse_id(business_id))
+        if business is None:
+            return None
+        for key, value in data.items():
+            setattr(business, key, value)
+        business.updated_at = now_micros()
+        self._log(OP_PUT_BUSINESS, business)
+        return business.to_dict()
     
     def delete_business(self, business_id: str) -> bool:
         """Delete a business and all associated data (cascade delete)."""
-        if business_id not in self.businesses:
+        key = parse_id(business_id)
+        if key not in self.businesses:
             return False
         
-        # Delete all associated data
-        if business_id in self.knowledge_bases:
-            del self.knowledge_bases[business_id]
-        
-        if business_id in self.phone_numbers:
-            del self.phone_numbers[business_id]
+        self._delete_business(key)
+        self._log(OP_DELETE_BUSINESS, key)
+        return True
+    
+    def _delete_business(self, key: bytes) -> None:
+        """Remove a business and its child records from the tables."""
+        for phone in self.phone_numbers.get(key, {}).values():
+            self._unroute_phone_number(phone)
+        for table in CHILD_TABLES:
+            getattr(self, table).pop(key, None)
+        self.businesses.pop(key, None)
+    
+    # Paged listings
+    def _page(self, records: Iterable, filters: Optional[dict], cursor: Optional[str], limit: Optional[int]) -> Page:
+        """Get a page of records matching `filters`, converted to dicts.
         
-        if business_id in self.voice_assistants:
-            del self.voice_assistants[business_id]
+        `records` are in insertion order, so in `seq` order. The cursor holds
+        the `seq` of the last record of the previous page, and the next page
+        starts after it even if that record has been deleted meanwhile.
+        """
+        items = iter(records)
+        if cursor:
+            try:
+                (after_seq,) = decode_cursor(cursor)
+                if not isinstance(after_seq, int) or after_seq < 0:
+                    raise ValueError(f"Invalid seq {after_seq!r}")
+            except (ValueError, TypeError) as e:
+                raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+            items = dropwhile(lambda r: r.seq <= after_seq, items)
+        if filters:
+            items = (r for r in items if all(getattr(r, k) == v for k, v in filters.items()))
         
-        # Delete the business itself
-        del self.businesses[business_id]
+        if limit is None:
+            return [r.to_dict() for r in items], None
+        page = list(islice(items, limit + 1))
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(page[-1].seq)
+        return [r.to_dict() for r in page], next_cursor
+    
+    # Child record helpers
+    def _get_child(self, table: str, business_id: str, record_id: str):
+        """Get a child record by business and record ID."""
+        children = getattr(self, table).get(parse_id(business_id))
+        return children.get(parse_id(record_id)) if children else None
+    
+    def _list_children(self, table: str, business_id: str) -> List[dict]:
+        """Get all child records of a business as dicts, in insertion order."""
+        children = getattr(self, table).get(parse_id(business_id))
+        return [r.to_dict() for r in children.values()] if children else []
+    
+    def _page_children(self, table: str, business_id: str, filters: Optional[dict], cursor: Optional[str], limit: Optional[int]) -> Page:
+        """Get a page of child records of a business."""
+        children = getattr(self, table).get(parse_id(business_id), {})
+        return self._page(children.values(), filters, cursor, limit)
+    
+    def _first_child(self, table: str, business_id: str) -> Optional[dict]:
+        """Get the oldest child record of a business."""
+        children = getattr(self, table).get(parse_id(business_id))
+        return next(iter(children.values())).to_dict() if children else None
+    
+    def _add_child(self, table: str, record) -> dict:
+        """Store a new child record."""
+        getattr(self, table).setdefault(record.business_id, {})[record.id] = record
+        self._log(OP_PUT_CHILD, table, record.business_id, record)
+        return record.to_dict()
+    
+    def _delete_child(self, table: str, business_id: str, record_id: str) -> bool:
+        """Delete a child record by business and record ID."""
+        business_key, record_key = parse_id(business_id), parse_id(record_id)
+        if getattr(self, table).get(business_key, {}).pop(record_key, None) is None:
+            return False
+        self._log(OP_DELETE_CHILD, table, business_key, record_key)
         return True
     
     # Knowledge base operations
     def add_knowledge_base_file(self, business_id: str, file_data: dict) -> dict:
         """Add a file to a business's knowledge base."""
-        if business_id not in self.knowledge_bases:
-            self.knowledge_bases[business_id] = []
-        
-        file_record = {
-            "id": self.generate_id(),
-            "business_id": business_id,
-            "uploaded_at": datetime.utcnow().isoformat(),
+        file_record = KnowledgeBaseFileRecord(
+            id=new_id(),
+            business_id=parse_id(business_id),
+            uploaded_at=now_micros(),
+            seq=self._next_seq(),
             **file_data
-        }
-        self.knowledge_bases[business_id].append(file_record)
-        return file_record
+        )
+        return self._add_child("knowledge_bases", file_record)
     
     def get_knowledge_base_files(self, business_id: str) -> List[dict]:
         """Get all files for a business's knowledge base."""
-        return self.knowledge_bases.get(business_id, [])
+        return self._list_children("knowledge_bases", business_id)
+    
+    def list_knowledge_base_files(self, business_id: str, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of files in a business's knowledge base."""
+        return self._page_children("knowledge_bases", business_id, filters, cursor, limit)
+    
+    def get_knowledge_base_file_by_id(self, business_id: str, file_id: str) -> Optional[dict]:
+        """Get a specific knowledge base file by ID."""
+        file_record = self._get_child("knowledge_bases", business_id, file_id)
+        return file_record.to_dict() if file_record else None
+    
+    def update_knowledge_base_file(self, business_id: str, file_id: str, data: dict) -> Optional[dict]:
+        """Update a knowledge base file record."""
+        file_record = self._get_child("knowledge_bases", business_id, file_id)
+        if file_record is None:
+            return None
+        for key, value in data.items():
+            setattr(file_record, key, value)
+        self._log(OP_PUT_CHILD, "knowledge_bases", file_record.business_id, file_record)
+        return file_record.to_dict()
     
     def delete_knowledge_base_file(self, business_id: str, file_id: str) -> bool:
         """Delete a file from a business's knowledge base."""
-        if business_id in self.knowledge_bases:
-            files = self.knowledge_bases[business_id]
-            self.knowledge_bases[business_id] = [f for f in files if f["id"] != file_id]
-            return True
-        return False
+        return self._delete_child("knowledge_bases", business_id, file_id)
     
     # Phone number operations - Updated to support multiple numbers
     def add_phone_number(self, business_id: str, phone_data: dict) -> dict:
         """Add a phone number to a business."""
-        if business_id not in self.phone_numbers:
-            self.phone_numbers[business_id] = []
-        
-        phone_record = {
-            "id": self.generate_id(),
-            "business_id": business_id,
-            "purchased_at": datetime.utcnow().isoformat(),
+        phone_record = PhoneNumberRecord(
+            id=new_id(),
+            business_id=parse_id(business_id),
+            purchased_at=now_micros(),
+            seq=self._next_seq(),
             **phone_data
-        }
-        self.phone_numbers[business_id].append(phone_record)
-        return phone_record
+        )
+        self._route_phone_number(phone_record)
+        return self._add_child("phone_numbers", phone_record)
     
     def get_phone_numbers(self, business_id: str) -> List[dict]:
         """Get all phone numbers for a business."""
-        return self.phone_numbers.get(business_id, [])
+        return self._list_children("phone_numbers", business_id)
+    
+    def list_phone_numbers(self, business_id: str, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of phone numbers for a business."""
+        return self._page_children("phone_numbers", business_id, filters, cursor, limit)
     
     def get_phone_number_by_id(self, business_id: str, phone_id: str) -> Optional[dict]:
         """Get a specific phone number by ID."""
-        numbers = self.phone_numbers.get(business_id, [])
-        return next((n for n in numbers if n["id"] == phone_id), None)
+        phone = self._get_child("phone_numbers", business_id, phone_id)
+        return phone.to_dict() if phone else None
     
     def delete_phone_number(self, business_id: str, phone_id: str) -> bool:
         """Delete a phone number from a business."""
-        if business_id in self.phone_numbers:
-            numbers = self.phone_numbers[business_id]
-            self.phone_numbers[business_id] = [n for n in numbers if n["id"] != phone_id]
-            return True
-        return False
+        phone = self._get_child("phone_numbers", business_id, phone_id)
+        if phone is not None:
+            self._unroute_phone_number(phone)
+        return self._delete_child("phone_numbers", business_id, phone_id)
     
     # Legacy method for backward compatibility
     def assign_phone_number(self, business_id: str, phone_data: dict) -> dict:
@@ -133,57 +329,134 @@ class InMemoryDB:
     
     def get_phone_number(self, business_id: str) -> Optional[dict]:
         """Get the first phone number for a business (legacy compatibility)."""
-        numbers = self.get_phone_numbers(business_id)
-        return numbers[0] if numbers else None
+        return self._first_child("phone_numbers", business_id)
     
     # Voice assistant operations - Updated to support multiple assistants
     def create_voice_assistant(self, business_id: str, assistant_data: dict) -> dict:
         """Create a voice assistant for a business."""
-        if business_id not in self.voice_assistants:
-            self.voice_assistants[business_id] = []
-        
-        assistant = {
-            "id": self.generate_id(),
-            "business_id": business_id,
-            "phone_number_id": assistant_data.get("phone_number_id"),  # Link to inbound phone number
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-            **assistant_data
-        }
-        self.voice_assistants[business_id].append(assistant)
-        return assistant
+        now = now_micros()
+        assistant = VoiceAssistantRecord(
+            id=new_id(),
+            business_id=parse_id(business_id),
+            created_at=now,
+            updated_at=now,
+            seq=self._next_seq(),
+            **{
+                **assistant_data,
+                # Link to inbound phone number
+                "phone_number_id": parse_id(assistant_data.get("phone_number_id")),
+            }
+        )
+        self._link_assistant(assistant)
+        return self._add_child("voice_assistants", assistant)
     
     def get_voice_assistants(self, business_id: str) -> List[dict]:
         """Get all voice assistants for a business."""
-        return self.voice_assistants.get(business_id, [])
+        return self._list_children("voice_assistants", business_id)
+    
+    def list_voice_assistants(self, business_id: str, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of voice assistants for a business."""
+        return self._page_children("voice_assistants", business_id, filters, cursor, limit)
     
     def get_voice_assistant_by_id(self, business_id: str, assistant_id: str) -> Optional[dict]:
         """Get a specific voice assistant by ID."""
-        assistants = self.voice_assistants.get(business_id, [])
-        return next((a for a in assistants if a["id"] == assistant_id), None)
+        assistant = self._get_child("voice_assistants", business_id, assistant_id)
+        return assistant.to_dict() if assistant else None
     
     def get_voice_assistant(self, business_id: str) -> Optional[dict]:
         """Get the first voice assistant for a business (legacy compatibility)."""
-        assistants = self.get_voice_assistants(business_id)
-        return assistants[0] if assistants else None
+        return self._first_child("voice_assistants", business_id)
     
     def update_voice_assistant(self, business_id: str, assistant_id: str, data: dict) -> Optional[dict]:
         """Update a specific voice assistant."""
-        if business_id in self.voice_assistants:
-            for i, assistant in enumerate(self.voice_assistants[business_id]):
-                if assistant["id"] == assistant_id:
-                    self.voice_assistants[business_id][i].update(data)
-                    self.voice_assistants[business_id][i]["updated_at"] = datetime.utcnow().isoformat()
-                    return self.voice_assistants[business_id][i]
-        return None
+        assistant = self._get_child("voice_assistants", business_id, assistant_id)
+        if assistant is None:
+            return None
+        relink = "phone_number_id" in data and parse_id(data["phone_number_id"]) != assistant.phone_number_id
+        if relink:
+            self._unlink_assistant(assistant)
+        for key, value in data.items():
+            if key == "phone_number_id":
+                value = parse_id(value)
+            setattr(assistant, key, value)
+        if relink:
+            self._link_assistant(assistant)
+        assistant.updated_at = now_micros()
+        self._log(OP_PUT_CHILD, "voice_assistants", assistant.business_id, assistant)
+        return assistant.to_dict()
     
     def delete_voice_assistant(self, business_id: str, assistant_id: str) -> bool:
         """Delete a voice assistant from a business."""
-        if business_id in self.voice_assistants:
+        assistant = self._get_child("voice_assistants", business_id, assistant_id)
+        if assistant is not None:
+            self._unlink_assistant(assistant)
+        return self._delete_child("voice_assistants", business_id, assistant_id)
+    
+    # Inbound call routing
+    def _route_phone_number(self, phone: PhoneNumberRecord) -> None:
+        """Route calls to a phone number to its business."""
+        self.call_routes.setdefault(normalize_phone_number(phone.phone_number), {})[phone.id] = phone.business_id
+    
+    def _unroute_phone_number(self, phone: PhoneNumberRecord) -> None:
+        """Stop routing calls to a deleted phone number.
+        
+        Other records of the same number keep it routed.
+        """
+        number = normalize_phone_number(phone.phone_number)
+        routes = self.call_routes.get(number)
+        if routes is not None:
+            routes.pop(phone.id, None)
+            if not routes:
+                del self.call_routes[number]
+        self.phone_assistants.pop(phone.id, None)
+    
+    def _link_assistant(self, assistant: VoiceAssistantRecord) -> None:
+        """Let an assistant answer calls to its phone number."""
+        if assistant.phone_number_id is not None:
+            self.phone_assistants.setdefault(assistant.phone_number_id, {})[assistant.id] = None
+    
+    def _unlink_assistant(self, assistant: VoiceAssistantRecord) -> None:
+        """Stop an assistant answering calls to its phone number."""
+        linked = self.phone_assistants.get(assistant.phone_number_id)
+        if linked is not None:
+            linked.pop(assistant.id, None)
+            if not linked:
+                del self.phone_assistants[assistant.phone_number_id]
+    
+    def _rebuild_call_routes(self) -> None:
+        """Rebuild call routing from the phone number and assistant tables."""
+        self.call_routes, self.phone_assistants = {}, {}
+        phones = (phone for phones in self.phone_numbers.values() for phone in phones.values())
+        for phone in sorted(phones, key=lambda phone: phone.seq):
+            self._route_phone_number(phone)
+        for assistants in self.voice_assistants.values():
+            for assistant in assistants.values():
+                # Only numbers of the assistant's own business can be linked
+                if assistant.phone_number_id in self.phone_numbers.get(assistant.business_id, {}):
+                    self._link_assistant(assistant)
+    
+    def get_call_route(self, phone_number: str) -> Optional[dict]:
+        """Find the business and voice assistant answering calls to a phone number.
+        
+        Returns None for unknown numbers, and an `assistant` of None for
+        numbers no assistant is linked to. If several businesses have the
+        number, the one that added it last answers, and if several
+        assistants share it, the oldest, as in SQLiteDB.
+        """
+        routes = self.call_routes.get(normalize_phone_number(phone_number))
+        if not routes:
+            return None
+        phone_id, business_id = next(reversed(routes.items()))
+        assistant = None
+        linked = self.phone_assistants.get(phone_id)
+        if linked:
             assistants = self.voice_assistants[business_id]
-            self.voice_assistants[business_id] = [a for a in assistants if a["id"] != assistant_id]
-            return True
-        return False
+            assistant = min((assistants[key] for key in linked), key=lambda record: record.seq).to_dict()
+        return {
+            "business_id": format_id(business_id),
+            "phone_number_id": format_id(phone_id),
+            "assistant": assistant,
+        }
     
     # Onboarding session operations
     def create_onboarding_session(self) -> dict:
@@ -191,12 +464,13 @@ class InMemoryDB:
         session_id = self.generate_id()
         session = {
             "id": session_id,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": format_timestamp(now_micros()),
             "current_step": 1,
             "business_id": None,
             "completed": False
         }
         self.onboarding_sessions[session_id] = session
+        self._log(OP_PUT_SESSION, session)
         return session
     
     def get_onboarding_session(self, session_id: str) -> Optional[dict]:
@@ -207,9 +481,25 @@ class InMemoryDB:
         """Update an onboarding session."""
         if session_id in self.onboarding_sessions:
             self.onboarding_sessions[session_id].update(data)
+            self._log(OP_PUT_SESSION, self.onboarding_sessions[session_id])
             return self.onboarding_sessions[session_id]
         return None
 
 
+def create_database():
+    """Create the database backend selected in settings."""
+    if settings.database_backend == "sqlite":
+        from .sqlite_database import SQLiteDB
+        return SQLiteDB(settings.database_path, settings.database_busy_timeout)
+    database = InMemoryDB()
+    if settings.journal_dir:
+        database.restore(Journal(
+            settings.journal_dir,
+            snapshot_interval=settings.journal_snapshot_interval,
+            fsync=settings.journal_fsync,
+        ))
+    return database
+
+
 # Global database instance
-db = InMemoryDB()
+db = create_database()
@@ -0,0 +1,101 @@
+"""MinHash signatures and LSH for finding near-duplicate text chunks.
+
+A chunk's shingles are its word trigrams. Its MinHash signature is the
+minimum of `NUM_PERM` random hash functions over them, and the share of
+equal positions in two signatures estimates the Jaccard similarity of
+their shingle sets. For LSH the signature is cut into `BANDS` bands;
+chunks sharing any band are candidate duplicates, which are confirmed by
+comparing their signatures.
+"""
+
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+from .extraction import tokenize
+
+NUM_PERM = 64
+BANDS = 16  # Of NUM_PERM // BANDS rows; candidates at 80% similarity are found with p > 0.999
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+_rng = np.random.default_rng(0x5EED)
+# Below 2^31, so `a * h + b` stays within 64 bits for 32-bit h
+_A = _rng.integers(1, 1 << 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 1 << 63, BANDS, dtype=np.uint64) | np.uint64(1)
+
+
+def _shingles(text: str) -> np.ndarray:
+    """Hash the word trigrams of a text to 32-bit values."""
+    hashes = np.array([zlib.crc32(word.encode()) for word in tokenize(text)], dtype=np.uint64)
+    if len(hashes) < 3:
+        return hashes
+    # Combine three word hashes; the multipliers keep word order significant
+    return (hashes[:-2] * np.uint64(0x9E3779B1) + hashes[1:-1] * np.uint64(0x85EBCA77) + hashes[2:]) & MAX_HASH
+
+
+def minhash(texts: List[str], batch_size: int = 512) -> np.ndarray:
+    """Get the `(len(texts), NUM_PERM)` uint32 MinHash signatures of texts.
+
+    Texts without words get all-maximum signatures, so they only match
+    each other.
+    """
+    signatures = np.full((len(texts), NUM_PERM), 0xFFFFFFFF, dtype=np.uint32)
+    for start in range(0, len(texts), batch_size):
+        shingles = [_shingles(text) for text in texts[start:start + batch_size]]
+        lengths = np.array([len(s) for s in shingles])
+        if not lengths.any():
+            continue
+        values = (_A[:, np.newaxis] * np.concatenate(shingles) + _B[:, np.newaxis]) % np.uint64(MERSENNE_PRIME)
+        values &= MAX_HASH
+        # Minimum per text over its run of columns
+        rows = np.flatnonzero(lengths)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])[rows]
+        signatures[start + rows] = np.minimum.reduceat(values, offsets, axis=1).T
+    return signatures
+
+
+def band_keys(signatures: np.ndarray) -> np.ndarray:
+    """Hash each band of each signature to a uint64 key, as an `(n, BANDS)` array."""
+    rows = NUM_PERM // BANDS
+    bands = signatures.reshape(len(signatures), BANDS, rows).astype(np.uint64)
+    keys = np.zeros((len(signatures), BANDS), dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for row in range(rows):
+            keys = keys * np.uint64(0x100000001B3) + bands[:, :, row]
+        return keys ^ _BAND_MIX
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.mean(a == b))
+
+
+class LSHTable:
+    """In-memory LSH table finding earlier near-duplicates of signatures."""
+    
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._buckets: Dict[int, List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+    
+    def find(self, signature: np.ndarray, keys: np.ndarray) -> Optional[int]:
+        """Get the most similar added item at or above the threshold, or None."""
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for key in keys.tolist():
+            for item in self._buckets.get(key, ()):
+                if item not in seen:
+                    seen.add(item)
+                    score = similarity(signature, self._signatures[item])
+                    if score >= best_similarity:
+                        best, best_similarity = item, score
+        return best
+    
+    def add(self, signature: np.ndarray, keys: np.ndarray) -> int:
+        """Add a signature and get its item number."""
+        item = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys.tolist():
+            self._buckets.setdefault(key, []).append(item)
+        return item
@@ -0,0 +1,112 @@
+"""Text embedders for semantic search over knowledge base chunks.
+
+An embedder turns texts into L2-normalized float32 vectors, so a dot
+product is their cosine similarity. Embedders are registered in
+`EMBEDDERS` by name and picked with `settings.embedding_provider`.
+"""
+
+import math
+import zlib
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+from .extraction import tokenize
+
+
+class Embedder:
+    """Base class for embedders."""
+    
+    name = ""
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as an `(len(texts), dim)` float32 matrix of unit rows."""
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic embedder hashing word and character n-gram features.
+    
+    Each word contributes itself and the character trigrams of `<word>`,
+    so inflections and compounds ("open"/"opening", "checkout"/"check out")
+    land close together. Each word pair contributes a bigram feature.
+    Features are hashed with CRC-32 into `dim` signed buckets. Needs no
+    model or network, so it is also what tests use.
+    """
+    
+    name = "hashing"
+    
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self._word_features: Dict[str, Tuple[List[int], List[float]]] = {}
+    
+    def _feature(self, feature: str) -> Tuple[int, float]:
+        """Hash a feature to a bucket and sign."""
+        h = zlib.crc32(feature.encode())
+        return h % self.dim, 1.0 if h & 0x80000000 else -1.0
+    
+    def _features_of_word(self, word: str) -> Tuple[List[int], List[float]]:
+        """Buckets and weights of a word's features, memoized."""
+        features = self._word_features.get(word)
+        if features is None:
+            padded = f"<{word}>"
+            trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+            hashed = [self._feature(f"w:{word}")] + [self._feature(t) for t in trigrams]
+            # Trigrams together outweigh the word, so shared stems count
+            weights = [1.0] + [2.0 / len(trigrams)] * len(trigrams)
+            features = ([bucket for bucket, _ in hashed], [sign * w for (_, sign), w in zip(hashed, weights)])
+            if len(self._word_features) < 500_000:
+                self._word_features[word] = features
+        return features
+    
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as an `(len(texts), dim)` float32 matrix of unit rows."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            if not words:
+                continue
+            buckets, weights = [], []
+            # Sublinear term frequency, so repeated words do not dominate
+            for word, count in Counter(words).items():
+                word_buckets, word_weights = self._features_of_word(word)
+                buckets += word_buckets
+                if count == 1:
+                    weights += word_weights
+                else:
+                    scale = 1.0 + math.log(count)
+                    weights += [w * scale for w in word_weights]
+            for a, b in zip(words, words[1:]):
+                bucket, sign = self._feature(f"b:{a} {b}")
+                buckets.append(bucket)
+                weights.append(sign * 0.5)
+            vectors[row] = np.bincount(buckets, weights, minlength=self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+}
+
+_embedders: Dict[Tuple[str, int], Embedder] = {}
+
+
+def get_embedder(provider: str, dim: int) -> Embedder:
+    """Get a shared embedder instance by provider name and dimension."""
+    embedder = _embedders.get((provider, dim))
+    if embedder is None:
+        try:
+            embedder_class = EMBEDDERS[provider]
+        except KeyError:
+            raise ValueError(f"Unknown embedding provider: {provider}") from None
+        embedder = _embedders[(provider, dim)] = embedder_class(dim)
+    return embedder
+
+
+def embed_texts(provider: str, dim: int, texts: List[str]) -> np.ndarray:
+    """Embed texts with a shared embedder; usable from worker processes."""
+    return get_embedder(provider, dim).embed(texts)
@@ -0,0 +1,256 @@
+"""Text extraction, normalization and chunking for knowledge base documents.
+
+Everything here is a plain function of its arguments, so it can run in
+worker processes.
+"""
+
+import csv
+import io
+import re
+import unicodedata
+import zipfile
+import zlib
+from typing import List, Tuple
+from xml.etree import ElementTree
+
+
+# Extraction
+def extract_txt(data: bytes) -> Tuple[str, int]:
+    """Decode a text file, as UTF-8 if possible."""
+    try:
+        return data.decode("utf-8-sig"), 1
+    except UnicodeDecodeError:
+        return data.decode("latin-1"), 1
+
+
+def extract_csv(data: bytes) -> Tuple[str, int]:
+    """Turn each CSV row into a line of `header: value` pairs."""
+    text, _ = extract_txt(data)
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return "", 1
+    header, lines = rows[0], []
+    for row in rows[1:]:
+        pairs = [f"{name}: {value}" for name, value in zip(header, row) if value.strip()]
+        if pairs:
+            lines.append("; ".join(pairs))
+    return "\n".join(lines) if lines else ", ".join(header), 1
+
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024  # Of word/document.xml
+
+
+def extract_docx(data: bytes) -> Tuple[str, int]:
+    """Get the paragraphs of a .docx document from its XML."""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive, archive.open("word/document.xml") as f:
+        # Capped, so a small compression bomb cannot exhaust the worker's memory
+        xml = f.read(DOCX_MAX_DECOMPRESSED_BYTES + 1)
+    if len(xml) > DOCX_MAX_DECOMPRESSED_BYTES:
+        raise ValueError(f"Document text is larger than {DOCX_MAX_DECOMPRESSED_BYTES} bytes")
+    paragraphs, pages = [], 1
+    for element in ElementTree.fromstring(xml).iter(f"{WORD_NS}p"):
+        parts = []
+        for node in element.iter():
+            if node.tag == f"{WORD_NS}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{WORD_NS}tab":
+                parts.append("\t")
+            elif node.tag == f"{WORD_NS}br":
+                if node.get(f"{WORD_NS}type") == "page":
+                    pages += 1
+                parts.append("\n")
+            elif node.tag == f"{WORD_NS}lastRenderedPageBreak":
+                pages += 1
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs), pages
+
+
+PDF_STREAM = re.compile(rb"stream\r?\n(.*?)\r?\n?endstream", re.DOTALL)
+PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+PDF_MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024  # Across all content streams of one PDF
+PDF_TEXT_BLOCK = re.compile(rb"BT(.*?)ET", re.DOTALL)
+PDF_TEXT_TOKEN = re.compile(
+    rb"\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|\[|\]|-?\d*\.?\d+|T\*|Tj|TJ|Td|TD|Tm|'|\""
+)
+PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _pdf_string(token: bytes) -> str:
+    """Decode a PDF literal `(...)` or hex `<...>` string."""
+    if token.startswith(b"<"):
+        digits = re.sub(rb"\s", b"", token[1:-1])
+        raw = bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode())
+        if raw.startswith(b"\xfe\xff") or (len(raw) >= 2 and raw[0] == 0):
+            return raw.decode("utf-16-be", errors="ignore")
+        return raw.decode("latin-1")
+    body, out, i = token[1:-1], bytearray(), 0
+    while i < len(body):
+        char = body[i:i + 1]
+        if char == b"\\" and i + 1 < len(body):
+            nxt = body[i + 1:i + 2]
+            if nxt in PDF_ESCAPES:
+                out += PDF_ESCAPES[nxt]
+                i += 2
+            elif nxt.isdigit():
+                octal = re.match(rb"[0-7]{1,3}", body[i + 1:i + 4]).group()
+                out.append(int(octal, 8) & 0xFF)
+                i += 1 + len(octal)
+            elif nxt in b"\r\n":
+                i += 2
+            else:
+                out += nxt
+                i += 2
+        else:
+            out += char
+            i += 1
+    return out.decode("latin-1")
+
+
+def _pdf_content_text(content: bytes) -> str:
+    """Get the text shown by the text operators of a content stream."""
+    lines = []
+    for block in PDF_TEXT_BLOCK.findall(content):
+        parts, operands = [], []
+        for token in PDF_TEXT_TOKEN.findall(block):
+            if token in (b"Tj", b"'", b'"'):
+                if token != b"Tj":
+                    parts.append("\n")
+                parts.extend(_pdf_string(t) for t in operands if t[:1] in b"(<")
+                operands = []
+            elif token == b"TJ":
+                for t in operands:
+                    if t[:1] in b"(<":
+                        parts.append(_pdf_string(t))
+                    elif t not in (b"[", b"]") and float(t) < -200:
+                        parts.append(" ")  # Large negative kerning separates words
+                operands = []
+            elif token in (b"T*", b"Td", b"TD", b"Tm"):
+                parts.append("\n")
+                operands = []
+            else:
+                operands.append(token)
+        lines.append("".join(parts))
+    return "\n".join(lines)
+
+
+def extract_pdf(data: bytes) -> Tuple[str, int]:
+    """Extract text from a PDF.
+
+    Uses pypdf when it is installed. Otherwise falls back to decoding the
+    Flate streams and reading their text operators, which works for PDFs
+    with simple font encodings.
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        pass
+    else:
+        reader = PdfReader(io.BytesIO(data))
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages), len(reader.pages)
+
+    streams = []
+    budget = PDF_MAX_DECOMPRESSED_BYTES
+    for raw in PDF_STREAM.findall(data):
+        if budget <= 0:
+            break
+        try:
+            # Capped, so a small compression bomb cannot exhaust the worker's memory
+            stream = zlib.decompressobj().decompress(raw, budget)
+        except zlib.error:
+            stream = raw
+        streams.append(stream)
+        budget -= len(stream)
+    pages = sum(len(PDF_PAGE.findall(chunk)) for chunk in [data, *streams])
+    texts = [text for text in map(_pdf_content_text, streams) if text.strip()]
+    return "\n\n".join(texts), max(pages, 1)
+
+
+def extract_doc(data: bytes) -> Tuple[str, int]:
+    """Best-effort text from a legacy binary .doc: its runs of readable text.
+
+    Word stores text as UTF-16LE or as 8-bit characters, so both are tried.
+    """
+    utf16 = re.findall(rb"(?:[\x20-\x7e\r\n\t]\x00){4,}", data)
+    if utf16:
+        return "\n".join(run.decode("utf-16-le") for run in utf16), 1
+    return "\n".join(run.decode("latin-1") for run in re.findall(rb"[\x20-\x7e\r\n\t]{4,}", data)), 1
+
+
+EXTRACTORS = {
+    ".txt": extract_txt,
+    ".csv": extract_csv,
+    ".docx": extract_docx,
+    ".pdf": extract_pdf,
+    ".doc": extract_doc,
+}
+
+
+# Normalization and chunking
+def normalize_text(text: str) -> str:
+    """Normalize Unicode and whitespace, keeping paragraph breaks."""
+    text = unicodedata.normalize("NFKC", text)
+    text = re.sub(r"[\x00-\x08\x0b-\x1f\x7f-\x9f]", " ", text)  # Control characters
+    text = re.sub(r"[^\S\n]+", " ", text)  # Collapse horizontal whitespace
+    text = re.sub(r"-\n(?=[a-z])", "", text)  # Re-join hyphenated line breaks
+    text = re.sub(r" ?\n ?", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def split_chunks(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """Split text into chunks of about `chunk_size` characters.
+
+    Chunks end at sentence or line boundaries where possible, and each
+    chunk repeats up to `overlap` characters from the end of the previous.
+    """
+    pieces = [piece for piece in SENTENCE_END.split(text) if piece.strip()]
+    chunks, current = [], ""
+    for piece in pieces:
+        # Hard-split pieces that are longer than a chunk on their own
+        while len(piece) > chunk_size:
+            cut = piece.rfind(" ", 0, chunk_size)
+            cut = cut if cut > chunk_size // 2 else chunk_size
+            pieces_head, piece = piece[:cut], piece[cut:].lstrip()
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(pieces_head)
+        if current and len(current) + 1 + len(piece) > chunk_size:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            tail = tail[tail.find(" ") + 1:] if " " in tail else tail
+            current = f"{tail} {piece}" if tail else piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# Tokenization
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a about all an and any are as at be been but by can could do does for from had has have how i if in into is it "
+    "its me my no not of on or our so such than that the their then there these they this to us was we were what "
+    "when where which who will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms, dropping stopwords."""
+    return [term for term in TOKEN_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+def process_document(path: str, file_type: str, chunk_size: int, overlap: int) -> dict:
+    """Extract, normalize and chunk one stored document."""
+    extractor = EXTRACTORS.get(file_type)
+    if extractor is None:
+        raise ValueError(f"No extractor for {file_type} files")
+    with open(path, "rb") as f:
+        data = f.read()
+    text, pages = extractor(data)
+    return {"chunks": split_chunks(normalize_text(text), chunk_size, overlap), "pages": pages}
@@ -1,7 +1,10 @@
 """FastAPI application entry point for Voice AI SaaS."""
 
-from fastapi import FastAPI
+import sqlite3
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from .config import settings
 from .routes import (
     business_router,
@@ -10,7 +13,19 @@ from .routes import (
     voice_assistant_router,
     onboarding_router,
     config_router,
+    admin_router,
+    calls_router,
 )
+from .services import ingestion_service, search_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Stop the worker processes with the server, so they are not left behind."""
+    yield
+    ingestion_service.pool.shutdown()
+    search_service.pool.shutdown()
+
 
 # Create FastAPI application
 app = FastAPI(
@@ -19,6 +34,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -28,8 +44,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+
+@app.exception_handler(sqlite3.OperationalError)
+async def database_busy(request: Request, exc: sqlite3.OperationalError):
+    """Ask clients to retry when another worker held the SQLite write lock past the busy timeout."""
+    if "locked" not in str(exc):
+        raise exc
+    return JSONResponse(status_code=503, content={"detail": "Database is busy"}, headers={"Retry-After": "1"})
+
+
 # Include routers
 app.include_router(business_router, prefix=settings.api_v1_prefix)
 app.include_router(knowledge_base_router, prefix=settings.api_v1_prefix)
@@ -37,6 +63,9 @@ app.include_router(phone_numbers_router, prefix=settings.api_v1_prefix)
 app.include_router(voice_assistant_router, prefix=settings.api_v1_prefix)
 app.include_router(onboarding_router, prefix=settings.api_v1_prefix)
 app.include_router(config_router, prefix=settings.api_v1_prefix)
+app.include_router(calls_router, prefix=settings.api_v1_prefix)
+if settings.admin_token:
+    app.include_router(admin_router, prefix=settings.api_v1_prefix)
 
 
 @app.get("/")
@@ -2,6 +2,22 @@
 
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from enum import Enum
+
+
+class IngestionStatus(str, Enum):
+    """Text extraction state of a knowledge base file."""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class SearchMode(str, Enum):
+    """Ranking used by knowledge base search."""
+    KEYWORD = "keyword"  # BM25
+    SEMANTIC = "semantic"  # Cosine similarity of embeddings
+    HYBRID = "hybrid"  # Reciprocal rank fusion of both
 
 
 class KnowledgeBaseFileResponse(BaseModel):
@@ -13,6 +29,10 @@ class KnowledgeBaseFileResponse(BaseModel):
     file_type: str
     file_size: int  # in bytes
     uploaded_at: str
+    content_hash: Optional[str] = None  # hex SHA-256
+    status: IngestionStatus = IngestionStatus.PENDING
+    chunk_count: int = 0
+    page_count: int = 0
     
     class Config:
         from_attributes = True
@@ -32,3 +52,64 @@ class KnowledgeBaseDeleteResponse(BaseModel):
     message: str
     deleted_file_id: str
 
+
+class KnowledgeBaseChunkSource(BaseModel):
+    """Model for a file a knowledge base chunk occurs in."""
+    
+    file_id: str
+    filename: str
+    chunk_index: int
+
+
+class KnowledgeBaseSearchResult(BaseModel):
+    """Model for a chunk of text matching a search."""
+    
+    file_id: str  # First of `sources`
+    filename: str
+    chunk_index: int
+    score: float  # Depends on the search mode
+    text: str
+    sources: List[KnowledgeBaseChunkSource]  # Every file with this chunk or a near-duplicate of it
+
+
+class KnowledgeBaseSearchResponse(BaseModel):
+    """Model for knowledge base search response."""
+    
+    query: str
+    mode: SearchMode
+    results: List[KnowledgeBaseSearchResult]
+
+
+class KnowledgeBaseIndexStats(BaseModel):
+    """Model for the size of a business's search index."""
+    
+    segments: int
+    files: int
+    source_chunks: int  # Chunks of all indexed files
+    indexed_chunks: int  # Chunks stored, with near-duplicates stored once
+    duplicate_chunks: int
+    reduction: float  # Share of source chunks saved by deduplication
+    size_bytes: int
+
+
+class UploadSessionCreate(BaseModel):
+    """Model for starting a resumable upload."""
+    
+    filename: str = Field(..., min_length=1, max_length=255)
+    file_size: int = Field(..., ge=0)  # in bytes
+    chunk_size: Optional[int] = Field(default=None, ge=256 * 1024, le=64 * 1024 * 1024)
+
+
+class UploadSessionResponse(BaseModel):
+    """Model for the state of a resumable upload."""
+    
+    upload_id: str
+    business_id: str
+    filename: str
+    file_size: int
+    chunk_size: int
+    total_chunks: int
+    received_chunks: List[int]
+    missing_chunks: List[int]
+    bytes_received: int
+    offset: int  # Bytes received contiguously from the start
@@ -0,0 +1,46 @@
+"""Cursor pagination and sparse fieldsets for list endpoints."""
+
+import base64
+import binascii
+import json
+from typing import List, Optional, Tuple
+from fastapi import Query
+
+# A page of records plus the cursor for the next page (None on the last page)
+Page = Tuple[List[dict], Optional[str]]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(*parts) -> str:
+    """Encode backend-specific position data as an opaque cursor string."""
+    raw = json.dumps(parts, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decode a cursor created by `encode_cursor`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        parts = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(parts, list):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return parts
+
+
+class PageParams:
+    """Query parameters shared by all list endpoints."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(default=None, ge=1, le=500, description="Maximum number of items to return"),
+        cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+        fields: Optional[str] = Query(default=None, description="Comma-separated list of fields to include"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
@@ -0,0 +1,175 @@
+"""Compact record types for the in-memory database.
+
+Records use `__slots__` dataclasses instead of dicts, keep UUIDs as their
+16-byte form and timestamps as integer epoch microseconds. They are
+converted to the plain dicts the route layer expects by `to_dict()`, so
+strings are only built when a record is actually serialized.
+
+Each record also gets a `seq` number from the database when it is
+created. It orders records for cursor pagination, like the SQLite
+backend's `seq` column, and is not part of `to_dict()`.
+"""
+
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def now_micros() -> int:
+    """Current UTC time as integer epoch microseconds."""
+    return time.time_ns() // 1000
+
+
+def format_timestamp(micros: int) -> str:
+    """Format epoch microseconds like `datetime.utcnow().isoformat()`."""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def new_id() -> bytes:
+    """Generate a new 16-byte UUID."""
+    return uuid.uuid4().bytes
+
+
+def parse_id(value: Optional[str]) -> Optional[bytes]:
+    """Convert a UUID string to its 16-byte form, or None if it is not a UUID."""
+    if value is None:
+        return None
+    try:
+        return uuid.UUID(value).bytes
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def format_id(value: Optional[bytes]) -> Optional[str]:
+    """Convert a 16-byte UUID back to its string form."""
+    if value is None:
+        return None
+    # Equivalent to str(uuid.UUID(bytes=value)), about 3x faster
+    h = value.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def normalize_phone_number(value: str) -> str:
+    """Strip formatting from a phone number, so "+1 (555) 010-0000" matches E.164 "+15550100000"."""
+    return re.sub(r"[^\d+]", "", value or "")
+
+
+@dataclass(slots=True)
+class BusinessRecord:
+    """A business profile."""
+
+    id: bytes
+    name: str
+    description: Optional[str]
+    created_at: int
+    updated_at: int
+    seq: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": format_id(self.id),
+            "name": self.name,
+            "description": self.description,
+            "created_at": format_timestamp(self.created_at),
+            "updated_at": format_timestamp(self.updated_at),
+        }
+
+
+@dataclass(slots=True)
+class KnowledgeBaseFileRecord:
+    """A file in a business's knowledge base."""
+
+    id: bytes
+    business_id: bytes
+    filename: str
+    file_type: str
+    file_size: int
+    storage_path: str
+    uploaded_at: int
+    content_hash: Optional[str] = None  # hex SHA-256
+    status: str = "pending"  # IngestionStatus value
+    chunk_count: int = 0
+    page_count: int = 0
+    seq: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": format_id(self.id),
+            "business_id": format_id(self.business_id),
+            "filename": self.filename,
+            "file_type": self.file_type,
+            "file_size": self.file_size,
+            "storage_path": self.storage_path,
+            "uploaded_at": format_timestamp(self.uploaded_at),
+            "content_hash": self.content_hash,
+            "status": self.status,
+            "chunk_count": self.chunk_count,
+            "page_count": self.page_count,
+        }
+
+
+@dataclass(slots=True)
+class PhoneNumberRecord:
+    """A phone number owned by a business."""
+
+    id: bytes
+    business_id: bytes
+    phone_number: str
+    friendly_name: Optional[str]
+    sid: Optional[str]
+    status: str
+    purchased_at: int
+    seq: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": format_id(self.id),
+            "business_id": format_id(self.business_id),
+            "phone_number": self.phone_number,
+            "friendly_name": self.friendly_name,
+            "sid": self.sid,
+            "status": self.status,
+            "purchased_at": format_timestamp(self.purchased_at),
+        }
+
+
+@dataclass(slots=True)
+class VoiceAssistantRecord:
+    """A voice assistant configuration."""
+
+    id: bytes
+    business_id: bytes
+    name: str
+    first_message: str
+    system_prompt: str
+    model_provider: str
+    model_name: str
+    voice: str
+    end_call_message: str
+    max_call_duration_seconds: int
+    phone_number_id: Optional[bytes]
+    created_at: int
+    updated_at: int
+    seq: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": format_id(self.id),
+            "business_id": format_id(self.business_id),
+            "name": self.name,
+            "first_message": self.first_message,
+            "system_prompt": self.system_prompt,
+            "model_provider": self.model_provider,
+            "model_name": self.model_name,
+            "voice": self.voice,
+            "end_call_message": self.end_call_message,
+            "max_call_duration_seconds": self.max_call_duration_seconds,
+            "phone_number_id": format_id(self.phone_number_id),
+            "created_at": format_timestamp(self.created_at),
+            "updated_at": format_timestamp(self.updated_at),
+        }
@@ -6,6 +6,8 @@ from .phone_numbers import router as phone_numbers_router
 from .voice_assistant import router as voice_assistant_router
 from .onboarding import router as onboarding_router
 from .config import router as config_router
+from .admin import router as admin_router
+from .calls import router as calls_router
 
 __all__ = [
     "business_router",
@@ -14,5 +16,7 @@ __all__ = [
     "voice_assistant_router",
     "onboarding_router",
     "config_router",
+    "admin_router",
+    "calls_router",
 ]
 
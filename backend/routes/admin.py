@@ -0,0 +1,50 @@
+"""Administrative API routes.
+
+Only mounted when `settings.admin_token` is set, and every request must
+send that token in the X-Admin-Token header.
+"""
+
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic import BaseModel
+from ..config import settings
+from ..services.storage_service import storage_service
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """Reject requests without the configured admin token."""
+    if not (settings.admin_token and x_admin_token and hmac.compare_digest(x_admin_token, settings.admin_token)):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin_token)])
+
+
+class StorageStatsResponse(BaseModel):
+    """Deduplication statistics for knowledge base storage."""
+    files: int
+    blobs: int
+    orphaned_blobs: int
+    logical_bytes: int  # Sum of all file sizes
+    physical_bytes: int  # Bytes actually stored
+    bytes_saved: int
+    dedup_ratio: float
+
+
+class StorageCompactResponse(BaseModel):
+    """Result of compacting knowledge base storage."""
+    files_linked: int
+    blobs_collected: int
+
+
+@router.get("/storage", response_model=StorageStatsResponse)
+async def get_storage_stats():
+    """Get how much space content deduplication saves."""
+    return StorageStatsResponse(**await storage_service.get_usage_stats())
+
+
+@router.post("/storage/compact", response_model=StorageCompactResponse)
+async def compact_storage():
+    """Deduplicate files stored before the blob store and collect unreferenced blobs."""
+    return StorageCompactResponse(**await storage_service.compact())
@@ -1,18 +1,25 @@
 """Business-related API routes."""
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List
 from ..models.business import BusinessCreate, BusinessUpdate, BusinessResponse
 from ..database import db
+from ..services.storage_service import storage_service
+from ..services.search_service import search_service
+from ..serialization import json_list_response
+from ..pagination import PageParams, InvalidCursorError
 
 router = APIRouter(prefix="/business", tags=["Business"])
 
 
 @router.get("", response_model=List[BusinessResponse])
-async def list_businesses():
-    """Get all businesses."""
-    businesses = db.get_all_businesses()
-    return [BusinessResponse(**b) for b in businesses]
+async def list_businesses(page: PageParams = Depends()):
+    """Get all businesses, optionally paginated with `limit`/`cursor`."""
+    try:
+        businesses, next_cursor = db.list_businesses(cursor=page.cursor, limit=page.limit)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_list_response(BusinessResponse, businesses, fields=page.fields, next_cursor=next_cursor)
 
 
 @router.post("", response_model=BusinessResponse, status_code=status.HTTP_201_CREATED)
@@ -61,6 +68,9 @@ async def delete_business(business_id: str):
         )
     
     # Delete all associated data (cascade delete)
+    files = db.get_knowledge_base_files(business_id)
     db.delete_business(business_id)
+    await search_service.drop_business(business_id)
+    await storage_service.delete_business_files(business_id, files)
     return None
 
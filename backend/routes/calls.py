@@ -0,0 +1,95 @@
+"""Inbound call API routes, called by Twilio."""
+
+from typing import Optional
+from urllib.parse import parse_qsl
+from xml.sax.saxutils import escape, quoteattr
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, status
+from starlette.requests import HTTPConnection
+from ..config import settings
+from ..database import db
+from ..services.call_service import call_service
+from ..services.twilio_service import twilio_service
+
+router = APIRouter(prefix="/calls", tags=["Calls"])
+
+TWIML_CONTENT_TYPE = "application/xml"
+NOT_IN_SERVICE = "The number you have called is not in service."
+NO_ASSISTANT = "Sorry, no one is available to take your call. Please try again later."
+
+
+def _public_url(request: HTTPConnection, path: Optional[str] = None) -> str:
+    """Get the URL Twilio used for a request, or for another path on this server."""
+    if path is None:
+        path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    base = settings.public_base_url or f"{request.url.scheme}://{request.url.netloc}"
+    if request.scope["type"] == "websocket" and base.startswith("http"):
+        base = "ws" + base.removeprefix("http")  # http -> ws, https -> wss
+    return base.rstrip("/") + path
+
+
+def _twiml(body: str) -> Response:
+    """Wrap TwiML verbs in a response document."""
+    return Response(
+        f'<?xml version="1.0" encoding="UTF-8"?><Response>{body}</Response>',
+        media_type=TWIML_CONTENT_TYPE,
+    )
+
+
+def _hang_up(message: str) -> Response:
+    """TwiML reading a message, then hanging up."""
+    return _twiml(f"<Say>{escape(message)}</Say><Hangup/>")
+
+
+@router.post("/twilio/voice")
+async def twilio_voice_webhook(request: Request):
+    """Answer an inbound call, as the voice URL of our Twilio numbers.
+
+    The dialed number (`To`) is looked up in the call routing index kept by
+    the database, so answering takes one hash lookup however many
+    businesses there are. The call is connected to the media stream of its
+    voice assistant, with the business and assistant as stream parameters.
+    """
+    # Twilio posts form-encoded parameters; parsing them directly skips the multipart machinery
+    params = dict(parse_qsl((await request.body()).decode(), keep_blank_values=True))
+    if not twilio_service.validate_webhook(_public_url(request), params, request.headers.get("x-twilio-signature")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Twilio signature")
+
+    route = db.get_call_route(params.get("To", ""))
+    if route is None:
+        return _hang_up(NOT_IN_SERVICE)
+    assistant = route["assistant"]
+    if assistant is None:
+        return _hang_up(NO_ASSISTANT)
+
+    stream_url = _public_url(request, f"{settings.api_v1_prefix}{router.prefix}/media-stream")
+    stream_url = "ws" + stream_url.removeprefix("http")  # http -> ws, https -> wss
+    stream_params = {
+        "business_id": route["business_id"],
+        "assistant_id": assistant["id"],
+        "phone_number_id": route["phone_number_id"],
+    }
+    parameters = "".join(
+        f"<Parameter name={quoteattr(name)} value={quoteattr(value)}/>" for name, value in stream_params.items()
+    )
+    return _twiml(f"<Connect><Stream url={quoteattr(stream_url)}>{parameters}</Stream></Connect>")
+
+
+@router.websocket("/media-stream")
+async def media_stream(websocket: WebSocket):
+    """Run a call connected by `<Connect><Stream>`, over the Twilio Media Streams protocol."""
+    if not twilio_service.validate_webhook(_public_url(websocket), {}, websocket.headers.get("x-twilio-signature")):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await call_service.handle_stream(websocket)
+
+
+@router.get("/metrics")
+async def get_call_metrics():
+    """Get calls in progress and latency percentiles of the call engine.
+
+    `time_to_first_audio` runs from the start of a stream to the first
+    audio of the greeting, and `turn_latency` from the end of the caller's
+    speech to the first audio of the reply.
+    """
+    return call_service.get_stats()
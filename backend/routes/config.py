@@ -1,9 +1,9 @@
 """Configuration API routes for dynamic form data."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 from pydantic import BaseModel
 from typing import List, Optional
-from ..models.voice_assistant import ModelProvider, ModelName, ElevenLabsVoice
+from ..catalog import StaticJSON, get_providers, get_voices
 
 router = APIRouter(prefix="/config", tags=["Configuration"])
 
@@ -88,9 +88,8 @@ class OnboardingConfigResponse(BaseModel):
     voiceAssistant: dict
 
 
-@router.get("/onboarding", response_model=OnboardingConfigResponse)
-async def get_onboarding_config():
-    """Get all configuration needed for the onboarding flow."""
+def build_onboarding_config() -> OnboardingConfigResponse:
+    """Build the configuration needed for the onboarding flow."""
     
     # Steps configuration
     steps = [
@@ -169,61 +168,8 @@ async def get_onboarding_config():
     voice_assistant_config = {
         "title": "Configure Voice Assistant",
         "subtitle": "Set up how your AI assistant will interact with callers",
-        "providers": [
-            {
-                "id": "openai",
-                "name": "OpenAI",
-                "models": [
-                    {"id": "gpt-4o", "name": "GPT-4o", "description": "Most capable model"},
-                    {"id": "gpt-4o-mini", "name": "GPT-4o Mini", "description": "Fast and efficient"},
-                    {"id": "gpt-4-turbo", "name": "GPT-4 Turbo", "description": "High performance"},
-                ],
-            },
-            {
-                "id": "anthropic",
-                "name": "Anthropic",
-                "models": [
-                    {"id": "claude-3-5-sonnet-20241022", "name": "Claude 3.5 Sonnet", "description": "Best balance"},
-                    {"id": "claude-3-opus-20240229", "name": "Claude 3 Opus", "description": "Most powerful"},
-                    {"id": "claude-3-haiku-20240307", "name": "Claude 3 Haiku", "description": "Fastest"},
-                ],
-            },
-            {
-                "id": "google",
-                "name": "Google",
-                "models": [
-                    {"id": "gemini-pro", "name": "Gemini Pro", "description": "General purpose"},
-                    {"id": "gemini-pro-vision", "name": "Gemini Pro Vision", "description": "Multimodal"},
-                ],
-            },
-            {
-                "id": "groq",
-                "name": "Groq",
-                "models": [
-                    {"id": "llama-3-70b", "name": "Llama 3 70B", "description": "Open source powerhouse"},
-                    {"id": "mixtral-8x7b", "name": "Mixtral 8x7B", "description": "Fast MoE model"},
-                ],
-            },
-        ],
-        "voices": [
-            {"id": "rachel", "name": "Rachel", "gender": "female", "accent": "American"},
-            {"id": "domi", "name": "Domi", "gender": "female", "accent": "American"},
-            {"id": "bella", "name": "Bella", "gender": "female", "accent": "American"},
-            {"id": "antoni", "name": "Antoni", "gender": "male", "accent": "American"},
-            {"id": "elli", "name": "Elli", "gender": "female", "accent": "American"},
-            {"id": "josh", "name": "Josh", "gender": "male", "accent": "American"},
-            {"id": "arnold", "name": "Arnold", "gender": "male", "accent": "American"},
-            {"id": "adam", "name": "Adam", "gender": "male", "accent": "American"},
-            {"id": "sam", "name": "Sam", "gender": "male", "accent": "American"},
-            {"id": "nicole", "name": "Nicole", "gender": "female", "accent": "American"},
-            {"id": "glinda", "name": "Glinda", "gender": "female", "accent": "American"},
-            {"id": "clyde", "name": "Clyde", "gender": "male", "accent": "American"},
-            {"id": "paul", "name": "Paul", "gender": "male", "accent": "American"},
-            {"id": "callum", "name": "Callum", "gender": "male", "accent": "British"},
-            {"id": "charlotte", "name": "Charlotte", "gender": "female", "accent": "British"},
-            {"id": "matilda", "name": "Matilda", "gender": "female", "accent": "Australian"},
-            {"id": "lily", "name": "Lily", "gender": "female", "accent": "British"},
-        ],
+        "providers": get_providers(),
+        "voices": get_voices(),
         "durationPresets": [
             {"value": 60, "label": "1 min"},
             {"value": 120, "label": "2 min"},
@@ -259,3 +205,12 @@ Always maintain a helpful and professional tone.""",
         voiceAssistant=voice_assistant_config,
     )
 
+
+# Built once at startup; the configuration is static
+onboarding_config = StaticJSON(build_onboarding_config().model_dump_json().encode())
+
+
+@router.get("/onboarding", response_model=OnboardingConfigResponse)
+async def get_onboarding_config(request: Request):
+    """Get all configuration needed for the onboarding flow."""
+    return onboarding_config.response(request)
@@ -1,16 +1,29 @@
 """Knowledge base related API routes."""
 
 import os
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, status
-from typing import List
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form, status
+from fastapi.responses import FileResponse
+from typing import List, Optional
 from ..models.knowledge_base import (
     KnowledgeBaseFileResponse,
     KnowledgeBaseUploadResponse,
     KnowledgeBaseDeleteResponse,
+    KnowledgeBaseSearchResponse,
+    KnowledgeBaseIndexStats,
+    SearchMode,
+    UploadSessionCreate,
+    UploadSessionResponse,
 )
 from ..database import db
 from ..config import settings
-from ..services.storage_service import storage_service
+from ..services.storage_service import storage_service, FileTooLargeError
+from ..services.upload_sessions import upload_session_service, InvalidChunkError, IncompleteUploadError
+from ..services.ingestion_service import ingestion_service
+from ..services.search_service import search_service
+from ..serialization import json_list_response
+from ..pagination import PageParams, InvalidCursorError
 
 router = APIRouter(prefix="/knowledge-base", tags=["Knowledge Base"])
 
@@ -29,43 +42,41 @@ async def upload_files(
             detail=f"Business with ID {business_id} not found"
         )
     
-    uploaded_files = []
-    
+    # Validate file types before storing anything
     for file in files:
-        # Validate file type
         file_ext = os.path.splitext(file.filename)[1].lower()
         if file_ext not in settings.allowed_file_types:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"File type {file_ext} not allowed. Allowed types: {settings.allowed_file_types}"
             )
-        
-        # Read file content
-        content = await file.read()
-        file_size = len(content)
-        
-        # Validate file size
-        if file_size > settings.max_file_size_mb * 1024 * 1024:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"File {file.filename} exceeds maximum size of {settings.max_file_size_mb}MB"
-            )
-        
-        # Save file using storage service
-        saved_path = await storage_service.save_file(
+    
+    # Stream files to storage concurrently, validating size as they arrive
+    try:
+        stored_files = await storage_service.save_uploads(
             business_id=business_id,
-            filename=file.filename,
-            content=content
+            uploads=files,
+            max_size=settings.max_file_size_mb * 1024 * 1024,
+            concurrency=settings.upload_concurrency,
+        )
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File {e.filename} exceeds maximum size of {settings.max_file_size_mb}MB"
         )
-        
-        # Create database record
+    
+    # Create database records, in request order
+    uploaded_files = []
+    for file, stored in zip(files, stored_files):
         file_data = {
             "filename": file.filename,
-            "file_type": file_ext,
-            "file_size": file_size,
-            "storage_path": saved_path,
+            "file_type": os.path.splitext(file.filename)[1].lower(),
+            "file_size": stored.size,
+            "storage_path": stored.path,
+            "content_hash": stored.sha256,
         }
         file_record = db.add_knowledge_base_file(business_id, file_data)
+        ingestion_service.submit(business_id, file_record)
         uploaded_files.append(KnowledgeBaseFileResponse(**file_record))
     
     return KnowledgeBaseUploadResponse(
@@ -75,8 +86,136 @@ async def upload_files(
     )
 
 
+def _get_upload_session(business_id: str, upload_id: str) -> dict:
+    """Get an upload session of an existing business, or raise a 404."""
+    # Validate business exists
+    business = db.get_business(business_id)
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Business with ID {business_id} not found"
+        )
+    
+    session = upload_session_service.get_session(business_id, upload_id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session with ID {upload_id} not found"
+        )
+    return session
+
+
+@router.post(
+    "/upload-sessions/{business_id}",
+    response_model=UploadSessionResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_upload_session(business_id: str, upload: UploadSessionCreate):
+    """Start a resumable upload.
+    
+    Send the file as chunks of `chunk_size` bytes with
+    `PUT /upload-sessions/{business_id}/{upload_id}/chunks/{index}`, in any
+    order and in parallel, then call `POST .../complete`. Chunks that
+    failed can be re-sent; `GET` the session to see which are missing.
+    """
+    # Validate business exists
+    business = db.get_business(business_id)
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Business with ID {business_id} not found"
+        )
+    
+    # Validate file type
+    file_ext = os.path.splitext(upload.filename)[1].lower()
+    if file_ext not in settings.allowed_file_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File type {file_ext} not allowed. Allowed types: {settings.allowed_file_types}"
+        )
+    
+    try:
+        return upload_session_service.create_session(
+            business_id,
+            upload.filename,
+            upload.file_size,
+            upload.chunk_size or settings.upload_session_chunk_size,
+        )
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File {upload.filename} exceeds maximum size of {settings.max_file_size_mb}MB"
+        )
+
+
+@router.get("/upload-sessions/{business_id}/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(business_id: str, upload_id: str):
+    """Get the received and missing chunks of a resumable upload."""
+    return _get_upload_session(business_id, upload_id)
+
+
+@router.put("/upload-sessions/{business_id}/{upload_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def upload_chunk(business_id: str, upload_id: str, index: int, request: Request):
+    """Upload one chunk of a resumable upload as the raw request body."""
+    session = _get_upload_session(business_id, upload_id)
+    try:
+        updated = await upload_session_service.write_chunk(session, index, request.stream())
+    except InvalidChunkError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        updated = None  # Completed or deleted meanwhile
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session with ID {upload_id} not found"
+        )
+    return updated
+
+
+@router.post("/upload-sessions/{business_id}/{upload_id}/complete", response_model=KnowledgeBaseFileResponse)
+async def complete_upload_session(business_id: str, upload_id: str):
+    """Finish a resumable upload and add the file to the knowledge base."""
+    session = _get_upload_session(business_id, upload_id)
+    try:
+        stored = await upload_session_service.complete_session(session)
+    except IncompleteUploadError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload is missing chunks: {e.missing_chunks}"
+        )
+    if not stored:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Upload session with ID {upload_id} not found"
+        )
+    
+    # Create database record
+    file_data = {
+        "filename": session["filename"],
+        "file_type": os.path.splitext(session["filename"])[1].lower(),
+        "file_size": stored.size,
+        "storage_path": stored.path,
+        "content_hash": stored.sha256,
+    }
+    file_record = db.add_knowledge_base_file(business_id, file_data)
+    ingestion_service.submit(business_id, file_record)
+    return file_record
+
+
+@router.delete("/upload-sessions/{business_id}/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upload_session(business_id: str, upload_id: str):
+    """Abort a resumable upload."""
+    session = _get_upload_session(business_id, upload_id)
+    upload_session_service.delete_session(session)
+    return None
+
+
 @router.get("/{business_id}", response_model=List[KnowledgeBaseFileResponse])
-async def get_knowledge_base_files(business_id: str):
+async def get_knowledge_base_files(
+    business_id: str,
+    page: PageParams = Depends(),
+    file_type: Optional[str] = Query(default=None, description="Only files with this extension, e.g. .pdf"),
+):
     """Get all files in a business's knowledge base."""
     # Validate business exists
     business = db.get_business(business_id)
@@ -86,8 +225,129 @@ async def get_knowledge_base_files(business_id: str):
             detail=f"Business with ID {business_id} not found"
         )
     
-    files = db.get_knowledge_base_files(business_id)
-    return [KnowledgeBaseFileResponse(**f) for f in files]
+    filters = {"file_type": file_type} if file_type else None
+    try:
+        files, next_cursor = db.list_knowledge_base_files(
+            business_id, filters=filters, cursor=page.cursor, limit=page.limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_list_response(KnowledgeBaseFileResponse, files, fields=page.fields, next_cursor=next_cursor)
+
+
+@router.get("/{business_id}/search", response_model=KnowledgeBaseSearchResponse)
+async def search_knowledge_base(
+    business_id: str,
+    q: str = Query(..., min_length=1, max_length=1000, description="Search terms"),
+    limit: int = Query(default=5, ge=1, le=50),
+    mode: SearchMode = Query(default=SearchMode.HYBRID),
+    nprobe: Optional[int] = Query(
+        default=None, ge=1, le=1024, description="IVF lists to scan for large knowledge bases; more is slower but more exact"
+    ),
+):
+    """Find the chunks of a business's knowledge base that best match a query.
+    
+    Only files whose ingestion is `ready` are searched. `keyword` ranks by
+    BM25, `semantic` by embedding similarity, and `hybrid` fuses both
+    rankings, which also finds paraphrases of the knowledge base text.
+    """
+    # Validate business exists
+    business = db.get_business(business_id)
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Business with ID {business_id} not found"
+        )
+    
+    results = await search_service.search(business_id, q, limit, mode, nprobe)
+    return KnowledgeBaseSearchResponse(query=q, mode=mode, results=results)
+
+
+@router.get("/{business_id}/index-stats", response_model=KnowledgeBaseIndexStats)
+async def get_index_stats(business_id: str):
+    """Get the size of a business's search index.
+    
+    Near-duplicate chunks, as in revised or re-uploaded documents, are
+    indexed once; `reduction` is the share of chunks this saved.
+    """
+    # Validate business exists
+    business = db.get_business(business_id)
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Business with ID {business_id} not found"
+        )
+    
+    return await search_service.get_stats(business_id)
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Check conditional request headers against a file's validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.get("/{business_id}/{file_id}/content")
+async def download_file(business_id: str, file_id: str, request: Request):
+    """Download a file from a business's knowledge base.
+    
+    Supports `Range` requests and conditional requests (`If-None-Match`,
+    `If-Modified-Since`, `If-Range`). The file is streamed from disk, or
+    handed to the server via the ASGI pathsend extension where supported.
+    """
+    # Validate business exists
+    business = db.get_business(business_id)
+    if not business:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Business with ID {business_id} not found"
+        )
+    
+    # Find the file
+    file_record = db.get_knowledge_base_file_by_id(business_id, file_id)
+    
+    if not file_record:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"File with ID {file_id} not found"
+        )
+    
+    storage_path = file_record.get("storage_path", "")
+    stat_result = await storage_service.stat_file(storage_path)
+    if stat_result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Content of file {file_id} not found"
+        )
+    
+    # Content is immutable, so the SHA-256 is a strong validator. Files
+    # stored before hashing fall back to inode and size.
+    uploaded_at = datetime.fromisoformat(file_record["uploaded_at"]).replace(tzinfo=timezone.utc)
+    validator = file_record.get("content_hash") or f"{stat_result.st_ino:x}-{stat_result.st_size:x}"
+    etag = f'"{validator}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(uploaded_at.timestamp(), usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, etag, uploaded_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return FileResponse(
+        storage_path,
+        headers=headers,
+        filename=file_record["filename"],
+        stat_result=stat_result,
+    )
 
 
 @router.delete("/{business_id}/{file_id}", response_model=KnowledgeBaseDeleteResponse)
@@ -102,8 +362,7 @@ async def delete_file(business_id: str, file_id: str):
         )
     
     # Find the file
-    files = db.get_knowledge_base_files(business_id)
-    file_record = next((f for f in files if f["id"] == file_id), None)
+    file_record = db.get_knowledge_base_file_by_id(business_id, file_id)
     
     if not file_record:
         raise HTTPException(
@@ -112,10 +371,11 @@ async def delete_file(business_id: str, file_id: str):
         )
     
     # Delete from storage
-    await storage_service.delete_file(file_record.get("storage_path", ""))
+    await storage_service.delete_file(file_record.get("storage_path", ""), file_record.get("content_hash"))
     
-    # Delete from database
+    # Delete from database and search index
     db.delete_knowledge_base_file(business_id, file_id)
+    await search_service.remove_file(business_id, file_id)
     
     return KnowledgeBaseDeleteResponse(
         message="File deleted successfully",
@@ -1,6 +1,6 @@
 """Phone number related API routes."""
 
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from typing import Optional, List
 from pydantic import BaseModel
 from ..models.phone_number import (
@@ -12,6 +12,8 @@ from ..models.phone_number import (
 )
 from ..database import db
 from ..services.twilio_service import twilio_service
+from ..serialization import json_list_response
+from ..pagination import PageParams, InvalidCursorError
 
 router = APIRouter(prefix="/phone-numbers", tags=["Phone Numbers"])
 
@@ -21,6 +23,8 @@ class TwilioStatusResponse(BaseModel):
     configured: bool
     account_info: Optional[dict] = None
     message: str
+    search_cache: Optional[dict] = None
+    circuit_breaker: Optional[dict] = None
 
 
 @router.get("/status", response_model=TwilioStatusResponse)
@@ -30,7 +34,9 @@ async def get_twilio_status():
         return TwilioStatusResponse(
             configured=False,
             account_info=None,
-            message="Twilio is not configured. Set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in .env file. Using mock data for development."
+            message="Twilio is not configured. Set TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN in .env file. Using mock data for development.",
+            search_cache=twilio_service.get_cache_stats(),
+            circuit_breaker=twilio_service.get_circuit_status(),
         )
     
     account_info = await twilio_service.get_account_info()
@@ -38,13 +44,17 @@ async def get_twilio_status():
         return TwilioStatusResponse(
             configured=True,
             account_info=account_info,
-            message=f"Twilio configured and connected to account: {account_info.get('friendly_name', 'Unknown')}"
+            message=f"Twilio configured and connected to account: {account_info.get('friendly_name', 'Unknown')}",
+            search_cache=twilio_service.get_cache_stats(),
+            circuit_breaker=twilio_service.get_circuit_status(),
         )
     else:
         return TwilioStatusResponse(
             configured=False,
             account_info=None,
-            message="Twilio credentials provided but could not connect. Please verify your credentials."
+            message="Twilio credentials provided but could not connect. Please verify your credentials.",
+            search_cache=twilio_service.get_cache_stats(),
+            circuit_breaker=twilio_service.get_circuit_status(),
         )
 
 
@@ -104,7 +114,11 @@ async def purchase_phone_number(
 
 
 @router.get("/{business_id}", response_model=List[PhoneNumberResponse])
-async def get_business_phone_numbers(business_id: str):
+async def get_business_phone_numbers(
+    business_id: str,
+    page: PageParams = Depends(),
+    status_filter: Optional[str] = Query(default=None, alias="status", description="Only numbers with this status"),
+):
     """Get all phone numbers assigned to a business."""
     # Validate business exists
     business = db.get_business(business_id)
@@ -114,8 +128,14 @@ async def get_business_phone_numbers(business_id: str):
             detail=f"Business with ID {business_id} not found"
         )
     
-    numbers = db.get_phone_numbers(business_id)
-    return [PhoneNumberResponse(**n) for n in numbers]
+    filters = {"status": status_filter} if status_filter else None
+    try:
+        numbers, next_cursor = db.list_phone_numbers(
+            business_id, filters=filters, cursor=page.cursor, limit=page.limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_list_response(PhoneNumberResponse, numbers, fields=page.fields, next_cursor=next_cursor)
 
 
 @router.get("/{business_id}/{phone_id}", response_model=PhoneNumberResponse)
@@ -1,67 +1,34 @@
 """Voice assistant related API routes."""
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
 from ..models.voice_assistant import (
     VoiceAssistantCreate,
     VoiceAssistantUpdate,
     VoiceAssistantResponse,
     VoiceOptionsResponse,
     ModelProvider,
-    ModelName,
     ElevenLabsVoice,
 )
 from ..database import db
+from ..services.speech_cache import FIXED_PHRASES, speech_cache
+from ..catalog import StaticJSON, get_providers, get_voices
+from ..serialization import json_list_response
+from ..pagination import PageParams, InvalidCursorError
 
 router = APIRouter(prefix="/voice-assistant", tags=["Voice Assistant"])
 
 
+# Built once at startup from the enum catalog
+voice_options = StaticJSON(
+    VoiceOptionsResponse(providers=get_providers(), voices=get_voices(include_accent=False)).model_dump_json().encode()
+)
+
+
 @router.get("/options", response_model=VoiceOptionsResponse)
-async def get_voice_options():
+async def get_voice_options(request: Request):
     """Get available options for voice assistant configuration."""
-    providers = [
-        {
-            "id": ModelProvider.OPENAI.value,
-            "name": "OpenAI",
-            "models": [
-                {"id": ModelName.GPT_4O.value, "name": "GPT-4o", "description": "Most capable model"},
-                {"id": ModelName.GPT_4O_MINI.value, "name": "GPT-4o Mini", "description": "Fast and efficient"},
-                {"id": ModelName.GPT_4_TURBO.value, "name": "GPT-4 Turbo", "description": "High performance"},
-            ]
-        },
-        {
-            "id": ModelProvider.ANTHROPIC.value,
-            "name": "Anthropic",
-            "models": [
-                {"id": ModelName.CLAUDE_3_5_SONNET.value, "name": "Claude 3.5 Sonnet", "description": "Best balance"},
-                {"id": ModelName.CLAUDE_3_OPUS.value, "name": "Claude 3 Opus", "description": "Most powerful"},
-                {"id": ModelName.CLAUDE_3_HAIKU.value, "name": "Claude 3 Haiku", "description": "Fastest"},
-            ]
-        },
-        {
-            "id": ModelProvider.GOOGLE.value,
-            "name": "Google",
-            "models": [
-                {"id": ModelName.GEMINI_PRO.value, "name": "Gemini Pro", "description": "General purpose"},
-                {"id": ModelName.GEMINI_PRO_VISION.value, "name": "Gemini Pro Vision", "description": "Multimodal"},
-            ]
-        },
-        {
-            "id": ModelProvider.GROQ.value,
-            "name": "Groq",
-            "models": [
-                {"id": ModelName.LLAMA_3_70B.value, "name": "Llama 3 70B", "description": "Open source powerhouse"},
-                {"id": ModelName.MIXTRAL_8X7B.value, "name": "Mixtral 8x7B", "description": "Fast MoE model"},
-            ]
-        },
-    ]
-    
-    voices = [
-        {"id": voice.value, "name": voice.value.title(), "gender": "female" if voice.value in ["rachel", "domi", "bella", "elli", "nicole", "glinda", "charlotte", "matilda", "lily"] else "male"}
-        for voice in ElevenLabsVoice
-    ]
-    
-    return VoiceOptionsResponse(providers=providers, voices=voices)
+    return voice_options.response(request)
 
 
 @router.post("/{business_id}", response_model=VoiceAssistantResponse, status_code=status.HTTP_201_CREATED)
@@ -91,11 +58,18 @@ async def create_voice_assistant(business_id: str, assistant: VoiceAssistantCrea
     assistant_data["voice"] = assistant_data["voice"].value
     
     created = db.create_voice_assistant(business_id, assistant_data)
+    # Synthesize the greeting and goodbye now, so calls do not wait for them
+    speech_cache.prepare(created)
     return VoiceAssistantResponse(**created)
 
 
 @router.get("/{business_id}", response_model=List[VoiceAssistantResponse])
-async def get_voice_assistants(business_id: str):
+async def get_voice_assistants(
+    business_id: str,
+    page: PageParams = Depends(),
+    model_provider: Optional[ModelProvider] = Query(default=None, description="Only assistants using this provider"),
+    voice: Optional[ElevenLabsVoice] = Query(default=None, description="Only assistants using this voice"),
+):
     """Get all voice assistants for a business."""
     # Validate business exists
     business = db.get_business(business_id)
@@ -105,8 +79,18 @@ async def get_voice_assistants(business_id: str):
             detail=f"Business with ID {business_id} not found"
         )
     
-    assistants = db.get_voice_assistants(business_id)
-    return [VoiceAssistantResponse(**a) for a in assistants]
+    filters = {}
+    if model_provider:
+        filters["model_provider"] = model_provider.value
+    if voice:
+        filters["voice"] = voice.value
+    try:
+        assistants, next_cursor = db.list_voice_assistants(
+            business_id, filters=filters, cursor=page.cursor, limit=page.limit
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_list_response(VoiceAssistantResponse, assistants, fields=page.fields, next_cursor=next_cursor)
 
 
 @router.get("/{business_id}/{assistant_id}", response_model=VoiceAssistantResponse)
@@ -168,6 +152,11 @@ async def update_voice_assistant(business_id: str, assistant_id: str, update: Vo
         update_data["voice"] = update_data["voice"].value
     
     updated = db.update_voice_assistant(business_id, assistant_id, update_data)
+    # Synthesize changed greetings and goodbyes; a new voice changes both
+    if updated["voice"] != existing["voice"]:
+        speech_cache.prepare(updated)
+    else:
+        speech_cache.prepare(updated, [field for field in FIXED_PHRASES if updated[field] != existing[field]])
     return VoiceAssistantResponse(**updated)
 
 
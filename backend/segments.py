@@ -0,0 +1,483 @@
+"""On-disk segments of the knowledge base search index.
+
+A segment is an immutable file with the chunk text, BM25 postings,
+embeddings and MinHash signatures of some knowledge base files.
+Near-duplicate chunks are stored once, listing every file and chunk index
+they come from; a chunk that duplicates one in an older segment is only
+stored as a reference to it. Layout, little-endian:
+
+    magic (8 bytes) | version (uint32) | header length (uint32) | header | sections
+
+The header is JSON listing the segment's files and the offset, dtype and
+shape of each section. Sections start at 64-byte boundaries, so readers
+can mmap the file and use NumPy views of them: opening a segment parses
+nothing, and all processes reading it share one copy in the page cache.
+
+Segments are written by plain functions of their arguments, so they can
+be built in worker processes.
+"""
+
+import json
+import mmap
+import os
+import struct
+import uuid
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from .dedup import BANDS, NUM_PERM, LSHTable, band_keys, minhash
+from .embeddings import embed_texts
+from .extraction import tokenize
+from .vector_index import VectorIndex
+
+SEGMENT_MAGIC = b"KBSEG\r\n\x00"
+SEGMENT_VERSION = 2
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 64
+
+# (file_id, filename, chunks, vectors)
+SegmentFile = Tuple[str, str, List[str], np.ndarray]
+# (file ordinal, chunk index in the file)
+ChunkSource = Tuple[int, int]
+# (segment name, chunk number, file ordinal, chunk index in the file)
+ChunkRef = Tuple[str, int, int, int]
+
+
+class SegmentError(Exception):
+    """Raised for files that are not segments of a supported version."""
+
+
+def write_segment(
+    path: str,
+    files: List[Tuple[str, str]],
+    texts: List[str],
+    vectors: np.ndarray,
+    signatures: np.ndarray,
+    sources: List[List[ChunkSource]],
+    dim: int,
+    ivf_min_vectors: int,
+    dedup_threshold: float,
+    refs: Optional[List[ChunkRef]] = None,
+) -> dict:
+    """Write chunks as a segment, atomically.
+    
+    `files` are `(file_id, filename)`, and `sources` list the files and
+    chunk indexes each chunk comes from. Near-duplicate chunks are stored
+    once, with the sources of all of them. `refs` are chunks of the file
+    that duplicate chunks of older segments, and are only stored as
+    references to those.
+    
+    Returns the chunk count of each file, for the index manifest.
+    """
+    refs = refs or []
+    # Keep the first of near-duplicates, merging the sources of the rest into it
+    kept: List[int] = []
+    kept_sources: List[List[ChunkSource]] = []
+    table = LSHTable(dedup_threshold)
+    for number, keys in enumerate(band_keys(signatures)):
+        match = table.find(signatures[number], keys)
+        if match is None:
+            table.add(signatures[number], keys)
+            kept.append(number)
+            kept_sources.append(list(sources[number]))
+        else:
+            kept_sources[match] += sources[number]
+    texts = [texts[number] for number in kept]
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, dim)[kept]
+    signatures = signatures[kept]
+    
+    encoded = [text.encode() for text in texts]
+    text_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(e) for e in encoded], out=text_offsets[1:])
+    source_offsets = np.zeros(len(texts) + 1, dtype=np.uint64)
+    np.cumsum([len(s) for s in kept_sources], out=source_offsets[1:])
+    flat_sources = np.array([source for s in kept_sources for source in s], dtype=np.uint32).reshape(-1, 2)
+    
+    # Postings, in chunk order per term
+    postings: Dict[str, Tuple[List[int], List[int]]] = {}
+    chunk_lengths = np.zeros(len(texts), dtype=np.uint32)
+    for number, text in enumerate(texts):
+        terms = tokenize(text)
+        chunk_lengths[number] = len(terms)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = ([], [])
+            entry[0].append(number)
+            entry[1].append(min(count, 0xFFFF))
+    # Sorted by UTF-8 bytes, for binary search on the mmapped terms
+    terms = sorted((term.encode(), term) for term in postings)
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    np.cumsum([len(raw) for raw, _ in terms], out=term_offsets[1:])
+    postings_offsets = np.zeros(len(terms) + 1, dtype=np.uint64)
+    np.cumsum([len(postings[term][0]) for _, term in terms], out=postings_offsets[1:])
+    
+    # LSH band keys, sorted, so later files can look up duplicates by binary search
+    keys = band_keys(signatures).ravel()
+    key_order = np.argsort(keys, kind="stable")
+    ref_segments = sorted({name for name, *_ in refs})
+    sections = {
+        "text": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "text_offsets": text_offsets,
+        "source_offsets": source_offsets,
+        "source_files": flat_sources[:, 0].copy(),
+        "source_indexes": flat_sources[:, 1].copy(),
+        "chunk_lengths": chunk_lengths,
+        "terms": np.frombuffer(b"".join(raw for raw, _ in terms), dtype=np.uint8),
+        "term_offsets": term_offsets,
+        "doc_freq": np.array([len(postings[term][0]) for _, term in terms], dtype=np.uint32),
+        "postings_offsets": postings_offsets,
+        "postings_chunks": np.array([n for _, term in terms for n in postings[term][0]], dtype=np.uint32),
+        "postings_freqs": np.array([f for _, term in terms for f in postings[term][1]], dtype=np.uint16),
+        "vectors": vectors,
+        "signatures": signatures.astype(np.uint32),
+        "lsh_keys": keys[key_order],
+        "lsh_chunks": (key_order // BANDS).astype(np.uint32),
+        "ref_segments": np.array([ref_segments.index(name) for name, *_ in refs], dtype=np.uint32),
+        "ref_chunks": np.array([ref[1] for ref in refs], dtype=np.uint32),
+        "ref_files": np.array([ref[2] for ref in refs], dtype=np.uint32),
+        "ref_indexes": np.array([ref[3] for ref in refs], dtype=np.uint32),
+    }
+    if texts and len(texts) >= ivf_min_vectors:
+        vector_index = VectorIndex.from_arrays(sections["vectors"], np.ones(len(texts), dtype=bool))
+        sections["centroids"], sections["assignments"], _ = vector_index.fit()
+    
+    # Section offsets are relative to the first alignment boundary after the header
+    header = {
+        "dim": dim,
+        "total_length": int(chunk_lengths.sum()),
+        "files": [list(entry) for entry in files],
+        "ref_segments": ref_segments,
+        "sections": {},
+    }
+    offset = 0
+    for name, array in sections.items():
+        header["sections"][name] = [offset, array.dtype.str, list(array.shape)]
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode()
+    data_start = _align(PREAMBLE.size + len(header_bytes))
+    
+    temp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.part")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(PREAMBLE.pack(SEGMENT_MAGIC, SEGMENT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in sections.items():
+                f.seek(data_start + header["sections"][name][0])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(data_start + offset)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    counts = {file_id: 0 for file_id, _ in files}
+    for ordinal in flat_sources[:, 0].tolist() + [ref[2] for ref in refs]:
+        counts[files[ordinal][0]] += 1
+    return counts
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the section alignment."""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_files(path: str, files: List[SegmentFile], dim: int, ivf_min_vectors: int, dedup_threshold: float) -> dict:
+    """Write whole files as a segment; see `write_segment`."""
+    texts = [chunk for _, _, chunks, _ in files for chunk in chunks]
+    sources = [[(ordinal, index)] for ordinal, (_, _, chunks, _) in enumerate(files) for index in range(len(chunks))]
+    vectors = np.concatenate([v for *_, v in files]) if files else np.zeros((0, dim), np.float32)
+    return write_segment(
+        path,
+        [(file_id, filename) for file_id, filename, _, _ in files],
+        texts,
+        vectors,
+        minhash(texts),
+        sources,
+        dim,
+        ivf_min_vectors,
+        dedup_threshold,
+    )
+
+
+def build_segment(
+    path: str,
+    sources: List[Tuple[str, str, str, str]],
+    provider: str,
+    dim: int,
+    ivf_min_vectors: int,
+    dedup_threshold: float,
+) -> dict:
+    """Write a segment from stored extraction results.
+
+    `sources` are `(file_id, filename, extracted path, vectors path)`.
+    Files whose vectors are missing are embedded; files whose text is
+    missing are skipped.
+    """
+    files = []
+    for file_id, filename, extracted_path, vectors_path in sources:
+        try:
+            with open(extracted_path) as f:
+                chunks = json.load(f)["chunks"]
+        except FileNotFoundError:
+            continue
+        try:
+            vectors = np.load(vectors_path)
+        except FileNotFoundError:
+            vectors = None
+        if vectors is None or len(vectors) != len(chunks):
+            vectors = embed_texts(provider, dim, chunks)
+        files.append((file_id, filename, chunks, vectors))
+    return write_files(path, files, dim, ivf_min_vectors, dedup_threshold)
+
+
+def link_segments(
+    segments: List["Segment"],
+    removed: Set[str],
+) -> Tuple[List[np.ndarray], Dict[Tuple[int, int], List[Tuple[str, str, int]]]]:
+    """Resolve which chunks of a business's segments are live, given its removed files.
+    
+    A chunk is live while any file it comes from is, whether the file is
+    in the chunk's own segment or references it from a later one. Returns
+    the live mask of each segment and the `(file_id, filename, chunk
+    index)` of the live references to each `(segment position, chunk
+    number)`.
+    """
+    positions = {segment.name: position for position, segment in enumerate(segments)}
+    live = [segment.own_live(removed) for segment in segments]
+    references: Dict[Tuple[int, int], List[Tuple[str, str, int]]] = {}
+    for segment in segments:
+        if not len(segment.ref_chunks):
+            continue
+        alive = ~segment.removed_mask(removed)[segment.ref_files]
+        for target, name in enumerate(segment.ref_segments):
+            position = positions.get(name)
+            if position is None:
+                continue  # Merged away; only happens while a merge is being committed
+            refs = np.flatnonzero(alive & (segment.ref_targets == target))
+            chunks = segment.ref_chunks[refs]
+            live[position][chunks] = True
+            for chunk, ordinal, index in zip(chunks.tolist(), segment.ref_files[refs].tolist(), segment.ref_indexes[refs].tolist()):
+                file_id, filename = segment.files[ordinal]
+                references.setdefault((position, chunk), []).append((file_id, filename, index))
+    return live, references
+
+
+def merge_segments(
+    path: str,
+    segment_paths: List[str],
+    removed: Set[str],
+    dim: int,
+    ivf_min_vectors: int,
+    dedup_threshold: float,
+) -> dict:
+    """Write one segment with the live chunks of several, leaving out removed files.
+    
+    References between the segments become sources of the merged chunks,
+    and near-duplicates across them are merged.
+    """
+    segments = [Segment(segment_path) for segment_path in segment_paths]
+    live, references = link_segments(segments, removed)
+    files: Dict[str, int] = {}
+    names: List[Tuple[str, str]] = []
+    texts, vectors, signatures, sources = [], [], [], []
+    for segment in segments:
+        for file_id, filename in segment.files:
+            if file_id not in removed and file_id not in files:
+                files[file_id] = len(names)
+                names.append((file_id, filename))
+    for position, segment in enumerate(segments):
+        numbers = np.flatnonzero(live[position])
+        for number in numbers.tolist():
+            chunk_sources = []
+            for file_id, _, index in segment.sources(number, removed) + references.get((position, number), []):
+                chunk_sources.append((files[file_id], index))
+            texts.append(segment.text(number))
+            sources.append(chunk_sources)
+        vectors.append(segment.vectors[numbers])
+        signatures.append(segment.signatures[numbers])
+    return write_segment(
+        path,
+        names,
+        texts,
+        np.concatenate(vectors) if vectors else np.zeros((0, dim), np.float32),
+        np.concatenate(signatures) if signatures else np.zeros((0, NUM_PERM), np.uint32),
+        sources,
+        dim,
+        ivf_min_vectors,
+        dedup_threshold,
+    )
+
+
+class Segment:
+    """Read-only, mmapped view of a segment file.
+    
+    Removing files only hides their chunks in this process, see
+    `set_live`; the file itself never changes.
+    """
+    
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = PREAMBLE.unpack_from(self._mmap)
+        if magic != SEGMENT_MAGIC:
+            raise SegmentError(f"{path} is not a segment file")
+        if version != SEGMENT_VERSION:
+            raise SegmentError(f"Segment version {version} is not supported")
+        header = json.loads(self._mmap[PREAMBLE.size:PREAMBLE.size + header_length])
+        data_start = _align(PREAMBLE.size + header_length)
+        
+        sections = {}
+        for name, (offset, dtype, shape) in header["sections"].items():
+            count = int(np.prod(shape))
+            view = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + offset)
+            sections[name] = view.reshape(shape)
+        self._text = sections["text"]
+        self._text_offsets = sections["text_offsets"]
+        self._source_offsets = sections["source_offsets"]
+        self._source_files = sections["source_files"]
+        self._source_indexes = sections["source_indexes"]
+        self.chunk_lengths = sections["chunk_lengths"]
+        self._terms = sections["terms"]
+        self._term_offsets = sections["term_offsets"]
+        self._doc_freq = sections["doc_freq"]
+        self._postings_offsets = sections["postings_offsets"]
+        self._postings_chunks = sections["postings_chunks"]
+        self._postings_freqs = sections["postings_freqs"]
+        self.vectors = sections["vectors"]
+        self.signatures = sections["signatures"]
+        self._lsh_keys = sections["lsh_keys"]
+        self._lsh_chunks = sections["lsh_chunks"]
+        # References to chunks of older segments, which index `ref_segments`
+        self.ref_segments: List[str] = header["ref_segments"]
+        self.ref_targets = sections["ref_segments"]
+        self.ref_chunks = sections["ref_chunks"]
+        self.ref_files = sections["ref_files"]
+        self.ref_indexes = sections["ref_indexes"]
+        
+        self.files: List[Tuple[str, str]] = [tuple(entry) for entry in header["files"]]
+        self.chunk_count = len(self.chunk_lengths)
+        self.size = len(self._mmap)
+        # State private to this process
+        self.live = np.ones(self.chunk_count, dtype=bool)
+        self.live_chunks = self.chunk_count
+        self.total_length = header["total_length"]
+        self._removed_doc_freq: Dict[str, int] = {}
+        self.vector_index = VectorIndex.from_arrays(
+            self.vectors, self.live, sections.get("centroids"), sections.get("assignments")
+        )
+    
+    def text(self, number: int) -> str:
+        """Get the text of a chunk."""
+        start, end = self._text_offsets[number], self._text_offsets[number + 1]
+        return self._text[start:end].tobytes().decode()
+    
+    def removed_mask(self, removed: Set[str]) -> np.ndarray:
+        """Which of the segment's files are removed, by ordinal."""
+        return np.array([file_id in removed for file_id, _ in self.files] or [False])
+    
+    def own_live(self, removed: Set[str]) -> np.ndarray:
+        """Which chunks come from a file of this segment that is not removed."""
+        if not self.chunk_count:
+            return np.zeros(0, dtype=bool)
+        alive = ~self.removed_mask(removed)[self._source_files]
+        # Every chunk has at least one source, so no reduceat range is empty
+        return np.logical_or.reduceat(alive, self._source_offsets[:-1].astype(np.intp))
+    
+    def sources(self, number: int, removed: Set[str]) -> List[Tuple[str, str, int]]:
+        """Get `(file_id, filename, chunk index)` of the live files a chunk comes from."""
+        start, end = self._source_offsets[number], self._source_offsets[number + 1]
+        sources = []
+        for ordinal, index in zip(self._source_files[start:end].tolist(), self._source_indexes[start:end].tolist()):
+            file_id, filename = self.files[ordinal]
+            if file_id not in removed:
+                sources.append((file_id, filename, index))
+        return sources
+    
+    def set_live(self, live: np.ndarray) -> None:
+        """Show only the given chunks, keeping document frequencies in step."""
+        for number in np.flatnonzero(self.live != live).tolist():
+            delta = 1 if self.live[number] else -1
+            for term in set(tokenize(self.text(number))):
+                self._removed_doc_freq[term] = self._removed_doc_freq.get(term, 0) + delta
+        dropped, restored = np.flatnonzero(self.live & ~live), np.flatnonzero(~self.live & live)
+        self.vector_index.remove(dropped)
+        self.vector_index.restore(restored)
+        self.live_chunks = int(live.sum())
+        self.total_length = int(self.chunk_lengths[live].sum())
+    
+    def find_duplicates(self, signatures: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the most similar live chunk for each signature.
+        
+        Returns the chunk numbers, -1 where there is none at `threshold` or
+        above, and the similarities.
+        """
+        keys = band_keys(signatures)
+        lows = np.searchsorted(self._lsh_keys, keys.ravel(), side="left")
+        highs = np.searchsorted(self._lsh_keys, keys.ravel(), side="right")
+        counts = highs - lows
+        # Expand the key ranges into (query, candidate chunk) pairs
+        queries = np.repeat(np.arange(keys.size) // BANDS, counts)
+        starts = np.repeat(lows - np.cumsum(counts) + counts, counts)
+        candidates = self._lsh_chunks[starts + np.arange(counts.sum())].astype(np.intp)
+        keep = self.live[candidates]
+        queries, candidates = queries[keep], candidates[keep]
+        
+        matches = np.full(len(signatures), -1, dtype=np.int64)
+        best = np.zeros(len(signatures))
+        if len(queries):
+            scores = (signatures[queries] == self.signatures[candidates]).mean(axis=1)
+            # Lowest score first, so assignment leaves the best per query
+            order = np.argsort(scores, kind="stable")
+            queries, candidates, scores = queries[order], candidates[order], scores[order]
+            found = scores >= threshold
+            matches[queries[found]] = candidates[found]
+            best[queries[found]] = scores[found]
+        return matches, best
+    
+    def find_term(self, term: str) -> int:
+        """Get a term's number by binary search, or -1 if it does not occur."""
+        raw = term.encode()
+        offsets, terms = self._term_offsets, self._terms
+        low, high = 0, len(self._doc_freq)
+        while low < high:
+            mid = (low + high) // 2
+            candidate = terms[offsets[mid]:offsets[mid + 1]].tobytes()
+            if candidate < raw:
+                low = mid + 1
+            elif candidate > raw:
+                high = mid
+            else:
+                return mid
+        return -1
+    
+    def doc_freq(self, term: str, number: int) -> int:
+        """Live chunks containing term `number`."""
+        return int(self._doc_freq[number]) - self._removed_doc_freq.get(term, 0)
+    
+    def postings(self, number: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Chunk numbers and term frequencies of term `number`."""
+        start, end = self._postings_offsets[number], self._postings_offsets[number + 1]
+        return self._postings_chunks[start:end], self._postings_freqs[start:end]
+    
+    def bm25(self, idfs: Dict[int, float], avg_length: float, limit: int, k1: float, b: float) -> List[Tuple[int, float]]:
+        """Get the best chunks by BM25, given the IDF of each query term number."""
+        if not idfs or not self.live_chunks:
+            return []
+        norms = k1 * (1 - b + b * self.chunk_lengths / avg_length)
+        scores = np.zeros(self.chunk_count)
+        for number, idf in idfs.items():
+            chunks, tfs = self.postings(number)
+            # A term occurs once per chunk in its postings, so fancy-index += is safe
+            scores[chunks] += idf * tfs * (k1 + 1) / (tfs + norms[chunks])
+        scores *= self.live
+        
+        matches = np.flatnonzero(scores)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return list(zip(matches.tolist(), scores[matches].tolist()))
+
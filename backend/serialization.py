@@ -0,0 +1,44 @@
+"""Fast JSON encoding for list endpoints."""
+
+from functools import lru_cache
+from typing import List, Optional, Type
+from fastapi import HTTPException, Response, status
+from pydantic import BaseModel, TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Get a cached TypeAdapter for a list of `model`."""
+    return TypeAdapter(List[model])
+
+
+def json_list_response(
+    model: Type[BaseModel],
+    records: List[dict],
+    fields: Optional[List[str]] = None,
+    next_cursor: Optional[str] = None,
+) -> Response:
+    """Validate database records against `model` once and encode them as JSON.
+
+    The whole list is validated and dumped in one pydantic-core call each, and
+    returning a Response directly skips FastAPI's second validation pass
+    against the route's `response_model` (which is kept for the docs).
+    Fields not declared on `model`, such as `storage_path`, are dropped.
+    
+    `fields` limits the output to a subset of the model's fields, and
+    `next_cursor` is sent in the `X-Next-Cursor` header.
+    """
+    include = None
+    if fields:
+        unknown = set(fields) - set(model.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {sorted(unknown)}. Available fields: {list(model.model_fields)}"
+            )
+        include = {"__all__": set(fields)}
+    
+    adapter = _list_adapter(model)
+    content = adapter.dump_json(adapter.validate_python(records), include=include)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=content, media_type="application/json", headers=headers)
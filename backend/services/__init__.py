@@ -2,6 +2,10 @@
 
 from .twilio_service import twilio_service
 from .storage_service import storage_service
+from .upload_sessions import upload_session_service
+from .ingestion_service import ingestion_service
+from .search_service import search_service
+from .speech_cache import speech_cache
+from .call_service import call_service
 
-__all__ = ["twilio_service", "storage_service"]
-
+__all__ = ["twilio_service", "storage_service", "upload_session_service", "ingestion_service", "search_service", "speech_cache", "call_service"]
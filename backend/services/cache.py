@@ -0,0 +1,118 @@
+"""In-process async cache with TTL, LRU eviction and stale-while-revalidate."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTTLCache:
+    """Cache for the results of async fetches.
+
+    - Entries younger than `ttl` are served directly.
+    - Entries younger than `ttl + stale_ttl` are served stale while one
+      background task refreshes them.
+    - Older entries are refetched, but kept until a fetch replaces them,
+      so `peek` still has the last good value when the fetch fails.
+    - Concurrent misses for the same key share a single fetch.
+    - At most `max_entries` are kept; the least recently used are evicted.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Get the value for `key`, calling `fetch` on a miss or when stale."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start(key, fetch, background=True)
+                return value
+
+        self.misses += 1
+        task = self._inflight.get(key) or self._start(key, fetch)
+        # Shield so a cancelled request does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def _start(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], background: bool = False) -> asyncio.Task:
+        """Start the single in-flight fetch for `key`."""
+        task = asyncio.ensure_future(self._fetch_and_store(key, fetch))
+        task.add_done_callback(self._log_refresh_error if background else self._retrieve_error)
+        self._inflight[key] = task
+        return task
+
+    async def _fetch_and_store(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a fetch and store its result."""
+        try:
+            value = await fetch()
+        finally:
+            self._inflight.pop(key, None)
+        self.set(key, value)
+        return value
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        """Log failed background refreshes; the stale entry is kept."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background cache refresh failed: {task.exception()}")
+
+    @staticmethod
+    def _retrieve_error(task: asyncio.Task) -> None:
+        """Mark a fetch error as retrieved; waiters that gave up never see it."""
+        if not task.cancelled():
+            task.exception()
+
+    def peek(self, key: Hashable) -> Any:
+        """Get the value for `key` regardless of its age, or None."""
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def update_values(self, func: Callable[[Any], Any]) -> None:
+        """Replace every cached value with `func(value)`, keeping its age."""
+        for key, (value, stored_at) in self._entries.items():
+            self._entries[key] = (func(value), stored_at)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Get hit/miss counters."""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,354 @@
+"""Call engine running voice assistants over Twilio Media Streams.
+
+Twilio connects each answered call (see `routes/calls.py`) to a websocket
+and exchanges JSON messages over it: `connected`, `start` with the
+stream parameters, `media` with base64 μ-law audio every 20 ms, `mark`
+echoes and `stop`. A `Call` feeds the inbound audio to speech-to-text.
+On each final transcript it streams a reply from the language model, and
+sends the reply to text-to-speech sentence by sentence while the model
+keeps generating. Audio is sent back as `media` messages, followed by a
+`mark`; Twilio echoes the mark once the audio has played. If the caller
+starts speaking over the assistant, the reply is cancelled and a `clear`
+message drops the audio Twilio has buffered. The greeting and goodbye
+are fixed phrases, played from the speech cache (see `speech_cache.py`).
+
+Latency is tracked per stage, and in two end-to-end metrics:
+
+- `time_to_first_audio`: from the `start` message to the first audio of
+  the greeting.
+- `turn_latency`: from the caller's last voiced frame to the first audio
+  of the reply.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import re
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncIterator, Deque, Dict, List, Optional
+from fastapi import WebSocket, WebSocketDisconnect
+from ..config import settings
+from ..database import db
+from ..voice_providers import TranscriptionStream, Transcript, get_llm, get_stt, get_tts
+from .speech_cache import speech_cache
+
+logger = logging.getLogger(__name__)
+
+# Where a reply may be cut into pieces for text-to-speech: after a sentence, or a clause once it is long enough
+SENTENCE_END = re.compile(r"[.!?;:]\s+$")
+CLAUSE_END = re.compile(r",\s+$")
+MIN_CLAUSE_WORDS = 8
+MAX_MARK_WAIT_SECONDS = 30.0
+
+
+class LatencyStats:
+    """Recent latency samples per metric, summarized as percentiles."""
+    
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+    
+    def record(self, metric: str, seconds: float) -> None:
+        """Add a sample to a metric."""
+        samples = self._samples.get(metric)
+        if samples is None:
+            samples = self._samples[metric] = deque(maxlen=self.window)
+        samples.append(seconds)
+        self._counts[metric] = self._counts.get(metric, 0) + 1
+    
+    def summary(self) -> Dict[str, dict]:
+        """Percentiles in milliseconds of the latest `window` samples of each metric."""
+        summary = {}
+        for metric, samples in self._samples.items():
+            ordered = sorted(samples)
+            
+            def percentile(p: float) -> float:
+                return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+            
+            summary[metric] = {
+                "count": self._counts[metric],
+                "p50_ms": percentile(0.5),
+                "p95_ms": percentile(0.95),
+                "p99_ms": percentile(0.99),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        return summary
+
+
+class Call:
+    """One call's stream: its pipeline, conversation and timing."""
+    
+    def __init__(self, service: "CallService", websocket: WebSocket, start: dict, assistant: dict, started_at: float):
+        self.service = service
+        self.websocket = websocket
+        self.stream_sid: str = start["streamSid"]
+        self.call_sid: str = start["start"].get("callSid", "")
+        self.assistant = assistant
+        self.started_at = started_at
+        self.messages: List[dict] = [{"role": "assistant", "content": assistant["first_message"]}]
+        self.stt = get_stt(settings.call_stt_provider)
+        self.llm = get_llm(settings.call_llm_provider or assistant["model_provider"])
+        self.tts = get_tts(settings.call_tts_provider)
+        self._transcripts: Optional[TranscriptionStream] = None
+        self._response: Optional[asyncio.Task] = None  # Greeting or reply being spoken
+        self._goodbye: Optional[asyncio.Task] = None
+        self._marks: Dict[str, asyncio.Future] = {}
+        self._mark_number = 0
+        self._ending = False
+    
+    @property
+    def loop_time(self) -> float:
+        return asyncio.get_running_loop().time()
+    
+    async def run(self) -> None:
+        """Run the call until the caller hangs up or it reaches its maximum duration."""
+        self._transcripts = self.stt.open_stream()
+        listener = asyncio.ensure_future(self._listen())
+        timer = asyncio.get_running_loop().call_later(
+            self.assistant["max_call_duration_seconds"], self._end_call
+        )
+        self._respond(self._speak(
+            speech_cache.speech(self.assistant["first_message"], self.assistant["voice"]),
+            "time_to_first_audio",
+            self.started_at,
+        ))
+        try:
+            await self._receive()
+        finally:
+            timer.cancel()
+            self._transcripts.close()
+            tasks = [task for task in (listener, self._response, self._goodbye) if task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _receive(self) -> None:
+        """Handle Twilio's messages until the stream stops."""
+        while True:
+            try:
+                message = json.loads(await self.websocket.receive_text())
+            except WebSocketDisconnect:
+                return
+            event = message.get("event")
+            if event == "media":
+                if message["media"].get("track", "inbound") == "inbound":
+                    self._transcripts.feed(base64.b64decode(message["media"]["payload"]))
+            elif event == "mark":
+                future = self._marks.pop(message["mark"]["name"], None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+            elif event == "stop":
+                return
+    
+    async def _listen(self) -> None:
+        """Answer final transcripts, and stop speaking when the caller talks over the assistant."""
+        async for transcript in self._transcripts:
+            if self._ending:
+                continue
+            if not transcript.is_final:
+                if self._response is not None and not self._response.done():
+                    await self._interrupt()
+                continue
+            if not transcript.text:
+                continue
+            self.service.stats.record("stt_final_delay", self.loop_time - transcript.speech_ended_at)
+            await self._interrupt()
+            self._respond(self._reply(transcript))
+    
+    def _respond(self, coroutine) -> None:
+        """Start speaking a response."""
+        self._response = asyncio.ensure_future(coroutine)
+        self._response.add_done_callback(self._log_failure)
+    
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Call {self.call_sid} failed to respond: {task.exception()!r}")
+    
+    async def _interrupt(self) -> None:
+        """Cancel the response being spoken, and drop its audio buffered at Twilio."""
+        response, self._response = self._response, None
+        if response is None or response.done():
+            return
+        response.cancel()
+        await asyncio.gather(response, return_exceptions=True)
+        await self._send({"event": "clear", "streamSid": self.stream_sid})
+        for future in self._marks.values():
+            future.cancel()
+        self._marks.clear()
+    
+    async def _reply(self, transcript: Transcript) -> None:
+        """Answer the caller, speaking the reply while it is generated."""
+        self.messages.append({"role": "user", "content": transcript.text})
+        spoken: List[str] = []
+        try:
+            await self._speak(self._synthesize(self._generate(spoken)), "turn_latency", transcript.speech_ended_at)
+        finally:
+            if spoken:
+                self.messages.append({"role": "assistant", "content": "".join(spoken).strip()})
+    
+    async def _generate(self, spoken: List[str]) -> AsyncIterator[str]:
+        """Stream the language model's reply in pieces for text-to-speech.
+        
+        The model runs in a task of its own, so it keeps generating while
+        earlier pieces are synthesized.
+        """
+        pieces: asyncio.Queue = asyncio.Queue()
+        requested_at = self.loop_time
+        
+        async def produce() -> None:
+            buffer = ""
+            first = True
+            try:
+                async with aclosing(self.llm.stream_reply(
+                    self.assistant["model_name"], self.assistant["system_prompt"], list(self.messages)
+                )) as tokens:
+                    async for token in tokens:
+                        if first:
+                            self.service.stats.record("llm_first_token", self.loop_time - requested_at)
+                            first = False
+                        buffer += token
+                        if SENTENCE_END.search(buffer) or (
+                            CLAUSE_END.search(buffer) and len(buffer.split()) >= MIN_CLAUSE_WORDS
+                        ):
+                            pieces.put_nowait(buffer)
+                            buffer = ""
+                if buffer.strip():
+                    pieces.put_nowait(buffer)
+            finally:
+                pieces.put_nowait(None)
+        
+        producer = asyncio.ensure_future(produce())
+        try:
+            while (piece := await pieces.get()) is not None:
+                spoken.append(piece)
+                yield piece
+            await producer  # Raises the model's errors
+        finally:
+            producer.cancel()
+    
+    async def _synthesize(self, pieces: AsyncIterator[str]) -> AsyncIterator[bytes]:
+        """Stream the speech of text pieces, in order."""
+        voice = self.assistant["voice"]
+        async with aclosing(pieces):
+            async for piece in pieces:
+                requested_at = self.loop_time
+                first = True
+                async with aclosing(self.tts.synthesize(piece, voice)) as chunks:
+                    async for chunk in chunks:
+                        if first:
+                            self.service.stats.record("tts_first_chunk", self.loop_time - requested_at)
+                            first = False
+                        yield chunk
+    
+    async def _speak(self, audio: AsyncIterator[bytes], metric: str, since: float) -> None:
+        """Send audio to the caller, recording the latency of its first chunk, and wait until it has played."""
+        first = True
+        async with aclosing(audio):
+            async for chunk in audio:
+                if first:
+                    self.service.stats.record(metric, self.loop_time - since)
+                    first = False
+                await self._send({
+                    "event": "media",
+                    "streamSid": self.stream_sid,
+                    "media": {"payload": base64.b64encode(chunk).decode()},
+                })
+        if not first:
+            await self._wait_played()
+    
+    async def _wait_played(self) -> None:
+        """Wait until Twilio has played the audio sent so far."""
+        self._mark_number += 1
+        name = f"{self.call_sid or self.stream_sid}-{self._mark_number}"
+        future = self._marks[name] = asyncio.get_running_loop().create_future()
+        await self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+        try:
+            await asyncio.wait_for(future, MAX_MARK_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            self._marks.pop(name, None)
+    
+    def _end_call(self) -> None:
+        """Say goodbye and hang up, at the maximum call duration."""
+        self._ending = True
+        self._goodbye = asyncio.ensure_future(self._say_goodbye())
+    
+    async def _say_goodbye(self) -> None:
+        await self._interrupt()
+        self._respond(self._speak(
+            speech_cache.speech(self.assistant["end_call_message"], self.assistant["voice"]),
+            "end_call_first_audio",
+            self.loop_time,
+        ))
+        await asyncio.gather(self._response, return_exceptions=True)
+        # Ends the <Connect> verb, and with it the call
+        try:
+            await self.websocket.close()
+        except RuntimeError:
+            pass  # Already closed by the caller
+    
+    async def _send(self, message: dict) -> None:
+        """Send a message to Twilio, ignoring a stream that is already gone."""
+        try:
+            await self.websocket.send_text(json.dumps(message))
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+
+class CallService:
+    """Service running the calls connected to this process."""
+    
+    def __init__(self):
+        self.calls: Dict[str, Call] = {}
+        self.calls_total = 0
+        self.stats = LatencyStats(settings.call_metrics_window)
+    
+    async def handle_stream(self, websocket: WebSocket) -> None:
+        """Run a call over an accepted Media Streams websocket."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except WebSocketDisconnect:
+                return
+            if message.get("event") == "start":
+                break
+        started_at = loop.time()
+        
+        parameters = message["start"].get("customParameters", {})
+        assistant = db.get_voice_assistant_by_id(parameters.get("business_id", ""), parameters.get("assistant_id", ""))
+        if assistant is None:
+            logger.warning(f"Media stream {message.get('streamSid')} is for an unknown assistant: {parameters}")
+            await websocket.close()
+            return
+        
+        try:
+            call = Call(self, websocket, message, assistant, started_at)
+        except ValueError as e:
+            # An unknown provider, e.g. the assistant's own with call_llm_provider unset
+            logger.error(f"Media stream {message.get('streamSid')} cannot be answered: {e}")
+            await websocket.close()
+            return
+        self.calls[call.stream_sid] = call
+        self.calls_total += 1
+        try:
+            await call.run()
+        except Exception as e:
+            logger.error(f"Call {call.call_sid} failed: {e}")
+        finally:
+            self.calls.pop(call.stream_sid, None)
+    
+    def get_stats(self) -> dict:
+        """Calls in progress and latency percentiles."""
+        return {
+            "active_calls": len(self.calls),
+            "calls_total": self.calls_total,
+            "latency": self.stats.summary(),
+            "speech_cache": speech_cache.stats(),
+        }
+
+
+# Global service instance
+call_service = CallService()
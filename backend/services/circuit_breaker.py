@@ -0,0 +1,136 @@
+"""Circuit breaker for calls to external services."""
+
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Failure-rate and latency based circuit breaker.
+
+    The outcomes of the last `window_size` calls are tracked. Once at least
+    `min_calls` were made, the circuit opens when the share of failed calls
+    reaches `failure_rate_threshold` or the share of calls slower than
+    `slow_call_seconds` reaches `slow_call_rate_threshold`. While open,
+    calls are rejected for `open_seconds`; after that a single probe call is
+    let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 3.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self._window: deque = deque(maxlen=window_size)  # (failed, slow) per call
+        self._state = self.CLOSED
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.rejected_calls = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the wait is over."""
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """Check whether a call may proceed; raises CircuitOpenError if not."""
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self.rejected_calls += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self, duration: float) -> None:
+        """Record a completed call and how long it took."""
+        slow = duration >= self.slow_call_seconds
+        if self._state == self.HALF_OPEN:
+            if slow:
+                self._open()
+            else:
+                self._close()
+            return
+        self._window.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self) -> None:
+        """Record a failed call."""
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._window.append((True, False))
+        self._evaluate()
+
+    def record_abandoned(self) -> None:
+        """Record a call the caller gave up on; it says nothing about the service."""
+        if self._state == self.HALF_OPEN:
+            # Let another call probe instead
+            self._probe_in_flight = False
+
+    def _evaluate(self) -> None:
+        """Open the circuit if the window exceeds a threshold."""
+        calls = len(self._window)
+        if self._state != self.CLOSED or calls < self.min_calls:
+            return
+        failure_rate = sum(failed for failed, _ in self._window) / calls
+        slow_rate = sum(slow for _, slow in self._window) / calls
+        if failure_rate >= self.failure_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            logger.warning(
+                f"Opening circuit '{self.name}': failure rate {failure_rate:.0%}, slow call rate {slow_rate:.0%}"
+            )
+            self._open()
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def _close(self) -> None:
+        logger.info(f"Closing circuit '{self.name}'")
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._window.clear()
+
+    def status(self) -> dict:
+        """Get the breaker state and window statistics."""
+        calls = len(self._window)
+        state = self.state
+        return {
+            "state": state,
+            "calls_in_window": calls,
+            "failure_rate": sum(failed for failed, _ in self._window) / calls if calls else 0.0,
+            "slow_call_rate": sum(slow for _, slow in self._window) / calls if calls else 0.0,
+            "rejected_calls": self.rejected_calls,
+            "retry_in_seconds": (
+                max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+                if state == self.OPEN else None
+            ),
+        }
@@ -0,0 +1,92 @@
+"""Background text extraction for knowledge base files."""
+
+import asyncio
+import logging
+from typing import Set
+from ..config import settings
+from ..database import db
+from ..embeddings import embed_texts
+from ..extraction import process_document
+from ..models.knowledge_base import IngestionStatus
+from .process_pool import WorkerPool
+from .storage_service import storage_service
+from .search_service import search_service
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionService:
+    """Service that extracts and chunks the text of uploaded files.
+    
+    Parsing and embedding are CPU-bound, so they run in a process pool and
+    never block the event loop. Results are stored per content hash, so a
+    document uploaded to several businesses is only processed once.
+    """
+    
+    def __init__(self):
+        self.pool = WorkerPool("ingestion", settings.ingestion_workers)
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def submit(self, business_id: str, file_record: dict) -> None:
+        """Start ingesting a file in the background."""
+        task = asyncio.ensure_future(self._ingest(business_id, file_record))
+        # Keep a reference so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def wait_idle(self) -> None:
+        """Wait until all submitted files are processed."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def _ingest(self, business_id: str, file_record: dict) -> None:
+        """Extract a file's text and record the outcome on the file record."""
+        file_id = file_record["id"]
+        if not db.update_knowledge_base_file(business_id, file_id, {"status": IngestionStatus.PROCESSING.value}):
+            return  # Deleted before processing started
+        
+        content_hash = file_record.get("content_hash")
+        try:
+            extracted = await storage_service.load_extracted(content_hash) if content_hash else None
+            vectors = None
+            if extracted is None or extracted.get("chunk_size") != settings.ingestion_chunk_size:
+                extracted = await self.pool.run(
+                    process_document,
+                    file_record["storage_path"],
+                    file_record["file_type"],
+                    settings.ingestion_chunk_size,
+                    settings.ingestion_chunk_overlap,
+                )
+                extracted["chunk_size"] = settings.ingestion_chunk_size
+                if content_hash:
+                    await storage_service.save_extracted(content_hash, extracted)
+            elif content_hash:
+                vectors = await storage_service.load_vectors(content_hash, search_service.embedding_model)
+            
+            if vectors is None or len(vectors) != len(extracted["chunks"]):
+                vectors = await self.pool.run(
+                    embed_texts,
+                    settings.embedding_provider,
+                    settings.embedding_dim,
+                    extracted["chunks"],
+                )
+                if content_hash:
+                    await storage_service.save_vectors(content_hash, search_service.embedding_model, vectors)
+        except Exception as e:
+            logger.error(f"Failed to ingest {file_record['filename']} ({file_id}): {e}")
+            db.update_knowledge_base_file(business_id, file_id, {"status": IngestionStatus.FAILED.value})
+            return
+        
+        if db.update_knowledge_base_file(business_id, file_id, {
+            "status": IngestionStatus.READY.value,
+            "chunk_count": len(extracted["chunks"]),
+            "page_count": extracted["pages"],
+        }):
+            try:
+                await search_service.add_file(business_id, file_id, file_record["filename"], extracted["chunks"], vectors)
+            except Exception as e:
+                logger.error(f"Failed to index {file_record['filename']} ({file_id}): {e}")
+
+
+# Global service instance
+ingestion_service = IngestionService()
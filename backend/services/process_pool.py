@@ -0,0 +1,68 @@
+"""Process pool for CPU-bound work that survives its workers dying."""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """Process pool started on first use.
+    
+    A worker that dies (killed for memory, crashed in a native parser)
+    breaks a ProcessPoolExecutor for good. The broken executor is then shut
+    down and replaced, and the call that hit it is retried once.
+    """
+    
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.restarts = 0
+        self.stopped = False
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Lazily start the worker processes."""
+        if self._executor is None:
+            # forkserver: workers are not forked from a process running threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return self._executor
+    
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken executor, unless another call already replaced it."""
+        if self._executor is executor:
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run `func(*args)` in a worker process."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self.executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                self._discard(executor)
+                if attempt or self.stopped:
+                    raise
+                logger.warning(f"A {self.name} worker process died; restarting the pool and retrying")
+    
+    def shutdown(self) -> None:
+        """Stop the worker processes, if started, abandoning calls in progress."""
+        self.stopped = True
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            # A worker only exits when told to, and the executor's own exit
+            # hook does not run when the server dies of a signal
+            for process in list((executor._processes or {}).values()):
+                process.terminate()
+            executor.shutdown(wait=False, cancel_futures=True)
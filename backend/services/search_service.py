@@ -0,0 +1,544 @@
+"""Keyword (BM25) and semantic search over the extracted text of knowledge base files.
+
+A business's index is a set of immutable segment files (see
+`backend.segments`) in `<upload_dir>/indexes/<business_id>/`, listed in
+`manifest.json`:
+
+    {"version": 2, "embedding_model": "hashing-256",
+     "segments": [{"name": "<id>.seg", "files": {"<file_id>": <chunks>},
+                   "refs": ["<referenced segment>", ...]}],
+     "removed": ["<file_id>", ...]}
+
+A newly ingested file is written as a segment of its own. Its chunks that
+near-duplicate live chunks already indexed (by MinHash, see
+`backend.dedup`) are only stored as references to them, so a revised or
+re-uploaded document costs little more than its changes; results list
+every file a chunk comes from. A deleted file is listed in `removed`, and
+segments left with only removed files are dropped once nothing references
+them.
+Once there are more than `search_max_segments` segments, or removed files
+make up a quarter of the chunks, all segments are merged into one in a
+worker process.
+
+The manifest is only changed under an exclusive lock on `.lock` and is
+replaced atomically, so all worker processes share the same index files
+through the page cache, and pick up changes by checking the manifest's
+inode and modification time.
+"""
+
+import asyncio
+import copy
+import fcntl
+import heapq
+import json
+import logging
+import math
+import os
+import shutil
+import uuid
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from ..config import settings
+from ..database import db
+from ..embeddings import Embedder, get_embedder
+from ..extraction import tokenize
+from ..models.knowledge_base import IngestionStatus, SearchMode
+from ..dedup import minhash
+from ..segments import Segment, build_segment, link_segments, merge_segments, write_segment
+from .process_pool import WorkerPool
+from .storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal rank fusion constant; damps the weight of the top ranks
+
+# Chunks are addressed as (segment position, chunk number)
+ChunkKey = Tuple[int, int]
+
+
+class BusinessIndex:
+    """Search over the segments of one business, as of one manifest version."""
+    
+    def __init__(self, segments: List[Segment], version: Tuple[int, int], removed: Set[str]):
+        self.segments = segments
+        self.version = version
+        self.removed = removed
+        live, self.references = link_segments(segments, removed)
+        for segment, segment_live in zip(segments, live):
+            segment.set_live(segment_live)
+    
+    def find_duplicates(self, signatures: np.ndarray, threshold: float) -> List[Optional[ChunkKey]]:
+        """Find the most similar live chunk of any segment for each MinHash signature."""
+        matches: List[Optional[ChunkKey]] = [None] * len(signatures)
+        best = np.zeros(len(signatures))
+        for position, segment in enumerate(self.segments):
+            numbers, scores = segment.find_duplicates(signatures, threshold)
+            for row in np.flatnonzero((numbers >= 0) & (scores > best)).tolist():
+                matches[row] = (position, int(numbers[row]))
+                best[row] = scores[row]
+        return matches
+    
+    def sources(self, key: ChunkKey) -> List[Tuple[str, str, int]]:
+        """Get `(file_id, filename, chunk index)` of the live files a chunk comes from."""
+        position, number = key
+        return self.segments[position].sources(number, self.removed) + self.references.get(key, [])
+    
+    def stats(self) -> dict:
+        """Size of the index, and how much deduplication saved."""
+        files = {
+            file_id for segment in self.segments for file_id, _ in segment.files if file_id not in self.removed
+        }
+        source_chunks = sum(
+            len(self.sources((position, number)))
+            for position, segment in enumerate(self.segments)
+            for number in np.flatnonzero(segment.live).tolist()
+        )
+        indexed_chunks = sum(segment.live_chunks for segment in self.segments)
+        return {
+            "segments": len(self.segments),
+            "files": len(files),
+            "source_chunks": source_chunks,
+            "indexed_chunks": indexed_chunks,
+            "duplicate_chunks": source_chunks - indexed_chunks,
+            "reduction": (source_chunks - indexed_chunks) / source_chunks if source_chunks else 0.0,
+            "size_bytes": sum(segment.size for segment in self.segments),
+        }
+    
+    def _keyword(self, query: str, limit: int) -> List[Tuple[ChunkKey, float]]:
+        """Rank chunks by BM25, with statistics over all segments."""
+        terms = set(tokenize(query))
+        live_chunks = sum(segment.live_chunks for segment in self.segments)
+        if not terms or not live_chunks:
+            return []
+        avg_length = sum(segment.total_length for segment in self.segments) / live_chunks or 1.0
+        found = [
+            {term: number for term in terms if (number := segment.find_term(term)) >= 0}
+            for segment in self.segments
+        ]
+        idf = {}
+        for term in terms:
+            df = sum(segment.doc_freq(term, numbers[term]) for segment, numbers in zip(self.segments, found) if term in numbers)
+            if df > 0:
+                idf[term] = math.log(1 + (live_chunks - df + 0.5) / (df + 0.5))
+        
+        ranked = []
+        for position, (segment, numbers) in enumerate(zip(self.segments, found)):
+            idfs = {number: idf[term] for term, number in numbers.items() if term in idf}
+            for number, score in segment.bm25(idfs, avg_length, limit, BM25_K1, BM25_B):
+                ranked.append(((position, number), score))
+        return heapq.nlargest(limit, ranked, key=itemgetter(1))
+    
+    def _semantic(self, query_vector: np.ndarray, limit: int, nprobe: Optional[int]) -> List[Tuple[ChunkKey, float]]:
+        """Rank chunks by cosine similarity to the query."""
+        ranked = []
+        for position, segment in enumerate(self.segments):
+            rows, scores = segment.vector_index.search(query_vector[np.newaxis], limit, nprobe)[0]
+            # Unrelated texts score around zero; only keep similar ones
+            ranked += [((position, row), score) for row, score in zip(rows.tolist(), scores.tolist()) if score > 0]
+        return heapq.nlargest(limit, ranked, key=itemgetter(1))
+    
+    def search(
+        self,
+        query: str,
+        query_vector: Optional[np.ndarray],
+        limit: int,
+        mode: SearchMode,
+        nprobe: Optional[int],
+    ) -> List[dict]:
+        """Search in `mode`; hybrid merges both rankings by reciprocal rank fusion."""
+        # Look deeper than `limit` in each ranking, so fusion has overlap to work with
+        depth = limit if mode != SearchMode.HYBRID else max(4 * limit, 20)
+        rankings = []
+        if mode != SearchMode.SEMANTIC:
+            rankings.append(self._keyword(query, depth))
+        if mode != SearchMode.KEYWORD:
+            rankings.append(self._semantic(query_vector, depth, nprobe))
+        
+        if mode == SearchMode.HYBRID:
+            fused: Dict[ChunkKey, float] = {}
+            for ranking in rankings:
+                for rank, (key, _) in enumerate(ranking):
+                    fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            ranked = heapq.nlargest(limit, fused.items(), key=itemgetter(1))
+        else:
+            ranked = rankings[0]
+        
+        results = []
+        for key, score in ranked:
+            sources = [
+                {"file_id": file_id, "filename": filename, "chunk_index": index}
+                for file_id, filename, index in self.sources(key)
+            ]
+            results.append({
+                **sources[0],
+                "score": score,
+                "text": self.segments[key[0]].text(key[1]),
+                "sources": sources,
+            })
+        return results
+
+
+class SearchService:
+    """Service for searching knowledge bases, whose indexes are kept on disk."""
+    
+    def __init__(self):
+        self.index_dir = Path(settings.upload_dir) / "indexes"
+        self._indexes: Dict[str, BusinessIndex] = {}
+        self._building: Dict[str, asyncio.Task] = {}
+        self._merging: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        # Builds and merges are rare, so one process is enough
+        self.pool = WorkerPool("search index", max_workers=1)
+    
+    @property
+    def embedder(self) -> Embedder:
+        """The configured embedder."""
+        return get_embedder(settings.embedding_provider, settings.embedding_dim)
+    
+    @property
+    def embedding_model(self) -> str:
+        """Key of stored embeddings, which are only valid for the embedder that made them."""
+        return f"{settings.embedding_provider}-{settings.embedding_dim}"
+    
+    def _get_business_dir(self, business_id: str) -> Path:
+        """Get the index directory of a business."""
+        return self.index_dir / business_id
+    
+    def _new_segment_path(self, business_id: str) -> Path:
+        """Get an unused path for a new segment of a business."""
+        business_dir = self._get_business_dir(business_id)
+        business_dir.mkdir(parents=True, exist_ok=True)
+        return business_dir / f"{uuid.uuid4().hex}.seg"
+    
+    def _read_manifest(self, business_id: str) -> Optional[dict]:
+        """Read a business's manifest, or None if it has none for the current embedder."""
+        try:
+            manifest = json.loads((self._get_business_dir(business_id) / "manifest.json").read_text())
+        except FileNotFoundError:
+            return None
+        if manifest["version"] != MANIFEST_VERSION or manifest["embedding_model"] != self.embedding_model:
+            return None
+        return manifest
+    
+    def _update_manifest(self, business_id: str, update: Callable[[Optional[dict]], Optional[dict]]) -> bool:
+        """Change a business's manifest under its lock; blocking.
+        
+        `update` gets the current manifest (None if there is none usable)
+        and returns the new one, or None to keep it. Segment files that are
+        no longer listed are deleted; processes that have them open keep
+        reading them until they reload.
+        """
+        business_dir = self._get_business_dir(business_id)
+        business_dir.mkdir(parents=True, exist_ok=True)
+        with open(business_dir / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # Released when the file is closed
+            manifest = self._read_manifest(business_id)
+            updated = update(copy.deepcopy(manifest))
+            if updated is None:
+                return False
+            temp_path = business_dir / f".{uuid.uuid4().hex}.part"
+            temp_path.write_text(json.dumps(updated))
+            os.replace(temp_path, business_dir / "manifest.json")
+        
+        kept = {segment["name"] for segment in updated["segments"]}
+        for segment in (manifest or {}).get("segments", []):
+            if segment["name"] not in kept:
+                (business_dir / segment["name"]).unlink(missing_ok=True)
+        return True
+    
+    def _discard_manifest(self, business_id: str, manifest: dict) -> None:
+        """Delete a manifest and its segments, unless it was changed meanwhile; blocking."""
+        business_dir = self._get_business_dir(business_id)
+        with open(business_dir / ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # Released when the file is closed
+            if self._read_manifest(business_id) != manifest:
+                return
+            (business_dir / "manifest.json").unlink()
+        for segment in manifest["segments"]:
+            (business_dir / segment["name"]).unlink(missing_ok=True)
+    
+    @staticmethod
+    def _manifest_version(manifest_path: Path) -> Optional[Tuple[int, int]]:
+        """Identify the current manifest by its inode and modification time, or None if there is none."""
+        try:
+            stat_result = os.stat(manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat_result.st_ino, stat_result.st_mtime_ns
+    
+    async def get_index(self, business_id: str) -> BusinessIndex:
+        """Get a business's index, building it on first use and reloading it after changes."""
+        manifest_path = self._get_business_dir(business_id) / "manifest.json"
+        while True:
+            version = self._manifest_version(manifest_path)
+            index = self._indexes.get(business_id)
+            if index is not None and index.version == version:
+                return index
+            
+            manifest = self._read_manifest(business_id) if version else None
+            if manifest is None:
+                await self._build(business_id)
+                continue
+            index = self._open(business_id, manifest, version, index)
+            if index is not None:
+                self._indexes[business_id] = index
+                return index
+            # Usually a segment was merged away meanwhile, so the manifest changed too.
+            # If it did not, the index lost a segment file; rebuild it from the ingested files.
+            if self._manifest_version(manifest_path) == version:
+                logger.error(f"Index of business {business_id} lists a missing segment, rebuilding it")
+                await asyncio.to_thread(self._discard_manifest, business_id, manifest)
+    
+    def _open(
+        self,
+        business_id: str,
+        manifest: dict,
+        version: Tuple[int, int],
+        previous: Optional[BusinessIndex],
+    ) -> Optional[BusinessIndex]:
+        """Open the segments of a manifest, reusing those already open.
+        
+        Returns None if a segment no longer exists.
+        """
+        business_dir = self._get_business_dir(business_id)
+        opened = {segment.name: segment for segment in previous.segments} if previous else {}
+        segments = []
+        for entry in manifest["segments"]:
+            segment = opened.get(entry["name"])
+            if segment is None:
+                try:
+                    segment = Segment(str(business_dir / entry["name"]))
+                except FileNotFoundError:
+                    return None
+            segments.append(segment)
+        return BusinessIndex(segments, version, set(manifest["removed"]))
+    
+    async def _build(self, business_id: str) -> None:
+        """Build a business's first segment, once even when called concurrently."""
+        task = self._building.get(business_id)
+        if task is None:
+            task = self._building[business_id] = asyncio.ensure_future(self._build_segment(business_id))
+            task.add_done_callback(lambda _: self._building.pop(business_id, None))
+        await asyncio.shield(task)
+    
+    async def _build_segment(self, business_id: str) -> None:
+        """Index the stored extraction results of all ingested files of a business."""
+        model = self.embedding_model
+        sources = [
+            (record["id"], record["filename"], *storage_service.get_extracted_paths(record["content_hash"], model))
+            for record in db.get_knowledge_base_files(business_id)
+            if record.get("status") == IngestionStatus.READY.value and record.get("content_hash")
+        ]
+        path = self._new_segment_path(business_id)
+        files = {}
+        if sources:
+            files = await self.pool.run(
+                build_segment,
+                str(path),
+                sources,
+                settings.embedding_provider,
+                settings.embedding_dim,
+                settings.vector_ivf_min_chunks,
+                settings.dedup_threshold,
+            )
+        
+        def update(manifest: Optional[dict]) -> Optional[dict]:
+            if manifest is not None:
+                return None  # Built by another process meanwhile
+            segments = [{"name": path.name, "files": files, "refs": []}] if files else []
+            return {"version": MANIFEST_VERSION, "embedding_model": model, "segments": segments, "removed": []}
+        
+        if not await asyncio.to_thread(self._update_manifest, business_id, update) or not files:
+            path.unlink(missing_ok=True)
+            return
+        # Files deleted while building were not in the index to be removed from
+        for file_id in files:
+            if not db.get_knowledge_base_file_by_id(business_id, file_id):
+                await self.remove_file(business_id, file_id)
+    
+    async def add_file(self, business_id: str, file_id: str, filename: str, chunks: List[str], vectors: np.ndarray) -> None:
+        """Add a newly ingested file to the business's index, as a segment of its own.
+        
+        Chunks that near-duplicate live chunks already indexed are stored as
+        references to them.
+        """
+        signatures = await asyncio.to_thread(minhash, chunks)
+        while True:
+            # Builds the index from all ingested files if there is none, usually including this one
+            index = await self.get_index(business_id)
+            manifest = self._read_manifest(business_id)
+            if manifest is None or any(file_id in segment["files"] for segment in manifest["segments"]):
+                return
+            
+            matches = index.find_duplicates(signatures, settings.dedup_threshold)
+            kept = [number for number, match in enumerate(matches) if match is None]
+            refs = [
+                (index.segments[match[0]].name, match[1], 0, number)
+                for number, match in enumerate(matches) if match is not None
+            ]
+            ref_names = sorted({name for name, *_ in refs})
+            path = self._new_segment_path(business_id)
+            files = await asyncio.to_thread(
+                write_segment,
+                str(path),
+                [(file_id, filename)],
+                [chunks[number] for number in kept],
+                vectors[kept],
+                signatures[kept],
+                [[(0, number)] for number in kept],
+                settings.embedding_dim,
+                settings.vector_ivf_min_chunks,
+                settings.dedup_threshold,
+                refs,
+            )
+            stale = False
+            
+            def update(manifest: Optional[dict]) -> Optional[dict]:
+                nonlocal stale
+                if manifest is None or any(file_id in segment["files"] for segment in manifest["segments"]):
+                    return None
+                if not set(ref_names) <= {segment["name"] for segment in manifest["segments"]}:
+                    stale = True  # Referenced segments were merged meanwhile
+                    return None
+                manifest["segments"].append({"name": path.name, "files": files, "refs": ref_names})
+                return manifest
+            
+            if await asyncio.to_thread(self._update_manifest, business_id, update):
+                break
+            path.unlink(missing_ok=True)
+            if not stale:
+                return
+        
+        logger.info(f"Indexed {filename} of business {business_id}: {len(chunks)} chunks, {len(refs)} duplicates")
+        if not db.get_knowledge_base_file_by_id(business_id, file_id):
+            await self.remove_file(business_id, file_id)  # Deleted while indexing
+        self._maybe_merge(business_id)
+    
+    async def remove_file(self, business_id: str, file_id: str) -> None:
+        """Remove a deleted file from the business's index."""
+        if not (self._get_business_dir(business_id) / "manifest.json").exists():
+            return
+        
+        def update(manifest: Optional[dict]) -> Optional[dict]:
+            if manifest is None or file_id in manifest["removed"]:
+                return None
+            if not any(file_id in segment["files"] for segment in manifest["segments"]):
+                return None
+            manifest["removed"].append(file_id)
+            # Drop segments of only removed files that nothing references, which
+            # may leave segments they referenced unreferenced in turn
+            removed = set(manifest["removed"])
+            while True:
+                referenced = {name for segment in manifest["segments"] for name in segment["refs"]}
+                dropped = [
+                    segment for segment in manifest["segments"]
+                    if segment["name"] not in referenced and removed.issuperset(segment["files"])
+                ]
+                if not dropped:
+                    break
+                for segment in dropped:
+                    manifest["segments"].remove(segment)
+            listed = {file_id for segment in manifest["segments"] for file_id in segment["files"]}
+            manifest["removed"] = [file_id for file_id in manifest["removed"] if file_id in listed]
+            return manifest
+        
+        await asyncio.to_thread(self._update_manifest, business_id, update)
+        self._maybe_merge(business_id)
+    
+    async def drop_business(self, business_id: str) -> None:
+        """Delete the index of a deleted business."""
+        self._indexes.pop(business_id, None)
+        await asyncio.to_thread(shutil.rmtree, self._get_business_dir(business_id), ignore_errors=True)
+    
+    def _maybe_merge(self, business_id: str) -> None:
+        """Start merging a business's segments if there are many or they hold many removed chunks."""
+        manifest = self._read_manifest(business_id)
+        if manifest is None or business_id in self._merging:
+            return
+        segments = manifest["segments"]
+        removed = set(manifest["removed"])
+        total_chunks = sum(sum(segment["files"].values()) for segment in segments)
+        removed_chunks = sum(
+            count for segment in segments for file_id, count in segment["files"].items() if file_id in removed
+        )
+        if len(segments) <= settings.search_max_segments and removed_chunks * 4 <= total_chunks:
+            return
+        
+        self._merging.add(business_id)
+        task = asyncio.ensure_future(self._merge(business_id, manifest))
+        # Keep a reference so the task is not garbage collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _merge(self, business_id: str, manifest: dict) -> None:
+        """Merge the segments listed in a manifest into one, leaving out removed files."""
+        business_dir = self._get_business_dir(business_id)
+        names = {segment["name"] for segment in manifest["segments"]}
+        removed = set(manifest["removed"])
+        path = self._new_segment_path(business_id)
+        retry = False
+        try:
+            files = await self.pool.run(
+                merge_segments,
+                str(path),
+                [str(business_dir / segment["name"]) for segment in manifest["segments"]],
+                removed,
+                settings.embedding_dim,
+                settings.vector_ivf_min_chunks,
+                settings.dedup_threshold,
+            )
+            
+            def update(current: Optional[dict]) -> Optional[dict]:
+                nonlocal retry
+                if current is None or not names <= {segment["name"] for segment in current["segments"]}:
+                    return None  # Merged by another process meanwhile
+                others = [segment for segment in current["segments"] if segment["name"] not in names]
+                if any(names & set(segment["refs"]) for segment in others):
+                    # Added meanwhile with references into the merged segments; merge again with them
+                    retry = True
+                    return None
+                current["segments"] = ([{"name": path.name, "files": files, "refs": []}] if files else []) + others
+                current["removed"] = [file_id for file_id in current["removed"] if file_id not in removed]
+                return current
+            
+            if not await asyncio.to_thread(self._update_manifest, business_id, update) or not files:
+                path.unlink(missing_ok=True)
+        except Exception as e:
+            logger.error(f"Failed to merge search segments of business {business_id}: {e}")
+            path.unlink(missing_ok=True)
+        finally:
+            self._merging.discard(business_id)
+        if retry:
+            self._maybe_merge(business_id)
+    
+    async def wait_idle(self) -> None:
+        """Wait until running merges are finished."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def search(
+        self,
+        business_id: str,
+        query: str,
+        limit: int = 5,
+        mode: SearchMode = SearchMode.HYBRID,
+        nprobe: Optional[int] = None,
+    ) -> List[dict]:
+        """Search a business's knowledge base."""
+        index = await self.get_index(business_id)
+        query_vector = self.embedder.embed([query])[0] if mode != SearchMode.KEYWORD else None
+        return index.search(query, query_vector, limit, mode, nprobe or settings.vector_nprobe)
+    
+    async def get_stats(self, business_id: str) -> dict:
+        """Get the size of a business's index and the chunks saved by deduplication."""
+        index = await self.get_index(business_id)
+        return index.stats()
+
+
+# Global service instance
+search_service = SearchService()
@@ -0,0 +1,145 @@
+"""Pre-synthesized speech for the fixed phrases of voice assistants."""
+
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Iterable, Optional
+from ..config import settings
+from ..voice_providers import TextToSpeech, get_tts
+
+logger = logging.getLogger(__name__)
+
+# Assistant fields spoken the same way on every call
+FIXED_PHRASES = ("first_message", "end_call_message")
+
+
+class SpeechCache:
+    """Cache of synthesized speech, as telephony μ-law ready to stream.
+    
+    Every call opens with the assistant's `first_message` and closes with
+    its `end_call_message`. They are synthesized in the background when an
+    assistant is created or they change, so calls play them without
+    waiting for text-to-speech. Clips are keyed by the hash of the
+    text-to-speech provider, voice and text, so assistants saying the same
+    thing share one clip, and a changed phrase never plays stale audio.
+    Clips total at most `max_bytes`; the least recently played are evicted.
+    
+    The cache lives in each process. A call to a worker that has not
+    synthesized a phrase yet streams it live, and caches it for later
+    calls.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._clips: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.synthesized = 0
+        self.evictions = 0
+    
+    @property
+    def tts(self) -> TextToSpeech:
+        return get_tts(settings.call_tts_provider)
+    
+    @staticmethod
+    def key(text: str, voice: str) -> str:
+        """Content key of the speech of a text."""
+        content = "\0".join((settings.call_tts_provider, voice, text))
+        return hashlib.sha256(content.encode()).hexdigest()
+    
+    def prepare(self, assistant: dict, fields: Iterable[str] = FIXED_PHRASES) -> None:
+        """Start synthesizing the fixed phrases of an assistant that are not cached yet."""
+        for field in fields:
+            text = assistant.get(field)
+            if not text:
+                continue
+            key = self.key(text, assistant["voice"])
+            if key in self._clips or key in self._inflight:
+                continue
+            task = self._inflight[key] = asyncio.ensure_future(self._synthesize(key, text, assistant["voice"]))
+            task.add_done_callback(self._log_error)
+    
+    async def _synthesize(self, key: str, text: str, voice: str) -> None:
+        """Synthesize and store a clip."""
+        try:
+            chunks = []
+            async with aclosing(self.tts.synthesize(text, voice)) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk)
+            self.synthesized += 1
+            self._store(key, b"".join(chunks))
+        finally:
+            self._inflight.pop(key, None)
+    
+    @staticmethod
+    def _log_error(task: asyncio.Task) -> None:
+        """Log failed background synthesis; calls fall back to live synthesis."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Speech synthesis failed: {task.exception()}")
+    
+    def _store(self, key: str, clip: bytes) -> None:
+        """Add a clip, evicting the least recently played ones if over the size limit."""
+        if len(clip) > self.max_bytes:
+            return
+        previous = self._clips.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._clips[key] = clip
+        self._size += len(clip)
+        while self._size > self.max_bytes:
+            _, evicted = self._clips.popitem(last=False)
+            self._size -= len(evicted)
+            self.evictions += 1
+    
+    def get(self, text: str, voice: str) -> Optional[bytes]:
+        """Get the cached speech of a text, or None."""
+        key = self.key(text, voice)
+        clip = self._clips.get(key)
+        if clip is not None:
+            self._clips.move_to_end(key)
+        return clip
+    
+    async def speech(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        """Stream the speech of a text: the cached clip, or live synthesis that is cached once complete."""
+        clip = self.get(text, voice)
+        if clip is not None:
+            self.hits += 1
+            yield clip
+            return
+        
+        # Still synthesizing in the background, or not prepared here: streaming live starts sooner than waiting
+        self.misses += 1
+        key = self.key(text, voice)
+        chunks = []
+        async with aclosing(self.tts.synthesize(text, voice)) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        if key not in self._inflight:
+            self._store(key, b"".join(chunks))
+    
+    async def wait_idle(self) -> None:
+        """Wait until all background synthesis is done."""
+        while self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+    
+    def stats(self) -> dict:
+        """Get the size and hit/miss counters of the cache."""
+        return {
+            "clips": len(self._clips),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "synthesizing": len(self._inflight),
+            "synthesized": self.synthesized,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Global service instance
+speech_cache = SpeechCache(settings.speech_cache_max_mb * 1024 * 1024)
@@ -1,10 +1,50 @@
-"""Storage service for file management."""
+"""Storage service for file management.
 
+File contents are stored once per distinct SHA-256 under
+`<upload_dir>/blobs/<hash[:2]>/<hash>`. Each knowledge-base file is a hard
+link to its blob at `<upload_dir>/<business_id>/<random id><extension>`
+(created with `os.link`, which never overwrites), so a business directory
+(together with the `content_hash` on its database records) is its
+manifest, and a blob's link count is its reference count: a blob whose
+only remaining link is itself is garbage.
+"""
+
+import asyncio
+import hashlib
+import json
 import os
+import shutil
+import threading
+import uuid
 import aiofiles
+import numpy as np
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, List, Optional, Tuple
+from fastapi import UploadFile
 from ..config import settings
+from ..records import parse_id
+
+
+class UploadAbortedError(Exception):
+    """Raised in an upload's worker thread when the upload was cancelled."""
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the size limit."""
+    
+    def __init__(self, filename: str, max_size: int):
+        super().__init__(f"File {filename} exceeds maximum size of {max_size} bytes")
+        self.filename = filename
+
+
+@dataclass
+class StoredFile:
+    """A file written to storage."""
+    
+    path: str
+    size: int
+    sha256: str
 
 
 class StorageService:
@@ -12,6 +52,8 @@ class StorageService:
     
     def __init__(self):
         self.upload_dir = Path(settings.upload_dir)
+        self.blob_dir = self.upload_dir / "blobs"
+        self.extracted_dir = self.upload_dir / "extracted"
     
     def _ensure_dir(self, path: Path) -> None:
         """Ensure a directory exists."""
@@ -21,53 +63,272 @@ class StorageService:
         """Get the storage directory for a business."""
         return self.upload_dir / business_id
     
-    async def save_file(
+    def _blob_path(self, sha256: str) -> Path:
+        """Get the path of the blob for a content hash."""
+        return self.blob_dir / sha256[:2] / sha256
+    
+    def _new_storage_path(self, business_dir: Path, filename: str) -> Path:
+        """Get a fresh storage path for `filename`.
+        
+        Stored files are named by a random ID plus the original extension;
+        the original filename is only kept in the database record.
+        """
+        return business_dir / f"{uuid.uuid4().hex}{Path(filename).suffix.lower()}"
+    
+    def _link_new(self, source_path: Path, sha256: str, business_dir: Path, filename: str) -> Path:
+        """Link the blob for `source_path` into `business_dir` under a new name."""
+        while True:
+            target_path = self._new_storage_path(business_dir, filename)
+            try:
+                self._link_blob(source_path, sha256, target_path)
+                return target_path
+            except FileExistsError:
+                continue  # os.link never overwrites; pick another ID
+    
+    def _link_blob(self, source_path: Path, sha256: str, target_path: Path) -> None:
+        """Store `source_path` as the blob for `sha256` and link it at `target_path`.
+        
+        If the blob already exists the source copy is simply not used.
+        """
+        blob_path = self._blob_path(sha256)
+        self._ensure_dir(blob_path.parent)
+        while True:
+            try:
+                os.link(source_path, blob_path)
+            except FileExistsError:
+                pass  # Already stored by an earlier upload
+            try:
+                os.link(blob_path, target_path)
+                return
+            except FileNotFoundError:
+                continue  # Collected between the two links; store it again
+    
+    def _extracted_path(self, sha256: str) -> Path:
+        """Get the path of the extracted text chunks for a content hash."""
+        return self.extracted_dir / sha256[:2] / f"{sha256}.json"
+    
+    def _vectors_path(self, sha256: str, model: str) -> Path:
+        """Get the path of the chunk embeddings by `model` for a content hash."""
+        return self.extracted_dir / sha256[:2] / f"{sha256}.{model}.npy"
+    
+    def get_extracted_paths(self, sha256: str, model: str) -> Tuple[str, str]:
+        """Get the paths of a blob's extracted text and embeddings, for worker processes."""
+        return str(self._extracted_path(sha256)), str(self._vectors_path(sha256, model))
+    
+    def _remove_extracted(self, sha256: str) -> None:
+        """Delete the extracted text and embeddings for a content hash."""
+        for path in (self.extracted_dir / sha256[:2]).glob(f"{sha256}.*"):
+            path.unlink(missing_ok=True)
+    
+    def _release_blob(self, sha256: str) -> None:
+        """Delete the blob for `sha256` if nothing links to it anymore."""
+        blob_path = self._blob_path(sha256)
+        try:
+            if blob_path.stat().st_nlink <= 1:
+                blob_path.unlink()
+                self._remove_extracted(sha256)
+        except FileNotFoundError:
+            pass
+    
+    def _copy_upload(
         self,
-        business_id: str,
+        source: BinaryIO,
+        temp_path: Path,
         filename: str,
-        content: bytes,
-    ) -> str:
-        """Save a file to storage and return the storage path."""
+        max_size: int,
+        abort: threading.Event,
+    ) -> Tuple[int, str]:
+        """Copy an upload to `temp_path` in chunks; returns its size and SHA-256.
+        
+        Runs in a worker thread. The temporary file is removed on errors and
+        when `abort` is set.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while chunk := source.read(settings.upload_chunk_size):
+                    if abort.is_set():
+                        raise UploadAbortedError(filename)
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(filename, max_size)
+                    digest.update(chunk)
+                    f.write(chunk)
+                if abort.is_set():
+                    raise UploadAbortedError(filename)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return size, digest.hexdigest()
+    
+    async def save_upload(
+        self,
+        business_id: str,
+        upload: UploadFile,
+        max_size: int,
+    ) -> StoredFile:
+        """Stream an upload to storage in chunks and return where it was stored.
+        
+        The file is written to a temporary name while its size and SHA-256
+        are computed, then linked into place from its blob, so only one
+        chunk is held in memory and a partially written file is never
+        visible. Raises FileTooLargeError as soon as more than `max_size`
+        bytes arrive.
+        
+        The copy runs in a worker thread; hashing and file I/O release the
+        GIL, so several uploads are stored in parallel.
+        """
+        # Starlette knows the size of spooled uploads; reject those early
+        if upload.size is not None and upload.size > max_size:
+            raise FileTooLargeError(upload.filename, max_size)
+        
         business_dir = self._get_business_dir(business_id)
         self._ensure_dir(business_dir)
+        temp_path = business_dir / f".{uuid.uuid4().hex}.part"
         
-        # Create unique filename to avoid collisions
-        base_name = Path(filename).stem
-        extension = Path(filename).suffix
+        abort = threading.Event()
+        try:
+            size, sha256 = await asyncio.to_thread(
+                self._copy_upload, upload.file, temp_path, upload.filename, max_size, abort
+            )
+        except asyncio.CancelledError:
+            # The thread may still be running; it stops at its next chunk
+            abort.set()
+            temp_path.unlink(missing_ok=True)
+            raise
         
-        # Check for existing file with same name
-        target_path = business_dir / filename
-        counter = 1
-        while target_path.exists():
-            target_path = business_dir / f"{base_name}_{counter}{extension}"
-            counter += 1
+        try:
+            target_path = self._link_new(temp_path, sha256, business_dir, upload.filename)
+        finally:
+            temp_path.unlink(missing_ok=True)
         
-        # Save file
-        async with aiofiles.open(target_path, 'wb') as f:
-            await f.write(content)
+        return StoredFile(path=str(target_path), size=size, sha256=sha256)
+    
+    def _hash_file(self, path: Path) -> Tuple[int, str]:
+        """Get a file's size and SHA-256, reading it in chunks."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while chunk := f.read(settings.upload_chunk_size):
+                size += len(chunk)
+                digest.update(chunk)
+        return size, digest.hexdigest()
+    
+    async def store_file(self, business_id: str, source_path: Path, filename: str) -> StoredFile:
+        """Store a file that is already on disk, without copying its content.
         
-        return str(target_path)
+        `source_path` must be on the same filesystem as the upload
+        directory; it is left in place for the caller to remove.
+        """
+        business_dir = self._get_business_dir(business_id)
+        self._ensure_dir(business_dir)
+        size, sha256 = await asyncio.to_thread(self._hash_file, source_path)
+        target_path = self._link_new(source_path, sha256, business_dir, filename)
+        return StoredFile(path=str(target_path), size=size, sha256=sha256)
     
-    async def read_file(self, file_path: str) -> Optional[bytes]:
-        """Read a file from storage."""
-        path = Path(file_path)
-        if not path.exists():
-            return None
+    async def save_uploads(
+        self,
+        business_id: str,
+        uploads: List[UploadFile],
+        max_size: int,
+        concurrency: int,
+    ) -> List[StoredFile]:
+        """Stream several uploads to storage concurrently.
+        
+        At most `concurrency` files are written at once and the results
+        are in the order of `uploads`. If any upload fails, the others are
+        cancelled, files already stored are deleted, and the error is raised.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
         
-        async with aiofiles.open(path, 'rb') as f:
-            return await f.read()
+        async def save(upload: UploadFile) -> StoredFile:
+            async with semaphore:
+                return await self.save_upload(business_id, upload, max_size)
+        
+        tasks = [asyncio.ensure_future(save(upload)) for upload in uploads]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        error = next((task.exception() for task in tasks if not task.cancelled() and task.exception()), None)
+        if error is not None:
+            for task in tasks:
+                if not task.cancelled() and task.exception() is None:
+                    stored = task.result()
+                    await self.delete_file(stored.path, stored.sha256)
+            raise error
+        return [task.result() for task in tasks]
+    
+    async def save_extracted(self, sha256: str, extracted: dict) -> None:
+        """Store the extracted text chunks of a blob."""
+        path = self._extracted_path(sha256)
+        self._ensure_dir(path.parent)
+        temp_path = path.parent / f".{uuid.uuid4().hex}.part"
+        async with aiofiles.open(temp_path, 'w') as f:
+            await f.write(json.dumps(extracted))
+        os.replace(temp_path, path)
+    
+    async def load_extracted(self, sha256: str) -> Optional[dict]:
+        """Load the extracted text chunks of a blob, or None if not extracted yet."""
+        try:
+            async with aiofiles.open(self._extracted_path(sha256), 'r') as f:
+                return json.loads(await f.read())
+        except FileNotFoundError:
+            return None
+    
+    def _save_vectors(self, sha256: str, model: str, vectors) -> None:
+        """Write embeddings atomically as a .npy file."""
+        path = self._vectors_path(sha256, model)
+        self._ensure_dir(path.parent)
+        temp_path = path.parent / f".{uuid.uuid4().hex}.part"
+        try:
+            with open(temp_path, 'wb') as f:
+                np.save(f, vectors)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
     
-    async def delete_file(self, file_path: str) -> bool:
-        """Delete a file from storage."""
+    async def save_vectors(self, sha256: str, model: str, vectors) -> None:
+        """Store the chunk embeddings of a blob, computed by `model`."""
+        await asyncio.to_thread(self._save_vectors, sha256, model, vectors)
+    
+    async def load_vectors(self, sha256: str, model: str):
+        """Load the chunk embeddings of a blob, or None if not embedded by `model` yet."""
+        try:
+            return await asyncio.to_thread(np.load, self._vectors_path(sha256, model))
+        except FileNotFoundError:
+            return None
+    
+    async def stat_file(self, file_path: str) -> Optional[os.stat_result]:
+        """Get a stored file's stat result, or None if it does not exist."""
+        try:
+            return await asyncio.to_thread(os.stat, file_path)
+        except FileNotFoundError:
+            return None
+    
+    async def delete_file(self, file_path: str, content_hash: Optional[str] = None) -> bool:
+        """Delete a file from storage, and its blob if this was the last reference."""
         path = Path(file_path)
         if path.exists():
             try:
                 os.remove(path)
-                return True
             except Exception:
                 return False
+            if content_hash:
+                self._release_blob(content_hash)
+            return True
         return False
     
+    async def delete_business_files(self, business_id: str, files: List[dict]) -> None:
+        """Delete a business's knowledge base files and its storage directory."""
+        for file_record in files:
+            await self.delete_file(file_record.get("storage_path", ""), file_record.get("content_hash"))
+        shutil.rmtree(self._get_business_dir(business_id), ignore_errors=True)
+    
     async def list_files(self, business_id: str) -> list:
         """List all files for a business."""
         business_dir = self._get_business_dir(business_id)
@@ -81,10 +342,87 @@ class StorageService:
                 "size": f.stat().st_size,
             }
             for f in business_dir.iterdir()
-            if f.is_file()
+            if f.is_file() and not f.name.endswith(".part")
         ]
+    
+    def _business_files(self):
+        """Yield the directory entries of all stored business files."""
+        if not self.upload_dir.exists():
+            return
+        for business_dir in self.upload_dir.iterdir():
+            if not business_dir.is_dir() or parse_id(business_dir.name) is None:
+                continue
+            for entry in os.scandir(business_dir):
+                if entry.is_file() and not entry.name.endswith(".part"):
+                    yield entry
+    
+    def _blobs(self):
+        """Yield the directory entries of all blobs."""
+        if not self.blob_dir.exists():
+            return
+        for prefix_dir in os.scandir(self.blob_dir):
+            if prefix_dir.is_dir():
+                yield from os.scandir(prefix_dir.path)
+    
+    def _usage_stats(self) -> dict:
+        """Compare logical file sizes with the bytes actually stored."""
+        files = logical_bytes = physical_bytes = 0
+        for entry in self._business_files():
+            stat = entry.stat()
+            files += 1
+            logical_bytes += stat.st_size
+            if stat.st_nlink == 1:
+                physical_bytes += stat.st_size  # Not deduplicated
+        
+        blobs = orphaned_blobs = 0
+        for entry in self._blobs():
+            stat = entry.stat()
+            blobs += 1
+            physical_bytes += stat.st_size
+            if stat.st_nlink <= 1:
+                orphaned_blobs += 1
+        
+        return {
+            "files": files,
+            "blobs": blobs,
+            "orphaned_blobs": orphaned_blobs,
+            "logical_bytes": logical_bytes,
+            "physical_bytes": physical_bytes,
+            "bytes_saved": logical_bytes - physical_bytes,
+            "dedup_ratio": logical_bytes / physical_bytes if physical_bytes else 1.0,
+        }
+    
+    def _compact(self) -> dict:
+        """Move files stored before deduplication into blobs and drop orphaned blobs."""
+        linked = collected = 0
+        for entry in list(self._business_files()):
+            if entry.stat().st_nlink != 1:
+                continue
+            path = Path(entry.path)
+            _, sha256 = self._hash_file(path)
+            temp_path = path.parent / f".{uuid.uuid4().hex}.part"
+            try:
+                self._link_blob(path, sha256, temp_path)
+                os.replace(temp_path, path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+            linked += 1
+        
+        for entry in list(self._blobs()):
+            if entry.stat().st_nlink <= 1:
+                os.remove(entry.path)
+                self._remove_extracted(entry.name)
+                collected += 1
+        return {"files_linked": linked, "blobs_collected": collected}
+    
+    async def get_usage_stats(self) -> dict:
+        """Get deduplication statistics for the whole store."""
+        return await asyncio.to_thread(self._usage_stats)
+    
+    async def compact(self) -> dict:
+        """Deduplicate files stored before the blob store existed and collect orphaned blobs."""
+        return await asyncio.to_thread(self._compact)
 
 
 # Global service instance
 storage_service = StorageService()
-
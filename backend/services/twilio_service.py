@@ -1,9 +1,18 @@
 """Twilio service for phone number management."""
 
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from ..config import settings
 from ..models.phone_number import PhoneNumberAvailable, PhoneNumberType
+from .cache import AsyncTTLCache
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +28,27 @@ class TwilioService:
         self.auth_token = settings.twilio_auth_token
         self._client = None
         self._initialized = False
+        # The Twilio SDK is synchronous, so calls run in a bounded thread pool
+        # instead of blocking the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.twilio_max_concurrency,
+            thread_name_prefix="twilio",
+        )
+        self._semaphore = asyncio.Semaphore(settings.twilio_max_concurrency)
+        self._search_cache = AsyncTTLCache(
+            ttl=settings.twilio_search_cache_ttl_seconds,
+            stale_ttl=settings.twilio_search_cache_stale_seconds,
+            max_entries=settings.twilio_search_cache_max_entries,
+        )
+        self._breaker = CircuitBreaker(
+            "twilio",
+            failure_rate_threshold=settings.twilio_breaker_failure_rate,
+            slow_call_seconds=settings.twilio_breaker_slow_call_seconds,
+            slow_call_rate_threshold=settings.twilio_breaker_slow_call_rate,
+            window_size=settings.twilio_breaker_window_size,
+            min_calls=settings.twilio_breaker_min_calls,
+            open_seconds=settings.twilio_breaker_open_seconds,
+        )
     
     @property
     def client(self):
@@ -28,7 +58,16 @@ class TwilioService:
             if self.account_sid and self.auth_token:
                 try:
                     from twilio.rest import Client
-                    self._client = Client(self.account_sid, self.auth_token)
+                    from twilio.http.http_client import TwilioHttpClient
+                    # TwilioHttpClient keeps a pooled requests.Session, so
+                    # connections are reused across calls.
+                    self._client = Client(
+                        self.account_sid,
+                        self.auth_token,
+                        http_client=TwilioHttpClient(timeout=settings.twilio_timeout_seconds),
+                    )
+                    if settings.twilio_api_base_url:
+                        self._client.api.base_url = settings.twilio_api_base_url.rstrip("/")
                     logger.info("Twilio client initialized successfully")
                 except ImportError:
                     logger.warning("Twilio package not installed. Using mock data.")
@@ -43,6 +82,39 @@ class TwilioService:
         """Check if Twilio is properly configured."""
         return self.client is not None
     
+    async def _call(self, func, *args, **kwargs):
+        """Run a blocking Twilio SDK call in the worker pool.
+        
+        At most `twilio_max_concurrency` calls run at once; further callers
+        wait for a slot. Raises asyncio.TimeoutError after
+        `twilio_timeout_seconds`, and CircuitOpenError without calling
+        Twilio while the circuit breaker is open.
+        """
+        self._breaker.before_call()
+        try:
+            async with self._semaphore:
+                # Timed from here: waiting for a slot is our own queueing, not Twilio latency
+                start = time.monotonic()
+                loop = asyncio.get_running_loop()
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs)),
+                    timeout=settings.twilio_timeout_seconds,
+                )
+        except asyncio.CancelledError:
+            # The caller gave up, e.g. the client disconnected; that says nothing about Twilio
+            self._breaker.record_abandoned()
+            raise
+        except Exception as e:
+            # Client errors (4xx, e.g. number no longer available) mean Twilio is healthy
+            status_code = getattr(e, "status", None)
+            if isinstance(status_code, int) and status_code < 500:
+                self._breaker.record_success(time.monotonic() - start)
+            else:
+                self._breaker.record_failure()
+            raise
+        self._breaker.record_success(time.monotonic() - start)
+        return result
+    
     async def search_available_numbers(
         self,
         country_code: str = "US",
@@ -58,71 +130,106 @@ class TwilioService:
             logger.debug("Using mock phone numbers (Twilio not configured)")
             return self._get_mock_numbers(country_code, area_code, number_type, limit)
         
+        key = (country_code, area_code, number_type, contains, limit)
         try:
-            # Build search parameters
-            search_params = {
-                "limit": limit,
-            }
-            
-            if area_code:
-                search_params["area_code"] = area_code
-            if contains:
-                search_params["contains"] = contains
-            
-            logger.info(f"Searching Twilio for {number_type.value} numbers in {country_code}, area_code={area_code}")
-            
-            # Get available numbers based on type
-            if number_type == PhoneNumberType.LOCAL:
-                numbers = self.client.available_phone_numbers(country_code).local.list(**search_params)
-            elif number_type == PhoneNumberType.TOLL_FREE:
-                numbers = self.client.available_phone_numbers(country_code).toll_free.list(**search_params)
-            elif number_type == PhoneNumberType.MOBILE:
-                numbers = self.client.available_phone_numbers(country_code).mobile.list(**search_params)
+            # Identical searches within the TTL share one cached Twilio call.
+            # A slow call keeps running in the background and fills the cache.
+            return await asyncio.wait_for(
+                self._search_cache.get_or_fetch(
+                    key,
+                    lambda: self._fetch_available_numbers(country_code, area_code, number_type, contains, limit),
+                ),
+                timeout=settings.twilio_search_budget_seconds,
+            )
+        except CircuitOpenError:
+            logger.warning("Twilio circuit open, skipping search")
+        except asyncio.TimeoutError:
+            logger.warning(f"Twilio search exceeded {settings.twilio_search_budget_seconds}s budget")
+        except Exception as e:
+            logger.error(f"Twilio API error: {e}", exc_info=True)
+        
+        # Serve the last good result for this search, however old, else mock data
+        cached = self._search_cache.peek(key)
+        if cached is not None:
+            return cached
+        return self._get_mock_numbers(country_code, area_code, number_type, limit)
+    
+    async def _fetch_available_numbers(
+        self,
+        country_code: str,
+        area_code: Optional[str],
+        number_type: PhoneNumberType,
+        contains: Optional[str],
+        limit: int,
+    ) -> List[PhoneNumberAvailable]:
+        """Search Twilio for available numbers, bypassing the cache."""
+        # Build search parameters
+        search_params = {
+            "limit": limit,
+        }
+        
+        if area_code:
+            search_params["area_code"] = area_code
+        if contains:
+            search_params["contains"] = contains
+        
+        logger.info(f"Searching Twilio for {number_type.value} numbers in {country_code}, area_code={area_code}")
+        
+        # Get available numbers based on type
+        available = self.client.available_phone_numbers(country_code)
+        if number_type == PhoneNumberType.LOCAL:
+            numbers = await self._call(available.local.list, **search_params)
+        elif number_type == PhoneNumberType.TOLL_FREE:
+            numbers = await self._call(available.toll_free.list, **search_params)
+        elif number_type == PhoneNumberType.MOBILE:
+            numbers = await self._call(available.mobile.list, **search_params)
+        else:
+            numbers = await self._call(available.local.list, **search_params)
+        
+        logger.info(f"Found {len(numbers)} available numbers from Twilio")
+        
+        result = []
+        for n in numbers:
+            # Handle capabilities - Twilio returns them as a dict or object
+            caps = getattr(n, 'capabilities', {})
+            if hasattr(caps, 'voice'):
+                # Object-style capabilities
+                voice = bool(caps.voice)
+                sms = bool(caps.sms)
+                mms = bool(getattr(caps, 'mms', False))
+            elif isinstance(caps, dict):
+                # Dict-style capabilities
+                voice = caps.get('voice', True)
+                # The REST API spells these "SMS" and "MMS"
+                sms = caps.get('sms', caps.get('SMS', True))
+                mms = caps.get('mms', caps.get('MMS', False))
             else:
-                numbers = self.client.available_phone_numbers(country_code).local.list(**search_params)
-            
-            logger.info(f"Found {len(numbers)} available numbers from Twilio")
+                voice, sms, mms = True, True, False
             
-            result = []
-            for n in numbers:
-                # Handle capabilities - Twilio returns them as a dict or object
-                caps = getattr(n, 'capabilities', {})
-                if hasattr(caps, 'voice'):
-                    # Object-style capabilities
-                    voice = bool(caps.voice)
-                    sms = bool(caps.sms)
-                    mms = bool(getattr(caps, 'mms', False))
-                elif isinstance(caps, dict):
-                    # Dict-style capabilities
-                    voice = caps.get('voice', True)
-                    sms = caps.get('sms', True)
-                    mms = caps.get('mms', False)
-                else:
-                    voice, sms, mms = True, True, False
-                
-                result.append(
-                    PhoneNumberAvailable(
-                        phone_number=n.phone_number,
-                        friendly_name=n.friendly_name or n.phone_number,
-                        locality=getattr(n, 'locality', None),
-                        region=getattr(n, 'region', None),
-                        country_code=country_code,
-                        capabilities={
-                            "voice": voice,
-                            "sms": sms,
-                            "mms": mms,
-                        },
-                        price_monthly=self.PRICE_PER_NUMBER,
-                        number_type=number_type,
-                    )
+            result.append(
+                PhoneNumberAvailable(
+                    phone_number=n.phone_number,
+                    friendly_name=n.friendly_name or n.phone_number,
+                    locality=getattr(n, 'locality', None),
+                    region=getattr(n, 'region', None),
+                    country_code=country_code,
+                    capabilities={
+                        "voice": voice,
+                        "sms": sms,
+                        "mms": mms,
+                    },
+                    price_monthly=self.PRICE_PER_NUMBER,
+                    number_type=number_type,
                 )
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Twilio API error: {e}", exc_info=True)
-            # Fall back to mock data on error
-            return self._get_mock_numbers(country_code, area_code, number_type, limit)
+            )
+        
+        return result
+    
+    def _forget_available_number(self, phone_number: str) -> None:
+        """Remove a number that is no longer available from cached searches."""
+        self._search_cache.update_values(
+            lambda numbers: [n for n in numbers if n.phone_number != phone_number]
+        )
     
     def _get_mock_numbers(
         self,
@@ -200,12 +307,14 @@ class TwilioService:
             logger.info(f"Purchasing number from Twilio: {phone_number}")
             
             # Purchase the number
-            incoming_phone_number = self.client.incoming_phone_numbers.create(
+            incoming_phone_number = await self._call(
+                self.client.incoming_phone_numbers.create,
                 phone_number=phone_number,
                 friendly_name=friendly_name,
             )
             
             logger.info(f"Successfully purchased: {incoming_phone_number.phone_number} (SID: {incoming_phone_number.sid})")
+            self._forget_available_number(incoming_phone_number.phone_number)
             
             return {
                 "phone_number": incoming_phone_number.phone_number,
@@ -225,20 +334,44 @@ class TwilioService:
         
         try:
             logger.info(f"Releasing number from Twilio: {sid}")
-            self.client.incoming_phone_numbers(sid).delete()
+            await self._call(self.client.incoming_phone_numbers(sid).delete)
             logger.info(f"Successfully released: {sid}")
             return True
         except Exception as e:
             logger.error(f"Twilio release error for {sid}: {e}", exc_info=True)
             return False
     
+    def validate_webhook(self, url: str, params: dict, signature: Optional[str]) -> bool:
+        """Check the X-Twilio-Signature of a webhook request.
+        
+        Twilio signs the full URL followed by each POST parameter name and
+        value, sorted by name, with HMAC-SHA1 keyed by the auth token.
+        Without credentials there is nothing to check against, as with the
+        mock data, so every request passes.
+        """
+        if not (self.account_sid and self.auth_token):
+            return True
+        if not signature:
+            return False
+        payload = url + "".join(f"{name}{params[name]}" for name in sorted(params))
+        digest = hmac.new(self.auth_token.encode(), payload.encode(), hashlib.sha1).digest()
+        return hmac.compare_digest(base64.b64encode(digest).decode(), signature)
+    
+    def get_circuit_status(self) -> dict:
+        """Get the state of the Twilio circuit breaker."""
+        return self._breaker.status()
+    
+    def get_cache_stats(self) -> dict:
+        """Get hit/miss counters for the available number search cache."""
+        return self._search_cache.stats()
+    
     async def get_account_info(self) -> Optional[dict]:
         """Get Twilio account information to verify credentials."""
         if not self.client:
             return None
         
         try:
-            account = self.client.api.accounts(self.account_sid).fetch()
+            account = await self._call(self.client.api.accounts(self.account_sid).fetch)
             return {
                 "sid": account.sid,
                 "friendly_name": account.friendly_name,
@@ -0,0 +1,194 @@
+"""Resumable, chunked uploads of knowledge base files.
+
+A session lives in `<upload_dir>/sessions/<upload_id>/`:
+
+- `session.json` describes the file (business, name, size, chunk size).
+- `data` is pre-sized to the full file; each chunk is written in place at
+  `index * chunk_size` with `os.pwrite`, so chunks may arrive out of order,
+  in parallel and more than once.
+- `chunks/<index>` is created once a chunk is completely written.
+
+Completing a session links `data` into the storage layout without copying
+it. Chunk writers hold a shared `flock` on `data` and completion an
+exclusive one, so a late chunk never writes into a stored blob. State is
+only kept on disk, so sessions survive restarts and work across worker
+processes.
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+from ..config import settings
+from .storage_service import storage_service, StoredFile, FileTooLargeError
+
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class InvalidChunkError(ValueError):
+    """Raised when a chunk index or size does not fit the session."""
+
+
+class IncompleteUploadError(Exception):
+    """Raised when completing a session that is missing chunks."""
+    
+    def __init__(self, missing_chunks: List[int]):
+        super().__init__(f"Missing {len(missing_chunks)} chunk(s)")
+        self.missing_chunks = missing_chunks
+
+
+class UploadSessionService:
+    """Service for resumable upload sessions."""
+    
+    def __init__(self):
+        self.session_dir = Path(settings.upload_dir) / "sessions"
+    
+    def _get_session_path(self, upload_id: str) -> Optional[Path]:
+        """Get a session's directory, or None for a malformed ID."""
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            return None
+        return self.session_dir / upload_id
+    
+    def _expire_sessions(self) -> None:
+        """Remove sessions older than `upload_session_ttl_hours`."""
+        if not self.session_dir.exists():
+            return
+        cutoff = time.time() - settings.upload_session_ttl_hours * 3600
+        for entry in os.scandir(self.session_dir):
+            if entry.name.startswith("."):
+                continue  # Being completed
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+    
+    def create_session(self, business_id: str, filename: str, file_size: int, chunk_size: int) -> dict:
+        """Create an upload session and return its status."""
+        max_size = settings.max_file_size_mb * 1024 * 1024
+        if file_size > max_size:
+            raise FileTooLargeError(filename, max_size)
+        self._expire_sessions()
+        
+        upload_id = uuid.uuid4().hex
+        path = self.session_dir / upload_id
+        (path / "chunks").mkdir(parents=True)
+        with open(path / "data", "wb") as f:
+            f.truncate(file_size)
+        meta = {
+            "upload_id": upload_id,
+            "business_id": business_id,
+            "filename": filename,
+            "file_size": file_size,
+            "chunk_size": chunk_size,
+            "total_chunks": max(1, -(-file_size // chunk_size)),
+        }
+        (path / "session.json").write_text(json.dumps(meta))
+        return self._status(meta, set())
+    
+    def get_session(self, business_id: str, upload_id: str) -> Optional[dict]:
+        """Get a session's status, or None if it does not exist."""
+        path = self._get_session_path(upload_id)
+        if path is None:
+            return None
+        try:
+            meta = json.loads((path / "session.json").read_text())
+            received = {int(name) for name in os.listdir(path / "chunks")}
+        except FileNotFoundError:
+            return None
+        if meta["business_id"] != business_id:
+            return None
+        return self._status(meta, received)
+    
+    def _status(self, meta: dict, received: set) -> dict:
+        """Build a session's status from its metadata and received chunks."""
+        total_chunks = meta["total_chunks"]
+        # Offset = length of the contiguous prefix that has arrived
+        contiguous = 0
+        while contiguous in received:
+            contiguous += 1
+        return {
+            **meta,
+            "received_chunks": sorted(received),
+            "missing_chunks": [i for i in range(total_chunks) if i not in received],
+            "bytes_received": sum(self._chunk_length(meta, i) for i in received),
+            "offset": min(contiguous * meta["chunk_size"], meta["file_size"]),
+        }
+    
+    @staticmethod
+    def _chunk_length(meta: dict, index: int) -> int:
+        """Expected length of chunk `index`."""
+        start = index * meta["chunk_size"]
+        return max(0, min(meta["chunk_size"], meta["file_size"] - start))
+    
+    async def write_chunk(self, session: dict, index: int, body: AsyncIterator[bytes]) -> dict:
+        """Write chunk `index` of a session from a stream of bytes.
+        
+        The chunk only counts as received once all of its bytes were
+        written; a chunk that is cut off can simply be sent again. Raises
+        FileNotFoundError if the session was completed or deleted.
+        """
+        if not 0 <= index < session["total_chunks"]:
+            raise InvalidChunkError(f"Chunk index must be between 0 and {session['total_chunks'] - 1}")
+        expected = self._chunk_length(session, index)
+        path = self.session_dir / session["upload_id"]
+        
+        offset = index * session["chunk_size"]
+        written = 0
+        fd = os.open(path / "data", os.O_WRONLY)
+        try:
+            # Shared with other writers; held exclusively while the session is completed
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise FileNotFoundError(path / "data")
+            if not (path / "data").exists():
+                raise FileNotFoundError(path / "data")  # Claimed before we got the lock
+            async for data in body:
+                if written + len(data) > expected:
+                    raise InvalidChunkError(f"Chunk {index} must be {expected} bytes")
+                await asyncio.to_thread(os.pwrite, fd, data, offset + written)
+                written += len(data)
+        finally:
+            os.close(fd)
+        if written != expected:
+            raise InvalidChunkError(f"Chunk {index} must be {expected} bytes, got {written}")
+        
+        (path / "chunks" / str(index)).touch()
+        os.utime(path)  # Sessions expire after a period without chunks
+        return self.get_session(session["business_id"], session["upload_id"])
+    
+    async def complete_session(self, session: dict) -> Optional[StoredFile]:
+        """Move a fully received session into storage and remove the session.
+        
+        Returns None if the session was completed or deleted concurrently.
+        """
+        if session["missing_chunks"]:
+            raise IncompleteUploadError(session["missing_chunks"])
+        # Claim the session first so it can only be completed once
+        path = self.session_dir / f".{session['upload_id']}.completing"
+        try:
+            os.rename(self.session_dir / session["upload_id"], path)
+        except FileNotFoundError:
+            return None
+        try:
+            # Wait for writers that opened `data` before the rename; later ones see it gone
+            fd = os.open(path / "data", os.O_RDONLY)
+            try:
+                await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+                return await storage_service.store_file(session["business_id"], path / "data", session["filename"])
+            finally:
+                os.close(fd)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    
+    def delete_session(self, session: dict) -> None:
+        """Abort a session and remove its data."""
+        shutil.rmtree(self.session_dir / session["upload_id"], ignore_errors=True)
+
+
+# Global service instance
+upload_session_service = UploadSessionService()
@@ -0,0 +1,408 @@
+"""SQLite-backed persistent database with the same API as InMemoryDB."""
+
+import json
+import sqlite3
+import threading
+import uuid
+from typing import List, Optional
+from .pagination import Page, InvalidCursorError, encode_cursor, decode_cursor
+from .records import format_timestamp, normalize_phone_number, now_micros
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS businesses (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS knowledge_base_files (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    business_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_knowledge_base_files_business
+    ON knowledge_base_files (business_id, seq);
+
+CREATE TABLE IF NOT EXISTS phone_numbers (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    business_id TEXT NOT NULL,
+    phone_number TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_phone_numbers_business
+    ON phone_numbers (business_id, seq);
+CREATE INDEX IF NOT EXISTS idx_phone_numbers_phone_number
+    ON phone_numbers (phone_number);
+
+CREATE TABLE IF NOT EXISTS voice_assistants (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    business_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_voice_assistants_business
+    ON voice_assistants (business_id, seq);
+CREATE INDEX IF NOT EXISTS idx_voice_assistants_phone_number
+    ON voice_assistants (json_extract(data, '$.phone_number_id'), seq);
+
+CREATE TABLE IF NOT EXISTS onboarding_sessions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+"""
+
+# Child tables removed together with their business
+CHILD_TABLES = ("knowledge_base_files", "phone_numbers", "voice_assistants")
+
+
+class SQLiteDB:
+    """Persistent storage on SQLite in WAL mode.
+
+    Records are kept as JSON documents next to indexed lookup columns
+    (`id`, `business_id`, `phone_number`), and `seq` preserves insertion
+    order so listings match InMemoryDB. Each thread gets its own
+    connection, and WAL lets several uvicorn workers share one file.
+
+    Calls are synchronous and run on the event loop. In WAL mode readers
+    never wait, and a writer waits at most `busy_timeout` seconds for
+    another worker's write lock before `sqlite3.OperationalError`, so a
+    stuck writer stalls a worker briefly instead of for the old 30 s.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 1.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the connection for the current thread, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        """Close the connection for the current thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def generate_id(self) -> str:
+        """Generate a unique ID."""
+        return str(uuid.uuid4())
+
+    # Generic record helpers
+    def _insert(self, table: str, record: dict, **columns) -> dict:
+        """Insert a record with its indexed columns."""
+        names = ["id", *columns, "data"]
+        values = [record["id"], *columns.values(), json.dumps(record)]
+        placeholders = ", ".join("?" for _ in names)
+        with self._connection() as conn:
+            conn.execute(
+                f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})",
+                values,
+            )
+        return record
+
+    def _fetch_one(self, table: str, record_id: str, business_id: Optional[str] = None) -> Optional[dict]:
+        """Fetch a single record by ID, optionally scoped to a business."""
+        query = f"SELECT data FROM {table} WHERE id = ?"
+        params = [record_id]
+        if business_id is not None:
+            query += " AND business_id = ?"
+            params.append(business_id)
+        row = self._connection().execute(query, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _fetch_all(self, table: str, business_id: Optional[str] = None) -> List[dict]:
+        """Fetch all records in insertion order, optionally scoped to a business."""
+        if business_id is None:
+            rows = self._connection().execute(f"SELECT data FROM {table} ORDER BY seq")
+        else:
+            rows = self._connection().execute(
+                f"SELECT data FROM {table} WHERE business_id = ? ORDER BY seq",
+                (business_id,),
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def _page(
+        self,
+        table: str,
+        business_id: Optional[str],
+        filters: Optional[dict],
+        cursor: Optional[str],
+        limit: Optional[int],
+    ) -> Page:
+        """Fetch a page of records using keyset pagination on `seq`."""
+        clauses, params = [], []
+        if business_id is not None:
+            clauses.append("business_id = ?")
+            params.append(business_id)
+        for key, value in (filters or {}).items():
+            clauses.append("json_extract(data, ?) = ?")
+            params.extend([f"$.{key}", value])
+        if cursor:
+            try:
+                (after_seq,) = decode_cursor(cursor)
+                if not isinstance(after_seq, int) or after_seq < 0:
+                    raise ValueError(f"Invalid seq {after_seq!r}")
+            except (ValueError, TypeError) as e:
+                raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+            clauses.append("seq > ?")
+            params.append(after_seq)
+        
+        query = f"SELECT seq, data FROM {table}"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY seq"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        
+        rows = self._connection().execute(query, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0])
+        return [json.loads(data) for _, data in rows], next_cursor
+
+    def _update(self, table: str, record_id: str, data: dict, business_id: Optional[str] = None, touch: bool = False) -> Optional[dict]:
+        """Apply changes to a record, optionally setting `updated_at`.
+
+        The read and the write run in one BEGIN IMMEDIATE transaction, which
+        takes the database's write lock before reading. Concurrent updates
+        from other workers wait for it instead of writing back a stale copy
+        of the record over each other's changes.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            record = self._fetch_one(table, record_id, business_id)
+            if record is None:
+                return None
+            record.update(data)
+            if touch:
+                record["updated_at"] = format_timestamp(now_micros())
+            conn.execute(f"UPDATE {table} SET data = ? WHERE id = ?", (json.dumps(record), record_id))
+        return record
+
+    def _delete(self, table: str, record_id: str, business_id: str) -> bool:
+        """Delete a record scoped to a business."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE id = ? AND business_id = ?",
+                (record_id, business_id),
+            )
+        return cursor.rowcount > 0
+
+    # Business operations
+    def create_business(self, data: dict) -> dict:
+        """Create a new business record."""
+        business = {
+            "id": self.generate_id(),
+            "created_at": format_timestamp(now_micros()),
+            "updated_at": format_timestamp(now_micros()),
+            **data
+        }
+        return self._insert("businesses", business)
+
+    def get_business(self, business_id: str) -> Optional[dict]:
+        """Get a business by ID."""
+        return self._fetch_one("businesses", business_id)
+
+    def get_all_businesses(self) -> List[dict]:
+        """Get all businesses."""
+        return self._fetch_all("businesses")
+
+    def list_businesses(self, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of businesses."""
+        return self._page("businesses", None, filters, cursor, limit)
+
+    def update_business(self, business_id: str, data: dict) -> Optional[dict]:
+        """Update a business record."""
+        return self._update("businesses", business_id, data, touch=True)
+
+    def delete_business(self, business_id: str) -> bool:
+        """Delete a business and all associated data (cascade delete)."""
+        with self._connection() as conn:
+            cursor = conn.execute("DELETE FROM businesses WHERE id = ?", (business_id,))
+            if cursor.rowcount == 0:
+                return False
+            for table in CHILD_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE business_id = ?", (business_id,))
+        return True
+
+    # Knowledge base operations
+    def add_knowledge_base_file(self, business_id: str, file_data: dict) -> dict:
+        """Add a file to a business's knowledge base."""
+        file_record = {
+            "id": self.generate_id(),
+            "business_id": business_id,
+            "uploaded_at": format_timestamp(now_micros()),
+            "content_hash": None,
+            "status": "pending",
+            "chunk_count": 0,
+            "page_count": 0,
+            **file_data
+        }
+        return self._insert("knowledge_base_files", file_record, business_id=business_id)
+
+    def get_knowledge_base_files(self, business_id: str) -> List[dict]:
+        """Get all files for a business's knowledge base."""
+        return self._fetch_all("knowledge_base_files", business_id)
+
+    def list_knowledge_base_files(self, business_id: str, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of files in a business's knowledge base."""
+        return self._page("knowledge_base_files", business_id, filters, cursor, limit)
+
+    def get_knowledge_base_file_by_id(self, business_id: str, file_id: str) -> Optional[dict]:
+        """Get a specific knowledge base file by ID."""
+        return self._fetch_one("knowledge_base_files", file_id, business_id)
+
+    def update_knowledge_base_file(self, business_id: str, file_id: str, data: dict) -> Optional[dict]:
+        """Update a knowledge base file record."""
+        return self._update("knowledge_base_files", file_id, data, business_id)
+
+    def delete_knowledge_base_file(self, business_id: str, file_id: str) -> bool:
+        """Delete a file from a business's knowledge base."""
+        return self._delete("knowledge_base_files", file_id, business_id)
+
+    # Phone number operations
+    def add_phone_number(self, business_id: str, phone_data: dict) -> dict:
+        """Add a phone number to a business."""
+        phone_record = {
+            "id": self.generate_id(),
+            "business_id": business_id,
+            "purchased_at": format_timestamp(now_micros()),
+            **phone_data
+        }
+        return self._insert(
+            "phone_numbers",
+            phone_record,
+            business_id=business_id,
+            phone_number=normalize_phone_number(phone_record.get("phone_number")),
+        )
+
+    def get_phone_numbers(self, business_id: str) -> List[dict]:
+        """Get all phone numbers for a business."""
+        return self._fetch_all("phone_numbers", business_id)
+
+    def list_phone_numbers(self, business_id: str, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of phone numbers for a business."""
+        return self._page("phone_numbers", business_id, filters, cursor, limit)
+
+    def get_phone_number_by_id(self, business_id: str, phone_id: str) -> Optional[dict]:
+        """Get a specific phone number by ID."""
+        return self._fetch_one("phone_numbers", phone_id, business_id)
+
+    def delete_phone_number(self, business_id: str, phone_id: str) -> bool:
+        """Delete a phone number from a business."""
+        return self._delete("phone_numbers", phone_id, business_id)
+
+    # Legacy method for backward compatibility
+    def assign_phone_number(self, business_id: str, phone_data: dict) -> dict:
+        """Assign a phone number to a business (legacy - adds to list)."""
+        return self.add_phone_number(business_id, phone_data)
+
+    def get_phone_number(self, business_id: str) -> Optional[dict]:
+        """Get the first phone number for a business (legacy compatibility)."""
+        numbers = self.get_phone_numbers(business_id)
+        return numbers[0] if numbers else None
+
+    # Voice assistant operations
+    def create_voice_assistant(self, business_id: str, assistant_data: dict) -> dict:
+        """Create a voice assistant for a business."""
+        assistant = {
+            "id": self.generate_id(),
+            "business_id": business_id,
+            "phone_number_id": assistant_data.get("phone_number_id"),
+            "created_at": format_timestamp(now_micros()),
+            "updated_at": format_timestamp(now_micros()),
+            **assistant_data
+        }
+        return self._insert("voice_assistants", assistant, business_id=business_id)
+
+    def get_voice_assistants(self, business_id: str) -> List[dict]:
+        """Get all voice assistants for a business."""
+        return self._fetch_all("voice_assistants", business_id)
+
+    def list_voice_assistants(self, business_id: str, filters: Optional[dict] = None, cursor: Optional[str] = None, limit: Optional[int] = None) -> Page:
+        """Get a page of voice assistants for a business."""
+        return self._page("voice_assistants", business_id, filters, cursor, limit)
+
+    def get_voice_assistant_by_id(self, business_id: str, assistant_id: str) -> Optional[dict]:
+        """Get a specific voice assistant by ID."""
+        return self._fetch_one("voice_assistants", assistant_id, business_id)
+
+    def get_voice_assistant(self, business_id: str) -> Optional[dict]:
+        """Get the first voice assistant for a business (legacy compatibility)."""
+        assistants = self.get_voice_assistants(business_id)
+        return assistants[0] if assistants else None
+
+    def update_voice_assistant(self, business_id: str, assistant_id: str, data: dict) -> Optional[dict]:
+        """Update a specific voice assistant."""
+        return self._update("voice_assistants", assistant_id, data, business_id, touch=True)
+
+    def delete_voice_assistant(self, business_id: str, assistant_id: str) -> bool:
+        """Delete a voice assistant from a business."""
+        return self._delete("voice_assistants", assistant_id, business_id)
+
+    # Inbound call routing
+    def get_call_route(self, phone_number: str) -> Optional[dict]:
+        """Find the business and voice assistant answering calls to a phone number.
+
+        Uses the indexes on phone numbers and on the assistants' linked
+        phone number, so it never scans. Returns None for unknown numbers,
+        and an `assistant` of None for numbers no assistant is linked to.
+        If several businesses have the number, the one that added it last
+        answers, and if several assistants share it, the oldest, as in
+        InMemoryDB.
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT id, business_id FROM phone_numbers WHERE phone_number = ? ORDER BY seq DESC LIMIT 1",
+            (normalize_phone_number(phone_number),),
+        ).fetchone()
+        if row is None:
+            return None
+        phone_id, business_id = row
+        assistant = conn.execute(
+            "SELECT data FROM voice_assistants WHERE json_extract(data, '$.phone_number_id') = ? "
+            "AND business_id = ? ORDER BY seq LIMIT 1",
+            (phone_id, business_id),
+        ).fetchone()
+        return {
+            "business_id": business_id,
+            "phone_number_id": phone_id,
+            "assistant": json.loads(assistant[0]) if assistant else None,
+        }
+
+    # Onboarding session operations
+    def create_onboarding_session(self) -> dict:
+        """Create a new onboarding session."""
+        session = {
+            "id": self.generate_id(),
+            "created_at": format_timestamp(now_micros()),
+            "current_step": 1,
+            "business_id": None,
+            "completed": False
+        }
+        return self._insert("onboarding_sessions", session)
+
+    def get_onboarding_session(self, session_id: str) -> Optional[dict]:
+        """Get an onboarding session."""
+        return self._fetch_one("onboarding_sessions", session_id)
+
+    def update_onboarding_session(self, session_id: str, data: dict) -> Optional[dict]:
+        """Update an onboarding session."""
+        return self._update("onboarding_sessions", session_id, data)
@@ -0,0 +1,125 @@
+"""Vector index for the chunk embeddings of one business.
+
+Vectors are rows of one contiguous float32 matrix, addressed by chunk
+number, so scoring a query is a single matrix-vector product. For large
+knowledge bases an IVF (inverted file) index can be trained: k-means
+centroids partition the vectors into lists, and a query only scores the
+vectors of its `nprobe` nearest lists. Raising `nprobe` trades latency
+for recall.
+"""
+
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+class VectorIndex:
+    """Float32 matrix of unit vectors with exact and IVF top-k search."""
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self.count = 0  # Rows in use, including removed ones
+        self.centroids: Optional[np.ndarray] = None
+        self.assignments = np.zeros(0, dtype=np.int32)  # IVF list of each row
+        self._lists: Optional[List[np.ndarray]] = None  # Rows per IVF list, rebuilt after changes
+    
+    @classmethod
+    def from_arrays(
+        cls,
+        vectors: np.ndarray,
+        live: np.ndarray,
+        centroids: Optional[np.ndarray] = None,
+        assignments: Optional[np.ndarray] = None,
+    ) -> "VectorIndex":
+        """Search existing arrays, such as views of a file, without copying them."""
+        index = cls(vectors.shape[1])
+        index.vectors, index.live, index.count = vectors, live, len(vectors)
+        index.centroids = centroids
+        if assignments is not None:
+            index.assignments = assignments
+        return index
+    
+    def remove(self, rows: List[int]) -> None:
+        """Mark rows as removed."""
+        self.live[rows] = False
+        self._lists = None
+    
+    def restore(self, rows: List[int]) -> None:
+        """Mark removed rows as live again."""
+        self.live[rows] = True
+        self._lists = None
+    
+    def fit(self, iterations: int = 8, sample_size: int = 50000, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Train IVF centroids with spherical k-means on a sample of the live vectors.
+        
+        Returns the centroids, the list of each row and the number of rows.
+        """
+        count = self.count
+        vectors = self.vectors[:count]
+        rows = np.flatnonzero(self.live[:count])
+        n_lists = max(1, int(math.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        if len(rows) > sample_size:
+            rows = rng.choice(rows, sample_size, replace=False)
+        sample = vectors[rows]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their old centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+        centroids = centroids.astype(np.float32)
+        assignments = np.empty(count, dtype=np.int32)
+        # Assign in batches to bound the size of the score matrix
+        for start in range(0, count, 16384):
+            assignments[start:start + 16384] = np.argmax(vectors[start:start + 16384] @ centroids.T, axis=1)
+        return centroids, assignments, count
+    
+    def _get_lists(self) -> List[np.ndarray]:
+        """Get the live rows of each IVF list."""
+        if self._lists is None:
+            rows = np.flatnonzero(self.live[:self.count])
+            assignments = self.assignments[rows]
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+            sorted_rows = rows[order]
+            self._lists = [sorted_rows[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        return self._lists
+    
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Get the rows and scores of the `k` nearest vectors for each query.
+        
+        `queries` is a `(n, dim)` matrix of unit vectors. Uses the IVF index
+        with `nprobe` lists when trained and `nprobe` is given; otherwise
+        scores every vector, as a batched matrix product.
+        """
+        if self.count == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        if self.centroids is None or not nprobe:
+            scores = queries @ self.vectors[:self.count].T
+            scores[:, ~self.live[:self.count]] = -np.inf
+            return [self._top_k(np.arange(self.count), row, k) for row in scores]
+        
+        lists = self._get_lists()
+        nprobe = min(nprobe, len(lists))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, probe in zip(queries, probes):
+            rows = np.concatenate([lists[i] for i in probe])
+            results.append(self._top_k(rows, self.vectors[rows] @ query, k))
+        return results
+    
+    @staticmethod
+    def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the `k` best rows, best first, skipping removed rows."""
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        order = np.argsort(-scores)
+        rows, scores = rows[order], scores[order]
+        keep = np.isfinite(scores)
+        return rows[keep], scores[keep]
@@ -0,0 +1,228 @@
+"""Speech-to-text, language model and text-to-speech adapters for voice calls.
+
+A call streams through one adapter of each kind: caller audio into
+speech-to-text, final transcripts into the language model, and its reply
+into text-to-speech, sentence by sentence. All audio is telephony μ-law
+(see `backend.audio`). Adapters are registered by name in
+`STT_PROVIDERS`, `LLM_PROVIDERS` and `TTS_PROVIDERS`.
+
+The fake adapters need no network or model, so they are what tests and
+the call simulator use. Their "speech" carries its text: each word is
+stored as its UTF-8 bytes padded to the length of the spoken word with
+`FAKE_VOICE`, a byte that never occurs in UTF-8. The fake speech-to-text
+reads the words back, so a simulated caller and the call engine can
+check what the other side said.
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+from .audio import FRAME_BYTES, SAMPLE_RATE, is_silent
+
+FAKE_VOICE = 0xFE
+FAKE_WORD_SECONDS = 0.3  # A brisk 200 words per minute
+
+
+@dataclass
+class Transcript:
+    """Recognized caller speech.
+    
+    A partial transcript with empty text only signals that the caller
+    started speaking, for barge-in.
+    """
+    
+    text: str
+    is_final: bool
+    speech_ended_at: Optional[float] = None  # Loop time of the last voiced frame, on final transcripts
+
+
+class TranscriptionStream:
+    """Streaming recognition of one call's inbound audio."""
+    
+    def feed(self, frame: bytes) -> None:
+        """Add an inbound audio frame; must not block."""
+        raise NotImplementedError
+    
+    def close(self) -> None:
+        """End the audio; iteration stops after any pending transcripts."""
+        raise NotImplementedError
+    
+    def __aiter__(self) -> AsyncIterator[Transcript]:
+        raise NotImplementedError
+
+
+class SpeechToText:
+    """Base class for speech-to-text adapters."""
+    
+    name = ""
+    
+    def open_stream(self) -> TranscriptionStream:
+        """Start recognizing a call's audio."""
+        raise NotImplementedError
+
+
+class LanguageModel:
+    """Base class for language model adapters."""
+    
+    name = ""
+    
+    def stream_reply(self, model: str, system_prompt: str, messages: List[dict]) -> AsyncIterator[str]:
+        """Stream the text of the next assistant message, in pieces as generated.
+        
+        `messages` are `{"role": "user" | "assistant", "content": text}`.
+        """
+        raise NotImplementedError
+
+
+class TextToSpeech:
+    """Base class for text-to-speech adapters."""
+    
+    name = ""
+    
+    def synthesize(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        """Stream the speech of a text as μ-law audio chunks."""
+        raise NotImplementedError
+
+
+def encode_fake_speech(text: str, word_seconds: float = FAKE_WORD_SECONDS) -> bytes:
+    """Fake speech for a text, carrying the text; see the module docstring."""
+    word_bytes = int(word_seconds * SAMPLE_RATE)
+    audio = bytearray()
+    for word in text.split():
+        encoded = (word + " ").encode()
+        audio += encoded + bytes([FAKE_VOICE]) * max(0, word_bytes - len(encoded))
+    return bytes(audio)
+
+
+def decode_fake_speech(audio: bytes) -> str:
+    """Read the text back from fake speech, ignoring silence."""
+    return audio.translate(None, b"\xfe\xff").decode(errors="replace").strip()
+
+
+class FakeTranscriptionStream(TranscriptionStream):
+    """Transcribes fake speech, ending an utterance after a stretch of silence."""
+    
+    def __init__(self, endpoint_ms: float, latency_ms: float):
+        self._endpoint_frames = max(1, int(endpoint_ms * SAMPLE_RATE / 1000 / FRAME_BYTES))
+        self._latency = latency_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._speech = bytearray()
+        self._silent_frames = 0
+        self._speech_ended_at = 0.0
+        self._pending = 0
+        self._closed = False
+    
+    def feed(self, frame: bytes) -> None:
+        loop = asyncio.get_running_loop()
+        if not is_silent(frame):
+            if not self._speech:
+                self._queue.put_nowait(Transcript("", False))
+            self._speech += frame
+            self._silent_frames = 0
+            self._speech_ended_at = loop.time()
+        elif self._speech:
+            self._silent_frames += 1
+            if self._silent_frames >= self._endpoint_frames:
+                transcript = Transcript(decode_fake_speech(bytes(self._speech)), True, self._speech_ended_at)
+                self._speech.clear()
+                self._pending += 1
+                loop.call_later(self._latency, self._emit, transcript)
+    
+    def _emit(self, transcript: Transcript) -> None:
+        self._pending -= 1
+        self._queue.put_nowait(transcript)
+        if self._closed and not self._pending:
+            self._queue.put_nowait(None)
+    
+    def close(self) -> None:
+        self._closed = True
+        if not self._pending:
+            self._queue.put_nowait(None)
+    
+    async def __aiter__(self) -> AsyncIterator[Transcript]:
+        while (transcript := await self._queue.get()) is not None:
+            yield transcript
+
+
+class FakeSpeechToText(SpeechToText):
+    """Fake speech-to-text with endpointing and recognition latency."""
+    
+    name = "fake"
+    
+    def __init__(self, endpoint_ms: float = 400, latency_ms: float = 50):
+        self.endpoint_ms = endpoint_ms
+        self.latency_ms = latency_ms
+    
+    def open_stream(self) -> TranscriptionStream:
+        return FakeTranscriptionStream(self.endpoint_ms, self.latency_ms)
+
+
+class FakeLanguageModel(LanguageModel):
+    """Fake language model acknowledging and repeating the caller's last message."""
+    
+    name = "fake"
+    
+    def __init__(self, first_token_ms: float = 250, token_ms: float = 15):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+    
+    async def stream_reply(self, model: str, system_prompt: str, messages: List[dict]) -> AsyncIterator[str]:
+        heard = messages[-1]["content"].rstrip("?.!") if messages else ""
+        reply = f"Got it. You said: {heard}. Is there anything else?"
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for number, token in enumerate(re.findall(r"\S+\s*", reply)):
+            if number:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield token
+
+
+class FakeTextToSpeech(TextToSpeech):
+    """Fake text-to-speech producing fake speech faster than real time."""
+    
+    name = "fake"
+    
+    def __init__(self, first_chunk_ms: float = 120, realtime_factor: float = 5.0):
+        self.first_chunk_ms = first_chunk_ms
+        self.realtime_factor = realtime_factor
+    
+    async def synthesize(self, text: str, voice: str) -> AsyncIterator[bytes]:
+        await asyncio.sleep(self.first_chunk_ms / 1000)
+        for number, word in enumerate(text.split()):
+            if number:
+                await asyncio.sleep(FAKE_WORD_SECONDS / self.realtime_factor)
+            yield encode_fake_speech(word)
+
+
+STT_PROVIDERS = {FakeSpeechToText.name: FakeSpeechToText}
+LLM_PROVIDERS = {FakeLanguageModel.name: FakeLanguageModel}
+TTS_PROVIDERS = {FakeTextToSpeech.name: FakeTextToSpeech}
+
+_providers: Dict[tuple, object] = {}
+
+
+def _get_provider(kind: str, registry: dict, name: str):
+    """Get a shared adapter instance by kind and name."""
+    provider = _providers.get((kind, name))
+    if provider is None:
+        try:
+            provider_class = registry[name]
+        except KeyError:
+            raise ValueError(f"Unknown {kind} provider: {name}") from None
+        provider = _providers[(kind, name)] = provider_class()
+    return provider
+
+
+def get_stt(name: str) -> SpeechToText:
+    """Get the speech-to-text adapter registered under a name."""
+    return _get_provider("speech-to-text", STT_PROVIDERS, name)
+
+
+def get_llm(name: str) -> LanguageModel:
+    """Get the language model adapter registered under a name."""
+    return _get_provider("language model", LLM_PROVIDERS, name)
+
+
+def get_tts(name: str) -> TextToSpeech:
+    """Get the text-to-speech adapter registered under a name."""
+    return _get_provider("text-to-speech", TTS_PROVIDERS, name)
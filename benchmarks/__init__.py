@@ -0,0 +1,6 @@
+"""Benchmarks behind the numbers quoted in commit messages.
+
+Each module runs on its own from the repository root, e.g.
+`python -m benchmarks.sqlite_backend`; its defaults are the sizes the
+commit measured, and `--help` lists smaller ones for a quick run.
+"""
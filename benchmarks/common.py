@@ -0,0 +1,121 @@
+"""Helpers shared by the benchmarks.
+
+Settings are read when `backend` is first imported, so benchmarks call
+`use_temporary_storage` before importing anything from it.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+VOCABULARY = 30_000
+CHUNK_TOKENS = 160
+
+
+def use_temporary_storage(**environment: str) -> str:
+    """Send uploads, extracted text and indexes to a new temporary directory.
+    
+    The database is the in-memory one without a journal unless
+    `environment` says otherwise. Returns the directory.
+    """
+    directory = tempfile.mkdtemp(prefix="voice-ai-bench-")
+    os.environ["UPLOAD_DIR"] = os.path.join(directory, "uploads")
+    os.environ["DATABASE_BACKEND"] = "memory"
+    os.environ.pop("JOURNAL_DIR", None)
+    os.environ.update(environment)
+    return directory
+
+
+class Corpus:
+    """Random text chunks with Zipf-distributed term frequencies."""
+    
+    def __init__(self, seed: int):
+        import numpy as np
+        
+        self.rng = np.random.default_rng(seed)
+        weights = 1.0 / np.arange(1, VOCABULARY + 1)
+        self.probabilities = weights / weights.sum()
+    
+    def terms(self, count: int) -> List[str]:
+        return [f"term{rank}" for rank in self.rng.choice(VOCABULARY, size=count, p=self.probabilities)]
+    
+    def chunks(self, count: int) -> List[str]:
+        return [" ".join(self.terms(CHUNK_TOKENS)) for _ in range(count)]
+
+
+def percentiles(samples: List[float]) -> str:
+    """p50/p95/p99 of samples in seconds, formatted in milliseconds."""
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+    
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+    
+    return f"p50 {percentile(0.5):.1f} ms, p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms"
+
+
+def memory_status(pid: int, field: str) -> int:
+    """A memory field of /proc/<pid>/status, such as VmRSS or VmHWM, in bytes."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def smaps_rollup(pid: int) -> dict:
+    """Totals of /proc/<pid>/smaps_rollup (Pss, Private_Dirty, Anonymous, ...), in bytes."""
+    totals = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                totals[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return totals
+
+
+def mib(size: float) -> str:
+    return f"{size / 2**20:.1f} MiB"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def uvicorn_server(environment: Optional[dict] = None, workers: int = 1) -> Iterator[Tuple[subprocess.Popen, str]]:
+    """Run the app under uvicorn in a subprocess; yields the process and its base URL."""
+    import httpx
+    
+    port = free_port()
+    env = dict(os.environ, **(environment or {}))
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                httpx.get(f"{base_url}/health").raise_for_status()
+                break
+            except httpx.TransportError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Server did not start")
+                time.sleep(0.1)
+        yield process, base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
@@ -0,0 +1,90 @@
+"""Time to store the files of one multi-file upload request.
+
+    python -m benchmarks.concurrent_uploads --files 10 --size-mb 5 --requests 8
+
+End to end: a uvicorn server per `upload_concurrency` setting receives
+`--requests` uploads of the same files, after one warm-up request. The
+ingestion each request starts is waited out before the next one, so it
+does not compete with the upload being timed.
+Storage step: `StorageService.save_uploads` called directly on in-memory
+uploads, without multipart parsing or HTTP.
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+from benchmarks.common import use_temporary_storage, uvicorn_server
+
+use_temporary_storage()
+
+import httpx  # noqa: E402
+from fastapi import UploadFile  # noqa: E402
+from backend.config import settings  # noqa: E402
+from backend.services.storage_service import storage_service  # noqa: E402
+
+CONCURRENCY = (1, 4, 10)
+
+
+def _files(count: int, size: int) -> list:
+    # Printable, so ingestion reads them as text
+    return [(f"notes-{number}.txt", os.urandom(size // 2).hex().encode()) for number in range(count)]
+
+
+def _wait_ingested(client: httpx.Client, path: str) -> None:
+    deadline = time.monotonic() + 300
+    while any(item["status"] in ("pending", "processing") for item in client.get(path).json()):
+        if time.monotonic() > deadline:
+            raise RuntimeError("Ingestion did not finish")
+        time.sleep(0.5)
+
+
+def bench_requests(files: list, requests: int) -> None:
+    api = settings.api_v1_prefix
+    for concurrency in CONCURRENCY:
+        with uvicorn_server({"UPLOAD_CONCURRENCY": str(concurrency)}) as (_, base_url):
+            with httpx.Client(base_url=base_url, timeout=120) as client:
+                business_id = client.post(f"{api}/business", json={"name": "Uploads"}).json()["id"]
+                path = f"{api}/knowledge-base/upload/{business_id}"
+                times = []
+                for _ in range(requests + 1):
+                    start = time.perf_counter()
+                    response = client.post(path, files=[("files", file) for file in files])
+                    times.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    _wait_ingested(client, f"{api}/knowledge-base/{business_id}")
+        print(f"upload_concurrency {concurrency:2}: request median {statistics.median(times[1:]) * 1000:.0f} ms")
+
+
+async def _save(files: list, concurrency: int) -> float:
+    uploads = [UploadFile(io.BytesIO(content), filename=name) for name, content in files]
+    start = time.perf_counter()
+    stored = await storage_service.save_uploads("bench", uploads, settings.max_file_size_mb * 2**20, concurrency)
+    elapsed = time.perf_counter() - start
+    for item in stored:
+        await storage_service.delete_file(item.path, item.sha256)
+    return elapsed
+
+
+def bench_storage(files: list, requests: int) -> None:
+    for concurrency in CONCURRENCY:
+        times = [asyncio.run(_save(files, concurrency)) for _ in range(requests + 1)]
+        print(f"save_uploads at {concurrency:2}: median {statistics.median(times[1:]) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-mb", type=float, default=5)
+    parser.add_argument("--requests", type=int, default=8)
+    args = parser.parse_args()
+    files = _files(args.files, int(args.size_mb * 2**20))
+    print(f"{args.files} files of {args.size_mb:g} MB per request")
+    bench_requests(files, args.requests)
+    bench_storage(files, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Concurrent downloads of one large knowledge base file, and the server's memory.
+
+    python -m benchmarks.downloads --size-mb 50 --concurrency 64
+
+The file is uploaded to a uvicorn server first. It is random bytes named
+.pdf, so ingestion finds no text in it within a second and the downloads
+do not share the CPU with extraction. The server's RSS is read once
+ingestion is done and again after the downloads; peak RSS (VmHWM) is
+reported too.
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from benchmarks.common import memory_status, mib, use_temporary_storage, uvicorn_server
+
+use_temporary_storage()
+
+import httpx  # noqa: E402
+from backend.config import settings  # noqa: E402
+
+
+def _upload(base_url: str, size: int) -> str:
+    """Upload a file of `size` bytes and wait for its ingestion; returns its content path."""
+    api = settings.api_v1_prefix
+    with httpx.Client(base_url=base_url, timeout=300) as client:
+        business_id = client.post(f"{api}/business", json={"name": "Downloads"}).json()["id"]
+        with tempfile.TemporaryFile() as f:
+            for _ in range(size // 2**20):
+                f.write(os.urandom(2**20))
+            f.seek(0)
+            response = client.post(f"{api}/knowledge-base/upload/{business_id}", files={"files": ("manual.pdf", f)})
+        response.raise_for_status()
+        file_id = response.json()["files"][0]["id"]
+        path = f"{api}/knowledge-base/{business_id}/{file_id}"
+        deadline = time.monotonic() + 600
+        while client.get(f"{api}/knowledge-base/{business_id}").json()[0]["status"] in ("pending", "processing"):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Ingestion did not finish")
+            time.sleep(0.5)
+    return f"{path}/content"
+
+
+async def _download_all(base_url: str, path: str, concurrency: int) -> int:
+    async def download(client: httpx.AsyncClient) -> int:
+        received = 0
+        async with client.stream("GET", path) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_raw():
+                received += len(chunk)
+        return received
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits) as client:
+        return sum(await asyncio.gather(*(download(client) for _ in range(concurrency))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    with uvicorn_server() as (process, base_url):
+        path = _upload(base_url, args.size_mb * 2**20)
+        before = memory_status(process.pid, "VmRSS")
+        start = time.perf_counter()
+        received = asyncio.run(_download_all(base_url, path, args.concurrency))
+        elapsed = time.perf_counter() - start
+        after = memory_status(process.pid, "VmRSS")
+        peak = memory_status(process.pid, "VmHWM")
+    print(f"{args.concurrency} concurrent downloads of {args.size_mb} MB: "
+          f"{received / 1e9:.2f} GB in {elapsed:.1f} s ({received / elapsed / 1e6:.0f} MB/s)")
+    print(f"server RSS {mib(before)} before, {mib(after)} after, peak {mib(peak)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Startup cost of a large search index in fresh server workers.
+
+    python -m benchmarks.index_startup --files 1000 --file-chunks 100 --workers 4
+
+One business on the SQLite backend gets `--files` ingested files of
+`--file-chunks` synthetic chunks each (see `Corpus`), and its first index
+segment is built here. Then a one-worker uvicorn server is started
+against the same storage and database: the time of its first query is
+the cost of opening the index, followed by warm hybrid query latency.
+Last, a server with `--workers` workers is queried until every worker
+has the segment mapped. As the baseline, `--workers` processes each
+rebuild the index in their own memory from the stored extraction
+results, as search did before segment files. Each worker's boot time,
+from starting the server or the processes to its index being usable,
+and memory are reported side by side.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from array import array
+from multiprocessing.connection import wait
+from benchmarks.common import Corpus, mib, percentiles, smaps_rollup, use_temporary_storage, uvicorn_server
+
+DIRECTORY = use_temporary_storage(DATABASE_BACKEND="sqlite")
+os.environ["DATABASE_PATH"] = os.path.join(DIRECTORY, "bench.db")
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from backend.config import settings  # noqa: E402
+from backend.database import db  # noqa: E402
+from backend.embeddings import embed_texts  # noqa: E402
+from backend.extraction import tokenize  # noqa: E402
+from backend.models.knowledge_base import IngestionStatus  # noqa: E402
+from backend.services.search_service import search_service  # noqa: E402
+from backend.services.storage_service import storage_service  # noqa: E402
+from backend.vector_index import VectorIndex  # noqa: E402
+
+
+async def _populate(files: int, file_chunks: int) -> tuple:
+    """Store the files as ingestion leaves them and build the index.
+    
+    Returns the business ID and the extracted text and vectors paths of each file.
+    """
+    corpus = Corpus(seed=0)
+    business_id = db.create_business({"name": "Large knowledge base", "description": None})["id"]
+    sources = []
+    start = time.perf_counter()
+    for number in range(files):
+        chunks = corpus.chunks(file_chunks)
+        content_hash = hashlib.sha256(f"file {number}".encode()).hexdigest()
+        vectors = embed_texts(settings.embedding_provider, settings.embedding_dim, chunks)
+        await storage_service.save_extracted(content_hash, {"chunks": chunks, "pages": 1})
+        await storage_service.save_vectors(content_hash, search_service.embedding_model, vectors)
+        sources.append(storage_service.get_extracted_paths(content_hash, search_service.embedding_model))
+        db.add_knowledge_base_file(business_id, {
+            "filename": f"file-{number}.txt", "file_type": ".txt", "file_size": 0, "storage_path": "",
+            "content_hash": content_hash, "status": IngestionStatus.READY.value, "chunk_count": file_chunks,
+        })
+    print(f"stored {files} files, {files * file_chunks} chunks: {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    stats = (await search_service.get_index(business_id)).stats()
+    print(f"built the first segment: {time.perf_counter() - start:.1f} s, {mib(stats['size_bytes'])}")
+    search_service.pool.shutdown()
+    return business_id, sources
+
+
+def _worker_pids(server_pid: int) -> list:
+    """PIDs of the uvicorn worker processes of a multi-worker server."""
+    pids = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                spawned = b"multiprocessing.spawn" in f.read()
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        if parent == server_pid and spawned:
+            pids.append(int(pid))
+    return pids
+
+
+def _has_segment(pid: int) -> bool:
+    with open(f"/proc/{pid}/maps") as f:
+        return ".seg" in f.read()
+
+
+def bench_first_query(search_path: str, corpus: Corpus, queries: int) -> None:
+    with uvicorn_server() as (_, base_url), httpx.Client(base_url=base_url, timeout=300) as client:
+        start = time.perf_counter()
+        client.get(search_path, params={"q": " ".join(corpus.terms(3))}).raise_for_status()
+        print(f"first query of a fresh worker: {time.perf_counter() - start:.2f} s")
+
+        latencies = []
+        for _ in range(queries):
+            query = " ".join(corpus.terms(int(corpus.rng.integers(2, 6))))
+            start = time.perf_counter()
+            client.get(search_path, params={"q": query, "mode": "hybrid"}).raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        print(f"warm hybrid queries: {percentiles(latencies)}")
+
+
+def _memory(pid: int) -> dict:
+    memory = smaps_rollup(pid)
+    return {"RSS": memory["Rss"], "PSS": memory["Pss"], "private": memory["Private_Clean"] + memory["Private_Dirty"]}
+
+
+def bench_mmap_workers(search_path: str, corpus: Corpus, workers: int) -> dict:
+    """Boot time and memory of uvicorn workers with the segment mapped, by PID."""
+    start = time.perf_counter()
+    booted = {}
+    with uvicorn_server(workers=workers) as (process, base_url):
+        deadline = time.monotonic() + 600
+        while len(booted) < workers:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Not every worker opened the index")
+            # New connections, so the kernel spreads them over the workers
+            with httpx.Client(base_url=base_url, timeout=300) as client:
+                client.get(search_path, params={"q": " ".join(corpus.terms(3))}).raise_for_status()
+            for pid in _worker_pids(process.pid):
+                if pid not in booted and _has_segment(pid):
+                    booted[pid] = time.perf_counter() - start
+        return {pid: (boot, _memory(pid)) for pid, boot in booted.items()}
+
+
+def _rebuild_worker(sources: list, ivf_min_chunks: int, connection) -> None:
+    """Build the whole index in this process's memory, then wait to be measured."""
+    texts, vectors = [], []
+    for extracted_path, vectors_path in sources:
+        with open(extracted_path) as f:
+            texts += json.load(f)["chunks"]
+        vectors.append(np.load(vectors_path))
+    # Keyword postings as parallel chunk number and frequency arrays per term
+    postings, lengths = {}, array("I")
+    for number, text in enumerate(texts):
+        terms = tokenize(text)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("H"))
+            entry[0].append(number)
+            entry[1].append(min(count, 0xFFFF))
+        lengths.append(len(terms))
+    vector_index = VectorIndex.from_arrays(np.concatenate(vectors), np.ones(len(texts), dtype=bool))
+    if len(texts) >= ivf_min_chunks:
+        vector_index.centroids, vector_index.assignments, _ = vector_index.fit()
+    connection.send(os.getpid())
+    connection.recv()  # Keep the index until the parent has read this process's memory
+
+
+def bench_rebuild_workers(sources: list, workers: int) -> dict:
+    """Boot time and memory of worker processes that each rebuild the index, by PID."""
+    context = multiprocessing.get_context("spawn")
+    start = time.perf_counter()
+    connections, processes = [], []
+    for _ in range(workers):
+        connection, child = context.Pipe()
+        process = context.Process(target=_rebuild_worker, args=(sources, settings.vector_ivf_min_chunks, child))
+        process.start()
+        connections.append(connection)
+        processes.append(process)
+    try:
+        booted, pending = {}, list(connections)
+        while pending:
+            for connection in wait(pending, timeout=1800):
+                booted[connection.recv()] = time.perf_counter() - start
+                pending.remove(connection)
+            if not pending:
+                break
+            if not any(process.is_alive() for process in processes):
+                raise RuntimeError("A worker exited before building its index")
+        return {pid: (boot, _memory(pid)) for pid, boot in booted.items()}
+    finally:
+        for connection in connections:
+            connection.send(None)
+        for process in processes:
+            process.join(timeout=30)
+
+
+def _report(results: dict) -> None:
+    print(f"{'':<24}{'boot':>8}{'RSS':>14}{'PSS':>14}{'private':>14}")
+    for name, workers in results.items():
+        for number, (boot, memory) in enumerate(sorted(workers.values(), key=lambda worker: worker[0]), 1):
+            print(f"{name + f' worker {number}':<24}{boot:>7.1f}s" + "".join(f"{mib(memory[field]):>14}" for field in memory))
+        total = {field: sum(memory[field] for _, memory in workers.values()) for field in ("RSS", "PSS", "private")}
+        print(f"{name + ' total':<24}{max(boot for boot, _ in workers.values()):>7.1f}s"
+              + "".join(f"{mib(size):>14}" for size in total.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--file-chunks", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100, help="Warm hybrid queries")
+    args = parser.parse_args()
+
+    business_id, sources = asyncio.run(_populate(args.files, args.file_chunks))
+    db.close()
+    search_path = f"{settings.api_v1_prefix}/knowledge-base/{business_id}/search"
+    corpus = Corpus(seed=1)
+    bench_first_query(search_path, corpus, args.queries)
+    _report({
+        "mmap": bench_mmap_workers(search_path, corpus, args.workers),
+        "rebuild": bench_rebuild_workers(sources, args.workers),
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Pages per second extracted and chunked by the ingestion worker pool.
+
+    python -m benchmarks.ingestion --copies 25 --workers 1 2 4
+
+The documents are the distinct sample PDFs under uploads/, each
+submitted `--copies` times. Workers use the built-in PDF parser even
+where pypdf is installed, so runs are comparable between machines.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import sys
+import time
+from pathlib import Path
+from backend.extraction import process_document
+from backend.services.process_pool import WorkerPool
+
+SAMPLES = Path(__file__).resolve().parent.parent / "uploads"
+
+
+def _process_builtin(path: str, chunk_size: int, overlap: int) -> dict:
+    sys.modules["pypdf"] = None  # Makes the import fail
+    return process_document(path, ".pdf", chunk_size, overlap)
+
+
+async def _run(workers: int, paths: list) -> tuple:
+    pool = WorkerPool("benchmark", workers)
+    try:
+        await pool.run(abs, 0)  # Start the workers before timing
+        start = time.perf_counter()
+        results = await asyncio.gather(*(pool.run(_process_builtin, str(path), 1000, 150) for path in paths))
+        return sum(result["pages"] for result in results), time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--copies", type=int, default=25)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    # Several samples are the same upload stored twice
+    distinct = {hashlib.sha256(path.read_bytes()).digest(): path for path in sorted(SAMPLES.glob("*/*.pdf"))}
+    samples = list(distinct.values())
+    if not samples:
+        parser.error(f"No sample PDFs under {SAMPLES}")
+    for workers in args.workers:
+        pages, elapsed = asyncio.run(_run(workers, samples * args.copies))
+        print(f"{workers} workers: {pages} pages from {len(samples) * args.copies} documents "
+              f"in {elapsed:.2f} s, {pages / elapsed:.0f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
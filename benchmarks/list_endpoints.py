@@ -0,0 +1,81 @@
+"""Requests per second of the unpaginated list endpoints.
+
+    python -m benchmarks.list_endpoints --businesses 2000 --children 500
+
+Requests go through Starlette's TestClient, so the numbers are the app's
+own cost without a network or server in front of it. One business gets
+`--children` phone numbers, knowledge base files and voice assistants.
+"""
+
+import argparse
+import time
+from benchmarks.common import use_temporary_storage
+
+use_temporary_storage()
+
+from fastapi.testclient import TestClient  # noqa: E402
+from backend.config import settings  # noqa: E402
+from backend.database import db  # noqa: E402
+from backend.main import app  # noqa: E402
+
+ASSISTANT = {
+    "name": "Receptionist",
+    "first_message": "Hello",
+    "system_prompt": "Be helpful.",
+    "model_provider": "openai",
+    "model_name": "gpt-4o",
+    "voice": "rachel",
+    "end_call_message": "Goodbye",
+    "max_call_duration_seconds": 600,
+}
+
+
+def _populate(businesses: int, children: int) -> str:
+    """Create the businesses and one business's children; returns that business's ID."""
+    business_id = db.create_business({"name": "Business 0", "description": "Listed"})["id"]
+    for number in range(1, businesses):
+        db.create_business({"name": f"Business {number}", "description": "Listed"})
+    for number in range(children):
+        phone = db.add_phone_number(business_id, {
+            "phone_number": f"+1555{number:07d}", "friendly_name": "Front desk", "sid": None, "status": "active",
+        })
+        db.add_knowledge_base_file(business_id, {
+            "filename": f"menu-{number}.pdf", "file_type": ".pdf", "file_size": 1024,
+            "storage_path": f"/tmp/menu-{number}.pdf", "status": "ready", "chunk_count": 12, "page_count": 3,
+        })
+        db.create_voice_assistant(business_id, {**ASSISTANT, "phone_number_id": phone["id"]})
+    return business_id
+
+
+def _rate(client: TestClient, path: str, expected: int, seconds: float) -> float:
+    assert len(client.get(path).json()) == expected
+    count = 0
+    start = time.perf_counter()
+    while (elapsed := time.perf_counter() - start) < seconds:
+        assert client.get(path).status_code == 200
+        count += 1
+    return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--businesses", type=int, default=2000)
+    parser.add_argument("--children", type=int, default=500, help="Items in each per-business list")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Time spent on each endpoint")
+    args = parser.parse_args()
+
+    business_id = _populate(args.businesses, args.children)
+    api = settings.api_v1_prefix
+    endpoints = (
+        ("businesses", f"{api}/business", args.businesses),
+        ("phone numbers", f"{api}/phone-numbers/{business_id}", args.children),
+        ("knowledge base files", f"{api}/knowledge-base/{business_id}", args.children),
+        ("voice assistants", f"{api}/voice-assistant/{business_id}", args.children),
+    )
+    with TestClient(app) as client:
+        for name, path, expected in endpoints:
+            print(f"{name:21} {expected:5} items: {_rate(client, path, expected, args.seconds):6.1f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Memory held by knowledge base file records, as dicts and as slotted records.
+
+    python -m benchmarks.record_memory --records 1000000
+
+The dict layout is how InMemoryDB stored records before backend/records.py:
+`to_dict()` output, with string UUIDs and ISO timestamps, keyed by string
+ID. The slotted layout is a KnowledgeBaseFileRecord keyed by its 16-byte ID.
+Each file gets its own storage path and content hash, as uploads do.
+"""
+
+import argparse
+import hashlib
+import time
+import tracemalloc
+from backend.records import KnowledgeBaseFileRecord, format_id, new_id, now_micros
+
+FILES_PER_BUSINESS = 100
+
+
+def _records(count: int):
+    business_id = new_id()
+    for number in range(count):
+        if number % FILES_PER_BUSINESS == 0:
+            business_id = new_id()
+        file_id = new_id()
+        yield KnowledgeBaseFileRecord(
+            id=file_id,
+            business_id=business_id,
+            filename="menu.pdf",
+            file_type=".pdf",
+            file_size=1024 * 1024,
+            storage_path=f"uploads/{format_id(business_id)}/{format_id(file_id)}.pdf",
+            uploaded_at=now_micros(),
+            content_hash=hashlib.sha256(file_id).hexdigest(),
+            status="ready",
+            chunk_count=12,
+            page_count=3,
+        )
+
+
+def _measure(layout: str, count: int) -> int:
+    """Bytes still allocated once `count` records are stored in the given layout."""
+    tracemalloc.start()
+    if layout == "dict":
+        table = {}
+        for record in _records(count):
+            data = record.to_dict()
+            table[data["id"]] = data
+    else:
+        table = {record.id: record for record in _records(count)}
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del table
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+    for layout in ("dict", "slotted"):
+        start = time.perf_counter()
+        size = _measure(layout, args.records)
+        print(f"{layout:8} {args.records} records: {size / 1e6:.0f} MB "
+              f"({size / args.records:.0f} bytes each, built in {time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
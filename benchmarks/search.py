@@ -0,0 +1,94 @@
+"""Keyword search over a synthetic corpus: index build, query latency, file updates.
+
+    python -m benchmarks.search --chunks 10000 --queries 500
+
+Chunks are 160 tokens drawn from a Zipf distribution over a 30k-term
+vocabulary, in files of 100 chunks, stored as ingestion leaves them
+(extracted text and embeddings per content hash). Queries are 2-5 terms
+from the same distribution. The build is the first segment, written in
+the search worker process; adding and removing a file include reloading
+the index for the next query.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import statistics
+import time
+from benchmarks.common import Corpus, percentiles, use_temporary_storage
+
+use_temporary_storage()
+
+from backend.config import settings  # noqa: E402
+from backend.database import db  # noqa: E402
+from backend.embeddings import embed_texts  # noqa: E402
+from backend.models.knowledge_base import IngestionStatus, SearchMode  # noqa: E402
+from backend.services.search_service import search_service  # noqa: E402
+from backend.services.storage_service import storage_service  # noqa: E402
+
+FILE_CHUNKS = 100
+
+
+async def _add_file(business_id: str, number: int, chunks: list) -> tuple:
+    """Store a file's chunks and embeddings as ingestion would; returns its record and vectors."""
+    content_hash = hashlib.sha256(f"file {number}".encode()).hexdigest()
+    vectors = embed_texts(settings.embedding_provider, settings.embedding_dim, chunks)
+    await storage_service.save_extracted(content_hash, {"chunks": chunks, "pages": 1})
+    await storage_service.save_vectors(content_hash, search_service.embedding_model, vectors)
+    record = db.add_knowledge_base_file(business_id, {
+        "filename": f"file-{number}.txt", "file_type": ".txt", "file_size": 0, "storage_path": "",
+        "content_hash": content_hash, "status": IngestionStatus.READY.value, "chunk_count": len(chunks),
+    })
+    return record, vectors
+
+
+async def _run(chunks: int, queries: int, updates: int) -> None:
+    corpus = Corpus(seed=0)
+    business_id = db.create_business({"name": "Search", "description": None})["id"]
+    for number in range(chunks // FILE_CHUNKS):
+        await _add_file(business_id, number, corpus.chunks(FILE_CHUNKS))
+    await search_service.pool.run(abs, 0)  # Start the worker before timing
+
+    start = time.perf_counter()
+    index = await search_service.get_index(business_id)
+    print(f"build, {chunks} chunks: {time.perf_counter() - start:.2f} s; {index.stats()}")
+
+    latencies = []
+    for _ in range(queries):
+        query = " ".join(corpus.terms(int(corpus.rng.integers(2, 6))))
+        start = time.perf_counter()
+        await search_service.search(business_id, query, mode=SearchMode.KEYWORD)
+        latencies.append(time.perf_counter() - start)
+    print(f"{queries} queries: {percentiles(latencies)}")
+
+    added, removed = [], []
+    for number in range(updates):
+        record, vectors = await _add_file(business_id, chunks + number, file_chunks := corpus.chunks(FILE_CHUNKS))
+        start = time.perf_counter()
+        await search_service.add_file(business_id, record["id"], record["filename"], file_chunks, vectors)
+        await search_service.get_index(business_id)
+        added.append(time.perf_counter() - start)
+
+        db.delete_knowledge_base_file(business_id, record["id"])
+        start = time.perf_counter()
+        await search_service.remove_file(business_id, record["id"])
+        await search_service.get_index(business_id)
+        removed.append(time.perf_counter() - start)
+        await search_service.wait_idle()
+    for name, times in (("add", added), ("remove", removed)):
+        print(f"{name} a {FILE_CHUNKS}-chunk file: median {statistics.median(times) * 1000:.0f} ms, "
+              f"range {min(times) * 1000:.0f}-{max(times) * 1000:.0f} ms")
+    search_service.pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--chunks", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--updates", type=int, default=10, help="Files added and removed again")
+    args = parser.parse_args()
+    asyncio.run(_run(args.chunks, args.queries, args.updates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Insert and point-lookup cost of the SQLite backend next to the in-memory one.
+
+    python -m benchmarks.sqlite_backend --businesses 100000 --lookups 10000
+
+Also runs concurrent `update_business` calls from several threads, each
+on its own connection, and counts updates that were lost.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from backend.database import InMemoryDB
+from backend.sqlite_database import SQLiteDB
+
+
+def _insert(db, businesses: int) -> list:
+    return [db.create_business({"name": f"Business {n}", "description": None})["id"] for n in range(businesses)]
+
+
+def _lookup(db, ids: list, lookups: int) -> None:
+    rng = random.Random(0)
+    for _ in range(lookups):
+        assert db.get_business(rng.choice(ids)) is not None
+
+
+def _lost_updates(db: SQLiteDB, writers: int, updates: int) -> int:
+    """Each writer sets its own field on one business; returns how many writes were overwritten."""
+    business_id = db.create_business({"name": "Contended", "description": None})["id"]
+
+    def write(writer: int) -> None:
+        for number in range(updates):
+            db.update_business(business_id, {f"writer_{writer}": number})
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    record = db.get_business(business_id)
+    return sum(record.get(f"writer_{writer}") != updates - 1 for writer in range(writers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--businesses", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=200, help="Updates per writer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, db in (("memory", InMemoryDB()), ("sqlite", SQLiteDB(os.path.join(directory, "bench.db")))):
+            start = time.perf_counter()
+            ids = _insert(db, args.businesses)
+            inserted = time.perf_counter() - start
+            start = time.perf_counter()
+            _lookup(db, ids, args.lookups)
+            looked_up = time.perf_counter() - start
+            print(f"{name:6}  insert {args.businesses} businesses: {inserted:.2f} s   "
+                  f"{args.lookups} lookups: {looked_up * 1000:.0f} ms")
+            if isinstance(db, SQLiteDB):
+                lost = _lost_updates(db, args.writers, args.updates)
+                print(f"sqlite  {args.writers} writers x {args.updates} updates of one business: "
+                      f"{lost} writers' last update lost")
+                db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Recall and latency of IVF vector search against exact search.
+
+    python -m benchmarks.vector_index --vectors 100000 --queries 500 --nprobe 8 16 32 64
+
+The vectors are embeddings of `Corpus` chunks and the queries
+embeddings of 2-5 terms, with the configured embedder. The IVF index is
+trained as a segment would train it. Recall@k is the share of the exact
+top `k` that each `--nprobe` setting finds; latency is per query, one
+query at a time, as the search endpoint runs them.
+"""
+
+import argparse
+import time
+import numpy as np
+from benchmarks.common import Corpus, percentiles, use_temporary_storage
+
+use_temporary_storage()
+
+from backend.config import settings  # noqa: E402
+from backend.embeddings import embed_texts  # noqa: E402
+from backend.vector_index import VectorIndex  # noqa: E402
+
+
+def _timed_search(index: VectorIndex, queries: np.ndarray, k: int, nprobe) -> tuple:
+    """Rows found for each query, and the latency of each."""
+    found, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows, _ = index.search(query[np.newaxis], k, nprobe)[0]
+        latencies.append(time.perf_counter() - start)
+        found.append(set(rows.tolist()))
+    return found, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32, 64])
+    args = parser.parse_args()
+
+    corpus = Corpus(seed=0)
+    start = time.perf_counter()
+    vectors = np.concatenate([
+        embed_texts(settings.embedding_provider, settings.embedding_dim, corpus.chunks(min(1000, args.vectors - done)))
+        for done in range(0, args.vectors, 1000)
+    ])
+    queries = embed_texts(settings.embedding_provider, settings.embedding_dim, [
+        " ".join(corpus.terms(int(corpus.rng.integers(2, 6)))) for _ in range(args.queries)
+    ])
+    print(f"embedded {args.vectors} chunks and {args.queries} queries: {time.perf_counter() - start:.1f} s")
+
+    index = VectorIndex.from_arrays(vectors, np.ones(len(vectors), dtype=bool))
+    start = time.perf_counter()
+    index.centroids, index.assignments, _ = index.fit()
+    print(f"trained {len(index.centroids)} IVF lists: {time.perf_counter() - start:.1f} s")
+
+    exact, latencies = _timed_search(index, queries, args.k, None)
+    print(f"exact: {percentiles(latencies)}")
+    for nprobe in args.nprobe:
+        found, latencies = _timed_search(index, queries, args.k, nprobe)
+        recall = np.mean([len(a & e) / len(e) for a, e in zip(found, exact) if e])
+        default = " (default)" if nprobe == settings.vector_nprobe else ""
+        print(f"nprobe {nprobe}{default}: recall@{args.k} {recall:.3f}, {percentiles(latencies)}")
+
+
+if __name__ == "__main__":
+    main()
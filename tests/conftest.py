@@ -0,0 +1,34 @@
+"""Shared fixtures.
+
+Settings are read when `backend` is imported, so the environment is set up
+here first: uploads, extracted text and search indexes go to a temporary
+directory, and the database is the in-memory one without a journal.
+"""
+
+import os
+import tempfile
+
+os.environ["UPLOAD_DIR"] = tempfile.mkdtemp(prefix="voice-ai-tests-")
+os.environ["DATABASE_BACKEND"] = "memory"
+os.environ.pop("JOURNAL_DIR", None)
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from backend.main import app  # noqa: E402
+
+API = "/api/v1"
+
+
+@pytest.fixture
+async def client():
+    """Client calling the app in-process."""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+        yield client
+
+
+@pytest.fixture
+async def business(client):
+    """A new business, as returned by the API."""
+    response = await client.post(f"{API}/business", json={"name": "Test Business"})
+    assert response.status_code == 201
+    return response.json()
@@ -0,0 +1,79 @@
+"""Admin routes: the token guard, and blobs shared by deduplicated files."""
+
+import hashlib
+import shutil
+import httpx
+import pytest
+from fastapi import FastAPI
+from backend.config import settings
+from backend.routes import admin_router
+from backend.services.ingestion_service import ingestion_service
+from backend.services.storage_service import storage_service
+from .conftest import API
+
+TOKEN = "admin-secret"
+
+
+@pytest.fixture
+async def admin(monkeypatch):
+    """Client of an app with the admin routes mounted, as when ADMIN_TOKEN is set."""
+    monkeypatch.setattr(settings, "admin_token", TOKEN)
+    app = FastAPI()
+    app.include_router(admin_router, prefix=API)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", headers={"X-Admin-Token": TOKEN}) as client:
+        yield client
+
+
+async def _upload(client, business_id: str, content: bytes) -> dict:
+    response = await client.post(f"{API}/knowledge-base/upload/{business_id}", files={"files": ("notes.txt", content)})
+    assert response.status_code == 200
+    return response.json()["files"][0]
+
+
+async def test_admin_routes_are_not_mounted_by_default(client):
+    assert settings.admin_token is None
+    assert (await client.post(f"{API}/admin/storage/compact")).status_code == 404
+    assert (await client.get(f"{API}/admin/storage")).status_code == 404
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+async def test_admin_routes_require_the_token(admin, headers):
+    admin.headers.clear()
+    assert (await admin.post(f"{API}/admin/storage/compact", headers=headers)).status_code == 403
+    assert (await admin.get(f"{API}/admin/storage", headers=headers)).status_code == 403
+
+
+async def test_shared_blob_outlives_all_but_its_last_owner(client, admin, business):
+    content = b"Opening hours: nine to five, shared by two businesses."
+    blob = storage_service._blob_path(hashlib.sha256(content).hexdigest())
+    other = (await client.post(f"{API}/business", json={"name": "Other"})).json()
+    first = await _upload(client, business["id"], content)
+    second = await _upload(client, other["id"], content)
+    await ingestion_service.wait_idle()
+    assert blob.stat().st_nlink == 3  # The blob and both files
+
+    response = await client.delete(f"{API}/knowledge-base/{business['id']}/{first['id']}")
+    assert response.status_code == 200
+    assert blob.exists()
+    assert (await admin.post(f"{API}/admin/storage/compact")).json()["blobs_collected"] == 0
+    assert blob.exists()
+    download = await client.get(f"{API}/knowledge-base/{other['id']}/{second['id']}/content")
+    assert download.content == content
+
+    response = await client.delete(f"{API}/knowledge-base/{other['id']}/{second['id']}")
+    assert response.status_code == 200
+    assert not blob.exists()
+
+
+async def test_compact_collects_a_blob_whose_owners_vanished(client, admin, business):
+    content = b"A file whose business directory was lost."
+    blob = storage_service._blob_path(hashlib.sha256(content).hexdigest())
+    await _upload(client, business["id"], content)
+    await ingestion_service.wait_idle()
+
+    shutil.rmtree(storage_service._get_business_dir(business["id"]))
+    assert (await admin.get(f"{API}/admin/storage")).json()["orphaned_blobs"] >= 1
+
+    assert (await admin.post(f"{API}/admin/storage/compact")).json()["blobs_collected"] >= 1
+    assert not blob.exists()
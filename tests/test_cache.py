@@ -0,0 +1,60 @@
+"""AsyncTTLCache expiry, stale serving and fallback values."""
+
+import asyncio
+import pytest
+from backend.services.cache import AsyncTTLCache
+
+
+def _fetcher(*results):
+    """A fetch returning (or raising) the given results in turn, counting its calls."""
+    results = list(results)
+
+    async def fetch():
+        fetch.calls += 1
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    fetch.calls = 0
+    return fetch
+
+
+async def test_expired_entry_is_kept_for_peek_when_the_refetch_fails():
+    cache = AsyncTTLCache(ttl=0.01, stale_ttl=0.01, max_entries=8)
+    fetch = _fetcher(["+14155550100"], RuntimeError("Twilio down"), ["+14155550199"])
+    assert await cache.get_or_fetch("415", fetch) == ["+14155550100"]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_fetch("415", fetch)
+    assert cache.peek("415") == ["+14155550100"]
+
+    # A successful fetch replaces it
+    assert await cache.get_or_fetch("415", fetch) == ["+14155550199"]
+    assert cache.peek("415") == ["+14155550199"]
+    assert fetch.calls == 3
+
+
+async def test_stale_entry_is_served_while_one_refresh_runs():
+    cache = AsyncTTLCache(ttl=0.01, stale_ttl=10, max_entries=8)
+    fetch = _fetcher("old", "new")
+    assert await cache.get_or_fetch("key", fetch) == "old"
+    await asyncio.sleep(0.02)
+
+    assert await asyncio.gather(*(cache.get_or_fetch("key", fetch) for _ in range(5))) == ["old"] * 5
+    await asyncio.sleep(0)
+    assert await cache.get_or_fetch("key", fetch) == "new"
+    assert fetch.calls == 2
+
+
+async def test_least_recently_used_entries_are_evicted():
+    cache = AsyncTTLCache(ttl=10, stale_ttl=10, max_entries=2)
+    for key in ("a", "b"):
+        await cache.get_or_fetch(key, _fetcher(key))
+    await cache.get_or_fetch("a", _fetcher())  # Hit, "a" is now the most recent
+    await cache.get_or_fetch("c", _fetcher("c"))
+
+    assert cache.peek("b") is None
+    assert cache.peek("a") == "a"
+    assert cache.stats()["evictions"] == 1
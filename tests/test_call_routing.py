@@ -0,0 +1,166 @@
+"""Inbound call routing, which both database backends must resolve the same way."""
+
+import pytest
+from backend.database import InMemoryDB
+from backend.routes import calls
+from backend.sqlite_database import SQLiteDB
+from .conftest import API
+
+NUMBER = "+15550001234"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryDB()
+    return SQLiteDB(str(tmp_path / "voice_ai.db"))
+
+
+def _business(database, name: str) -> str:
+    return database.create_business({"name": name, "description": None})["id"]
+
+
+def _phone(database, business_id: str, number: str = NUMBER) -> str:
+    phone = {"phone_number": number, "friendly_name": None, "sid": None, "status": "active"}
+    return database.add_phone_number(business_id, phone)["id"]
+
+
+def _assistant(database, business_id: str, name: str, phone_id) -> str:
+    return database.create_voice_assistant(business_id, {
+        "name": name,
+        "first_message": "Hello",
+        "system_prompt": "Be helpful.",
+        "model_provider": "openai",
+        "model_name": "gpt-4o",
+        "voice": "rachel",
+        "end_call_message": "Goodbye",
+        "max_call_duration_seconds": 600,
+        "phone_number_id": phone_id,
+    })["id"]
+
+
+def _answering(database, number: str = NUMBER) -> tuple:
+    """(business ID, assistant name) answering a number, or None."""
+    route = database.get_call_route(number)
+    if route is None:
+        return None
+    return route["business_id"], route["assistant"] and route["assistant"]["name"]
+
+
+def test_number_routes_to_its_business_and_oldest_assistant(database):
+    business = _business(database, "Dentist")
+    assert _answering(database) is None
+
+    phone = _phone(database, business)
+    assert _answering(database) == (business, None)
+    assert _answering(database, "+1 (555) 000-1234") == (business, None)
+
+    _assistant(database, business, "Day", phone)
+    _assistant(database, business, "Night", phone)
+    assert _answering(database) == (business, "Day")
+
+
+def test_relinking_keeps_the_oldest_assistant_answering(database):
+    business = _business(database, "Dentist")
+    main, other = _phone(database, business), _phone(database, business, "+15559990000")
+    day = _assistant(database, business, "Day", main)
+    _assistant(database, business, "Night", main)
+
+    database.update_voice_assistant(business, day, {"phone_number_id": other})
+    assert _answering(database) == (business, "Night")
+    assert _answering(database, "+15559990000") == (business, "Day")
+
+    # Moving back does not make it the newest link
+    database.update_voice_assistant(business, day, {"phone_number_id": main})
+    assert _answering(database) == (business, "Day")
+    assert _answering(database, "+15559990000") == (business, None)
+
+
+def test_deleting_assistants_and_numbers_updates_the_route(database):
+    business = _business(database, "Dentist")
+    phone = _phone(database, business)
+    day = _assistant(database, business, "Day", phone)
+    _assistant(database, business, "Night", phone)
+
+    database.delete_voice_assistant(business, day)
+    assert _answering(database) == (business, "Night")
+    database.delete_phone_number(business, phone)
+    assert _answering(database) is None
+
+
+def test_number_shared_by_two_businesses_falls_back_when_deleted(database):
+    first, second = _business(database, "First"), _business(database, "Second")
+    first_phone = _phone(database, first)
+    _assistant(database, first, "First desk", first_phone)
+    second_phone = _phone(database, second)
+    _assistant(database, second, "Second desk", second_phone)
+    assert _answering(database) == (second, "Second desk")
+
+    # Deleting the older record leaves the newer one routed
+    database.delete_phone_number(first, first_phone)
+    assert _answering(database) == (second, "Second desk")
+    database.delete_phone_number(second, second_phone)
+    assert _answering(database) is None
+
+    first_phone = _phone(database, first)
+    _phone(database, second)
+    database.delete_business(second)
+    assert _answering(database) == (first, None)
+
+
+def test_memory_routes_survive_a_rebuild():
+    database = InMemoryDB()
+    first, second = _business(database, "First"), _business(database, "Second")
+    _assistant(database, first, "First desk", _phone(database, first))
+    phone = _phone(database, second)
+    late = _assistant(database, second, "Late", None)
+    _assistant(database, second, "Early", phone)
+    database.update_voice_assistant(second, late, {"phone_number_id": phone})
+
+    before = database.get_call_route(NUMBER)
+    database._rebuild_call_routes()
+    assert database.get_call_route(NUMBER) == before
+    assert _answering(database) == (second, "Late")
+
+
+@pytest.fixture
+def routed(database, monkeypatch):
+    """The webhook, answering from `database`."""
+    monkeypatch.setattr(calls, "db", database)
+    return database
+
+
+async def _webhook(client, number: str = NUMBER) -> str:
+    response = await client.post(f"{API}/calls/twilio/voice", data={"To": number, "From": "+15551110000"})
+    assert response.status_code == 200
+    return response.text
+
+
+async def test_webhook_follows_create_relink_and_delete(client, routed):
+    business = _business(routed, "Dentist")
+    assert calls.NOT_IN_SERVICE in await _webhook(client)
+
+    phone, other = _phone(routed, business), _phone(routed, business, "+15559990000")
+    assert calls.NO_ASSISTANT in await _webhook(client)
+
+    assistant = _assistant(routed, business, "Day", phone)
+    answer = await _webhook(client)
+    assert "<Connect>" in answer and f'value="{assistant}"' in answer
+
+    routed.update_voice_assistant(business, assistant, {"phone_number_id": other})
+    assert calls.NO_ASSISTANT in await _webhook(client)
+    assert f'value="{assistant}"' in await _webhook(client, "+15559990000")
+
+    routed.delete_phone_number(business, other)
+    assert calls.NOT_IN_SERVICE in await _webhook(client, "+15559990000")
+
+
+async def test_webhook_answers_for_the_newest_business_with_a_shared_number(client, routed):
+    first, second = _business(routed, "First"), _business(routed, "Second")
+    _assistant(routed, first, "First desk", _phone(routed, first))
+    second_phone = _phone(routed, second)
+    _assistant(routed, second, "Second desk", second_phone)
+    assert f'value="{second}"' in await _webhook(client)
+
+    routed.delete_phone_number(second, second_phone)
+    assert f'value="{first}"' in await _webhook(client)
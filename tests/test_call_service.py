@@ -0,0 +1,117 @@
+"""The call engine, driven over its Media Streams websocket."""
+
+import asyncio
+import base64
+import json
+from backend.config import settings
+from backend.database import db
+from backend.services.call_service import call_service
+from backend.voice_providers import decode_fake_speech
+from backend.main import app
+from tools.call_simulator import CallSimulator
+from .conftest import API
+
+ASSISTANT = {
+    "name": "Receptionist",
+    "first_message": "Hello, how can I help?",
+    "system_prompt": "You are a friendly receptionist.",
+    "model_provider": "openai",
+    "model_name": "gpt-4o",
+    "voice": "rachel",
+    "end_call_message": "Sorry, we are out of time. Goodbye!",
+    "max_call_duration_seconds": 600,
+}
+
+
+class Stream:
+    """Twilio's side of a media stream, for driving a single call by hand."""
+
+    def __init__(self, assistant: dict):
+        self.assistant = assistant
+        self.inbound: asyncio.Queue = asyncio.Queue()
+        self.outbound: asyncio.Queue = asyncio.Queue()
+        self.task = None
+
+    async def _send(self, message: dict) -> None:
+        await self.outbound.put(message)
+
+    def send(self, event: str, **fields) -> None:
+        message = {"event": event, "streamSid": "MZ1", **fields}
+        self.inbound.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+
+    async def start(self) -> None:
+        path = f"{API}/calls/media-stream"
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "server": ("testserver", 80),
+            "client": ("127.0.0.1", 0), "root_path": "", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "headers": [(b"host", b"testserver")], "subprotocols": [],
+        }
+        self.inbound.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.ensure_future(app(scope, self.inbound.get, self._send))
+        assert (await self.receive())["type"] == "websocket.accept"
+        self.send("start", start={"streamSid": "MZ1", "callSid": "CA1", "customParameters": {
+            "business_id": self.assistant["business_id"], "assistant_id": self.assistant["id"],
+        }})
+
+    async def receive(self) -> dict:
+        return await asyncio.wait_for(self.outbound.get(), timeout=10)
+
+    async def hang_up(self) -> None:
+        self.inbound.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self.task, timeout=10)
+
+
+async def _assistant(client, business) -> dict:
+    response = await client.post(f"{API}/voice-assistant/{business['id']}", json=ASSISTANT)
+    assert response.status_code == 201
+    return response.json()
+
+
+async def test_call_says_goodbye_and_hangs_up_at_the_maximum_duration(client, business):
+    assistant = await _assistant(client, business)
+    db.update_voice_assistant(business["id"], assistant["id"], {"max_call_duration_seconds": 1})
+    stream = Stream(assistant)
+    await stream.start()
+
+    audio = bytearray()
+    while (message := await stream.receive())["type"] == "websocket.send":
+        event = json.loads(message["text"])
+        if event["event"] == "media":
+            audio += base64.b64decode(event["media"]["payload"])
+        elif event["event"] == "mark":
+            stream.send("mark", mark=event["mark"])  # Played at once
+    assert message["type"] == "websocket.close"
+    assert decode_fake_speech(bytes(audio)).endswith(ASSISTANT["end_call_message"])
+
+    await stream.hang_up()
+    assert call_service.calls == {}
+
+
+async def test_stream_for_an_unknown_provider_is_closed(client, business, monkeypatch):
+    assistant = await _assistant(client, business)
+    # Each assistant's own provider, which has no adapter
+    monkeypatch.setattr(settings, "call_llm_provider", None)
+    stream = Stream(assistant)
+    await stream.start()
+
+    assert (await stream.receive())["type"] == "websocket.close"
+    await stream.hang_up()
+    assert call_service.calls == {}
+
+
+async def test_hundreds_of_concurrent_simulated_calls():
+    simulator = CallSimulator(businesses=20, seed=1)
+    await simulator.setup()
+    try:
+        simulated = await simulator.run(calls=200, turns=1, ramp_seconds=1.0)
+    finally:
+        await simulator.client.aclose()
+
+    assert [error for call in simulated for error in call.errors] == []
+    assert simulator.peak_active == 200
+    turn_latency = sorted(simulator.caller_stats["turn_latency"])
+    assert len(turn_latency) == 200
+    # The fake providers take about 0.85 s; the rest is queueing in the engine
+    assert turn_latency[int(len(turn_latency) * 0.95)] < 1.5
+    clock_lag = sorted(simulator.clock_lag)
+    assert clock_lag[int(len(clock_lag) * 0.95)] < 0.05
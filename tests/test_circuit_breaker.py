@@ -0,0 +1,127 @@
+"""Circuit breaker states: closed, open, half-open with a single probe."""
+
+import pytest
+from backend.services import circuit_breaker
+from backend.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    """Stands in for the `time` module, so cooldowns pass without waiting."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_rate_threshold=0.5, window_size=10, min_calls=4, open_seconds=30.0)
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_opens_after_enough_failures(breaker):
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    # Fewer than `min_calls` calls never open the circuit
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.status()["rejected_calls"] == 1
+    assert breaker.status()["retry_in_seconds"] == 30.0
+
+
+def test_failure_rate_below_the_threshold_keeps_it_closed(breaker):
+    for failed in (True, False, False, False, True, False):
+        breaker.before_call()
+        breaker.record_failure() if failed else breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_calls_open_it(clock):
+    breaker = CircuitBreaker("test", slow_call_seconds=1.0, slow_call_rate_threshold=0.75, min_calls=4)
+    for duration in (2.0, 0.1, 2.0, 2.0):
+        breaker.before_call()
+        breaker.record_success(duration)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_after_the_cooldown_lets_a_single_probe_through(breaker, clock):
+    _open(breaker)
+    clock.now += 29.9
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 0.1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()  # The probe
+    for _ in range(3):
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+
+def test_probe_success_closes_it(breaker, clock):
+    _open(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success(0.1)
+
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.status()["calls_in_window"] == 0
+    # The old failures are forgotten: it takes `min_calls` new ones to open again
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.parametrize("outcome", ["failure", "slow"])
+def test_probe_failure_opens_it_again(breaker, clock, outcome):
+    _open(breaker)
+    clock.now += 30
+    breaker.before_call()
+    if outcome == "failure":
+        breaker.record_failure()
+    else:
+        breaker.record_success(breaker.slow_call_seconds)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # For a full cooldown from the failed probe
+    clock.now += 29.9
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 0.1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_abandoned_probe_lets_another_call_probe(breaker, clock):
+    _open(breaker)
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_abandoned()
+
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
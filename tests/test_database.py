@@ -0,0 +1,114 @@
+"""Consistency of the per-business child record indexes of the database backends."""
+
+import random
+import pytest
+from backend.database import InMemoryDB
+from backend.sqlite_database import SQLiteDB
+
+BUSINESSES = 3
+OPERATIONS = 600
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryDB()
+    return SQLiteDB(str(tmp_path / "voice_ai.db"))
+
+
+def _file(number: int) -> dict:
+    return {"filename": f"file-{number}.txt", "file_type": ".txt", "file_size": number, "storage_path": f"/tmp/{number}"}
+
+
+def _phone(number: int) -> dict:
+    return {"phone_number": f"+1555{number:07d}", "friendly_name": None, "sid": None, "status": "active"}
+
+
+def _assistant(number: int) -> dict:
+    return {
+        "name": f"Assistant {number}",
+        "first_message": "Hello",
+        "system_prompt": "Be helpful.",
+        "model_provider": "openai",
+        "model_name": "gpt-4o",
+        "voice": "rachel",
+        "end_call_message": "Goodbye",
+        "max_call_duration_seconds": 600,
+        "phone_number_id": None,
+    }
+
+
+# Per child table: how to add, get, list, update (None if not updatable) and delete a record
+TABLES = {
+    "files": (
+        lambda db, b, n: db.add_knowledge_base_file(b, _file(n)),
+        lambda db, b, i: db.get_knowledge_base_file_by_id(b, i),
+        lambda db, b: db.get_knowledge_base_files(b),
+        lambda db, b, i, n: db.update_knowledge_base_file(b, i, {"chunk_count": n}),
+        lambda db, b, i: db.delete_knowledge_base_file(b, i),
+    ),
+    "phones": (
+        lambda db, b, n: db.add_phone_number(b, _phone(n)),
+        lambda db, b, i: db.get_phone_number_by_id(b, i),
+        lambda db, b: db.get_phone_numbers(b),
+        None,
+        lambda db, b, i: db.delete_phone_number(b, i),
+    ),
+    "assistants": (
+        lambda db, b, n: db.create_voice_assistant(b, _assistant(n)),
+        lambda db, b, i: db.get_voice_assistant_by_id(b, i),
+        lambda db, b: db.get_voice_assistants(b),
+        lambda db, b, i, n: db.update_voice_assistant(b, i, {"name": f"Renamed {n}"}),
+        lambda db, b, i: db.delete_voice_assistant(b, i),
+    ),
+}
+
+
+def test_random_operations_match_a_reference_list(database):
+    """Lookups, listing order and deletes agree with a plain list after random operations."""
+    rng = random.Random(2)
+    businesses = [database.create_business({"name": f"B{n}", "description": None})["id"] for n in range(BUSINESSES)]
+    # Reference: (table, business) -> records in insertion order
+    expected = {(table, business): [] for table in TABLES for business in businesses}
+    deleted = []
+
+    for number in range(OPERATIONS):
+        table = rng.choice(list(TABLES))
+        business = rng.choice(businesses)
+        add, get, _, update, delete = TABLES[table]
+        records = expected[(table, business)]
+        action = rng.random()
+        if not records or action < 0.5:
+            records.append(add(database, business, number))
+        elif action < 0.75 and update is not None:
+            position = rng.randrange(len(records))
+            records[position] = update(database, business, records[position]["id"], number)
+        else:
+            record = records.pop(rng.randrange(len(records)))
+            assert delete(database, business, record["id"])
+            assert not delete(database, business, record["id"])
+            deleted.append((table, business, record["id"]))
+
+    for (table, business), records in expected.items():
+        _, get, list_all, _, _ = TABLES[table]
+        assert list_all(database, business) == records
+        for record in records:
+            assert get(database, business, record["id"]) == record
+            # A record is only found under its own business
+            other = next(b for b in businesses if b != business)
+            assert get(database, other, record["id"]) is None
+    for table, business, record_id in deleted:
+        assert TABLES[table][1](database, business, record_id) is None
+
+
+def test_deleting_a_business_removes_its_children(database):
+    business = database.create_business({"name": "Gone", "description": None})["id"]
+    kept = database.create_business({"name": "Kept", "description": None})["id"]
+    children = {table: TABLES[table][0](database, business, n)["id"] for n, table in enumerate(TABLES)}
+    survivor = TABLES["phones"][0](database, kept, 99)
+
+    assert database.delete_business(business)
+    for table, record_id in children.items():
+        assert TABLES[table][1](database, business, record_id) is None
+        assert TABLES[table][2](database, business) == []
+    assert database.get_phone_numbers(kept) == [survivor]
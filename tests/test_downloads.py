@@ -0,0 +1,64 @@
+"""Ranged and conditional downloads of knowledge base files."""
+
+import pytest
+from .conftest import API
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes, each offset recognizable
+
+
+@pytest.fixture
+async def download_path(client, business):
+    response = await client.post(
+        f"{API}/knowledge-base/upload/{business['id']}", files={"files": ("table.csv", CONTENT)}
+    )
+    assert response.status_code == 200
+    return f"{API}/knowledge-base/{business['id']}/{response.json()['files'][0]['id']}/content"
+
+
+async def test_full_download_advertises_ranges(client, download_path):
+    response = await client.get(download_path)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=100-199", 100, 199),
+    ("bytes=-100", 924, 1023),  # Suffix: the last 100 bytes
+    ("bytes=1000-", 1000, 1023),  # Open-ended
+    ("bytes=1000-5000", 1000, 1023),  # End past the file is clamped
+    ("bytes=0-0", 0, 0),
+])
+async def test_range_returns_partial_content(client, download_path, header, start, end):
+    response = await client.get(download_path, headers={"Range": header})
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["Content-Length"] == str(end - start + 1)
+    assert response.content == CONTENT[start:end + 1]
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=2000-3000"])
+async def test_unsatisfiable_range_is_416(client, download_path, header):
+    response = await client.get(download_path, headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+async def test_if_range_only_applies_the_range_to_the_same_content(client, download_path):
+    etag = (await client.get(download_path)).headers["ETag"]
+
+    response = await client.get(download_path, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+    response = await client.get(download_path, headers={"Range": "bytes=0-9", "If-Range": '"changed"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+async def test_matching_etag_is_not_modified(client, download_path):
+    etag = (await client.get(download_path)).headers["ETag"]
+
+    response = await client.get(download_path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
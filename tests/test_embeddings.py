@@ -0,0 +1,46 @@
+"""Hashing embedder and the embedder registry."""
+
+import numpy as np
+import pytest
+from backend.embeddings import HashingEmbedder, embed_texts, get_embedder
+
+
+def test_rows_are_unit_vectors():
+    vectors = HashingEmbedder(64).embed(["We open at nine.", "Parking is free", "a a a a b"])
+
+    assert vectors.shape == (3, 64) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+
+
+def test_texts_without_words_embed_as_zero_vectors():
+    vectors = HashingEmbedder(32).embed(["", "  ...  "])
+
+    assert not vectors.any()
+    assert HashingEmbedder(32).embed([]).shape == (0, 32)
+
+
+def test_embeddings_are_deterministic():
+    texts = ["Opening hours on weekends", "Refund policy"]
+
+    assert np.array_equal(HashingEmbedder(128).embed(texts), HashingEmbedder(128).embed(texts))
+
+
+def test_related_texts_are_closer_than_unrelated_ones():
+    query, related, unrelated = HashingEmbedder(256).embed([
+        "When do you open?",
+        "We are opening at nine on weekdays.",
+        "Refunds take five business days.",
+    ])
+
+    assert query @ related > query @ unrelated
+
+
+def test_embedders_are_shared_per_provider_and_dimension():
+    assert get_embedder("hashing", 16) is get_embedder("hashing", 16)
+    assert get_embedder("hashing", 16) is not get_embedder("hashing", 32)
+    assert np.array_equal(embed_texts("hashing", 16, ["hello"]), HashingEmbedder(16).embed(["hello"]))
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError, match="Unknown embedding provider"):
+        get_embedder("missing", 16)
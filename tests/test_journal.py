@@ -0,0 +1,128 @@
+"""Crash recovery of InMemoryDB through its journal and snapshots."""
+
+import threading
+from backend.database import InMemoryDB
+from backend.journal import Journal
+
+
+def _assistant(phone_id=None) -> dict:
+    return {
+        "name": "Receptionist",
+        "first_message": "Hello",
+        "system_prompt": "Be helpful.",
+        "model_provider": "openai",
+        "model_name": "gpt-4o",
+        "voice": "rachel",
+        "end_call_message": "Goodbye",
+        "max_call_duration_seconds": 600,
+        "phone_number_id": phone_id,
+    }
+
+
+def _populate(db: InMemoryDB, businesses: int) -> None:
+    for number in range(businesses):
+        business = db.create_business({"name": f"Business {number}", "description": None})
+        phone = db.add_phone_number(business["id"], {
+            "phone_number": f"+1555{number:07d}", "friendly_name": None, "sid": None, "status": "active",
+        })
+        assistant = db.create_voice_assistant(business["id"], _assistant(phone["id"]))
+        db.update_voice_assistant(business["id"], assistant["id"], {"name": f"Renamed {number}"})
+        if number % 3 == 0:
+            db.update_business(business["id"], {"description": "Updated"})
+        if number % 5 == 0:
+            db.delete_phone_number(business["id"], phone["id"])
+
+
+def _dump(db: InMemoryDB) -> dict:
+    return {
+        business["id"]: (
+            business,
+            db.get_phone_numbers(business["id"]),
+            db.get_voice_assistants(business["id"]),
+        )
+        for business in db.get_all_businesses()
+    }
+
+
+def _restore(directory, snapshot_interval: int = 1_000_000) -> InMemoryDB:
+    db = InMemoryDB()
+    db.restore(Journal(str(directory), snapshot_interval=snapshot_interval))
+    return db
+
+
+def test_restore_replays_every_entry(tmp_path):
+    db = InMemoryDB()
+    db.restore(Journal(str(tmp_path)))
+    _populate(db, 50)
+    db.journal.close()
+
+    restored = _restore(tmp_path)
+    assert _dump(restored) == _dump(db)
+    # Derived indexes are rebuilt too
+    assert restored.get_call_route("+15550000001")["business_id"] == db.get_call_route("+15550000001")["business_id"]
+
+
+def test_background_snapshots_keep_later_mutations(tmp_path):
+    db = InMemoryDB()
+    db.restore(Journal(str(tmp_path), snapshot_interval=200))
+    _populate(db, 400)  # Several snapshots, each overlapping later mutations
+    db.journal.close()
+
+    assert (tmp_path / "snapshot.bin").exists()
+    assert not list(tmp_path.glob("journal.log.*"))
+    assert _dump(_restore(tmp_path)) == _dump(db)
+
+
+def test_restore_replays_segments_of_an_interrupted_snapshot(tmp_path):
+    db = InMemoryDB()
+    db.restore(Journal(str(tmp_path)))
+    _populate(db, 30)
+    # As if the process died while a snapshot was written: the journal was rotated, no snapshot landed
+    db.journal._rotate()
+    _populate(db, 30)
+    db.journal._rotate()
+    _populate(db, 10)
+    db.journal.close()
+
+    assert len(list(tmp_path.glob("journal.log.*"))) == 2
+    assert _dump(_restore(tmp_path)) == _dump(db)
+
+
+def test_snapshot_does_not_block_the_triggering_mutation(tmp_path, monkeypatch):
+    db = InMemoryDB()
+    db.restore(Journal(str(tmp_path), snapshot_interval=1_000_000))
+    _populate(db, 500)
+
+    # Hold the snapshot until the mutation that triggered it has returned
+    release = threading.Event()
+    write_snapshot = db.journal._write_snapshot
+
+    def gated(state, segments):
+        release.wait(timeout=10)
+        write_snapshot(state, segments)
+
+    monkeypatch.setattr(db.journal, "_write_snapshot", gated)
+    db.journal.snapshot_interval = db.journal.pending + 1
+    db.create_business({"name": "Triggers a snapshot", "description": None})
+    assert db.journal.snapshot_running
+    db.create_business({"name": "Written during the snapshot", "description": None})
+    release.set()
+    db.journal.close()
+
+    assert (tmp_path / "snapshot.bin").exists()
+    assert _dump(_restore(tmp_path)) == _dump(db)
+
+
+def test_cursors_stay_valid_across_a_restore(tmp_path):
+    db = InMemoryDB()
+    db.restore(Journal(str(tmp_path), snapshot_interval=50))
+    _populate(db, 20)
+    page, cursor = db.list_businesses(limit=5)
+    db.journal.close()
+
+    restored = _restore(tmp_path)
+    restored.create_business({"name": "After the restore", "description": None})
+    rest, _ = restored.list_businesses(cursor=cursor)
+    assert [business["name"] for business in rest] == [f"Business {number}" for number in range(5, 20)] + [
+        "After the restore"
+    ]
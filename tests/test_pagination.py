@@ -0,0 +1,101 @@
+"""Cursor pagination, filters and sparse fieldsets of the list endpoints."""
+
+import pytest
+from backend.database import InMemoryDB
+from backend.pagination import InvalidCursorError, encode_cursor
+from backend.sqlite_database import SQLiteDB
+from .conftest import API
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def database(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryDB()
+    return SQLiteDB(str(tmp_path / "voice_ai.db"))
+
+
+def _file(number: int, file_type: str = ".txt") -> dict:
+    return {
+        "filename": f"file-{number}{file_type}", "file_type": file_type,
+        "file_size": number, "storage_path": f"/tmp/{number}",
+    }
+
+
+def _names(records: list) -> list:
+    return [record["name"] for record in records]
+
+
+def test_pages_cover_every_business_once(database):
+    for number in range(7):
+        database.create_business({"name": f"B{number}", "description": None})
+
+    names, cursor = [], None
+    while True:
+        page, cursor = database.list_businesses(cursor=cursor, limit=3)
+        names += _names(page)
+        if cursor is None:
+            break
+    assert names == [f"B{number}" for number in range(7)]
+
+
+def test_deleting_the_last_record_of_a_page_skips_nothing(database):
+    ids = [database.create_business({"name": f"B{number}", "description": None})["id"] for number in range(8)]
+
+    page, cursor = database.list_businesses(limit=3)
+    assert _names(page) == ["B0", "B1", "B2"]
+    database.delete_business(ids[2])
+    database.delete_business(ids[0])
+
+    page, cursor = database.list_businesses(cursor=cursor, limit=3)
+    assert _names(page) == ["B3", "B4", "B5"]
+
+
+def test_filters_apply_across_pages(database):
+    business = database.create_business({"name": "Files", "description": None})["id"]
+    for number in range(10):
+        database.add_knowledge_base_file(business, _file(number, ".pdf" if number % 3 == 0 else ".txt"))
+
+    names, cursor = [], None
+    while True:
+        page, cursor = database.list_knowledge_base_files(
+            business, filters={"file_type": ".pdf"}, cursor=cursor, limit=2
+        )
+        names += [record["filename"] for record in page]
+        if cursor is None:
+            break
+    assert names == ["file-0.pdf", "file-3.pdf", "file-6.pdf", "file-9.pdf"]
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor(-1), encode_cursor("x"), encode_cursor(1, 2)])
+def test_invalid_cursor_is_rejected(database, cursor):
+    database.create_business({"name": "B", "description": None})
+    with pytest.raises(InvalidCursorError):
+        database.list_businesses(cursor=cursor, limit=1)
+
+
+async def test_list_endpoint_pages_and_projects_fields(client, business):
+    for number in range(5):
+        response = await client.post(
+            f"{API}/knowledge-base/upload/{business['id']}",
+            files={"files": (f"notes-{number}.{'csv' if number % 2 else 'txt'}", f"Note {number}".encode())},
+        )
+        assert response.status_code == 200
+
+    path = f"{API}/knowledge-base/{business['id']}"
+    response = await client.get(path, params={"file_type": ".txt", "limit": 2, "fields": "filename,file_type"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"filename": "notes-0.txt", "file_type": ".txt"},
+        {"filename": "notes-2.txt", "file_type": ".txt"},
+    ]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = await client.get(path, params={"file_type": ".txt", "limit": 2, "cursor": cursor, "fields": "filename"})
+    assert response.json() == [{"filename": "notes-4.txt"}]
+    assert "X-Next-Cursor" not in response.headers
+
+
+async def test_list_endpoint_rejects_a_bad_cursor_and_unknown_fields(client, business):
+    path = f"{API}/knowledge-base/{business['id']}"
+    assert (await client.get(path, params={"cursor": encode_cursor(-1)})).status_code == 400
+    assert (await client.get(path, params={"fields": "storage_path"})).status_code == 400
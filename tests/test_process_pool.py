@@ -0,0 +1,95 @@
+"""Worker pools that lose a process, and extraction limits that keep workers alive."""
+
+import asyncio
+import io
+import os
+import sys
+import time
+import zipfile
+import zlib
+import pytest
+from concurrent.futures.process import BrokenProcessPool
+from backend import extraction
+from backend.services.process_pool import WorkerPool
+
+
+def _die_once(marker: str) -> int:
+    """Kill the worker process the first time, as the OOM killer would."""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return os.getpid()
+
+
+def _die() -> None:
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool("test", max_workers=1)
+    yield pool
+    pool.shutdown()
+
+
+async def test_pool_is_replaced_after_a_worker_dies(pool, tmp_path):
+    pid = await pool.run(_die_once, str(tmp_path / "died"))
+    assert pid != os.getpid()
+    assert pool.restarts == 1
+    # The new pool keeps working
+    assert await pool.run(os.getpid) == pid
+
+
+async def test_call_that_kills_the_worker_twice_fails(pool):
+    with pytest.raises(BrokenProcessPool):
+        await pool.run(_die)
+    assert pool.restarts == 2
+    assert await pool.run(abs, -3) == 3
+
+
+async def test_shutdown_stops_a_busy_worker(pool):
+    call = asyncio.ensure_future(pool.run(time.sleep, 60))
+    while not pool.executor._processes or not pool.executor._pending_work_items:
+        await asyncio.sleep(0.01)
+    process = next(iter(pool.executor._processes.values()))
+    pool.shutdown()
+
+    await asyncio.to_thread(process.join, 10)
+    assert not process.is_alive()
+    with pytest.raises(BrokenProcessPool):
+        await call
+
+
+def test_pdf_streams_are_decompressed_up_to_a_limit(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pypdf", None)  # The fallback parser
+    monkeypatch.setattr(extraction, "PDF_MAX_DECOMPRESSED_BYTES", 1024 * 1024)
+    content = b"BT (All work and no play) Tj ET\n" * (2 * 1024 * 1024)  # 64 MiB, compresses to ~100 KiB
+    pdf = b"%PDF-1.4\n1 0 obj\n<< /Type /Page >>\nstream\n" + zlib.compress(content, 9) + b"\nendstream\n"
+    pdf += b"2 0 obj\nstream\n" + zlib.compress(b"BT (Never read) Tj ET", 9) + b"\nendstream\n"
+
+    text, pages = extraction.extract_pdf(pdf)
+    assert pages == 1
+    assert text.startswith("All work and no play")
+    assert len(text) < 1024 * 1024
+    assert "Never read" not in text
+
+
+def _docx(document: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def test_docx_text_is_decompressed_up_to_a_limit(monkeypatch):
+    monkeypatch.setattr(extraction, "DOCX_MAX_DECOMPRESSED_BYTES", 1024 * 1024)
+    paragraph = b"<w:p><w:r><w:t>All work and no play</w:t></w:r></w:p>"
+    document = b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>%s</w:body></w:document>'
+
+    text, _ = extraction.extract_docx(_docx(document % paragraph))
+    assert text == "All work and no play"
+
+    bomb = _docx(document % (paragraph * (1024 * 1024)))  # 53 MiB of XML, compresses to ~100 KiB
+    assert len(bomb) < 1024 * 1024
+    with pytest.raises(ValueError, match="larger than"):
+        extraction.extract_docx(bomb)
@@ -0,0 +1,95 @@
+"""Knowledge base search over the on-disk segment index."""
+
+import asyncio
+from backend.services.ingestion_service import ingestion_service
+from backend.services.search_service import search_service
+from .conftest import API
+
+
+async def _upload(client, business_id: str, filename: str, text: str) -> dict:
+    response = await client.post(
+        f"{API}/knowledge-base/upload/{business_id}", files={"files": (filename, text.encode())}
+    )
+    assert response.status_code == 200
+    return response.json()["files"][0]
+
+
+async def _search(client, business_id: str, query: str) -> list:
+    response = await client.get(f"{API}/knowledge-base/{business_id}/search", params={"q": query, "mode": "keyword"})
+    assert response.status_code == 200
+    return response.json()["results"]
+
+
+async def test_uploaded_files_are_searchable(client, business):
+    await _upload(client, business["id"], "hours.txt", "We are open Monday to Friday from nine to five.")
+    await _upload(client, business["id"], "parking.txt", "Free parking is available behind the building.")
+    await ingestion_service.wait_idle()
+
+    results = await _search(client, business["id"], "parking")
+    assert [result["filename"] for result in results] == ["parking.txt"]
+
+
+async def test_index_with_a_missing_segment_is_rebuilt(client, business):
+    await _upload(client, business["id"], "hours.txt", "We are open Monday to Friday from nine to five.")
+    await ingestion_service.wait_idle()
+    assert await _search(client, business["id"], "Monday")
+
+    # Lose the segment files but keep the manifest, as a partial restore from backup would
+    business_dir = search_service._get_business_dir(business["id"])
+    for path in business_dir.glob("*.seg"):
+        path.unlink()
+    search_service._indexes.pop(business["id"])
+
+    # Used to spin without yielding, freezing the event loop
+    results = await asyncio.wait_for(_search(client, business["id"], "Monday"), timeout=30)
+    assert [result["filename"] for result in results] == ["hours.txt"]
+    assert list(business_dir.glob("*.seg"))
+
+
+def _policy(changed_word: str = "thirty") -> str:
+    """A return policy of about a hundred words, one of which can be changed."""
+    words = (
+        "Customers may return any unused item within {} days of delivery for a full refund to the original "
+        "payment method. Items must be in their original packaging with all tags attached and a copy of the "
+        "receipt or order confirmation. Sale items and gift cards cannot be returned. To start a return, "
+        "contact our support team by phone or email with your order number, and we will send a prepaid "
+        "shipping label within one business day. Refunds are processed within five business days after the "
+        "returned item arrives at our warehouse and passes inspection by our staff."
+    )
+    return words.format(changed_word)
+
+
+async def _index_stats(client, business_id: str) -> dict:
+    response = await client.get(f"{API}/knowledge-base/{business_id}/index-stats")
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_near_duplicate_file_is_indexed_once_with_both_sources(client, business):
+    await _upload(client, business["id"], "returns-2023.txt", _policy("thirty"))
+    await ingestion_service.wait_idle()
+    await _upload(client, business["id"], "returns-2024.txt", _policy("sixty"))
+    await ingestion_service.wait_idle()
+
+    stats = await _index_stats(client, business["id"])
+    assert (stats["files"], stats["source_chunks"], stats["indexed_chunks"]) == (2, 2, 1)
+    assert stats["duplicate_chunks"] == 1 and stats["reduction"] == 0.5
+
+    results = await _search(client, business["id"], "prepaid shipping label")
+    assert len(results) == 1
+    assert sorted(source["filename"] for source in results[0]["sources"]) == ["returns-2023.txt", "returns-2024.txt"]
+
+
+async def test_distinct_file_is_indexed_separately(client, business):
+    await _upload(client, business["id"], "returns.txt", _policy())
+    await ingestion_service.wait_idle()
+    await _upload(client, business["id"], "parking.txt", "Free parking is available behind the building after six.")
+    await ingestion_service.wait_idle()
+
+    stats = await _index_stats(client, business["id"])
+    assert (stats["files"], stats["source_chunks"], stats["indexed_chunks"]) == (2, 2, 2)
+    assert stats["duplicate_chunks"] == 0 and stats["reduction"] == 0.0
+
+    results = await _search(client, business["id"], "parking")
+    assert [result["filename"] for result in results] == ["parking.txt"]
+    assert [source["filename"] for source in results[0]["sources"]] == ["parking.txt"]
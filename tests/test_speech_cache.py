@@ -0,0 +1,66 @@
+"""Cache of synthesized greetings and goodbyes."""
+
+from backend.services.speech_cache import SpeechCache
+from backend.voice_providers import encode_fake_speech
+
+CLIP_BYTES = len(encode_fake_speech("Hello"))  # Fake speech is the same length for every word
+
+
+async def _speak(cache: SpeechCache, text: str, voice: str = "rachel") -> bytes:
+    return b"".join([chunk async for chunk in cache.speech(text, voice)])
+
+
+async def test_repeated_phrase_is_a_hit():
+    cache = SpeechCache(max_bytes=10 * CLIP_BYTES)
+
+    first = await _speak(cache, "Hello")
+    assert cache.stats()["misses"] == 1 and cache.stats()["clips"] == 1
+    assert await _speak(cache, "Hello") == first == encode_fake_speech("Hello")
+    assert cache.stats()["hits"] == 1
+
+
+async def test_prepared_phrases_are_hits_on_the_first_call():
+    cache = SpeechCache(max_bytes=10 * CLIP_BYTES)
+    assistant = {"first_message": "Hello", "end_call_message": "Goodbye", "voice": "rachel"}
+
+    cache.prepare(assistant)
+    cache.prepare(assistant)  # Already synthesizing: not started twice
+    await cache.wait_idle()
+    assert cache.stats()["synthesized"] == 2
+
+    assert await _speak(cache, "Hello") == encode_fake_speech("Hello")
+    assert await _speak(cache, "Goodbye") == encode_fake_speech("Goodbye")
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 0
+
+
+async def test_other_voice_or_text_is_a_miss():
+    cache = SpeechCache(max_bytes=10 * CLIP_BYTES)
+    await _speak(cache, "Hello", "rachel")
+
+    assert cache.get("Hello", "adam") is None
+    assert cache.get("Hello!", "rachel") is None
+    await _speak(cache, "Hello", "adam")
+    await _speak(cache, "Hello!", "rachel")
+    assert cache.stats()["misses"] == 3 and cache.stats()["hits"] == 0
+    assert cache.stats()["clips"] == 3
+
+
+async def test_least_recently_played_clips_are_evicted_past_the_size_bound():
+    cache = SpeechCache(max_bytes=2 * CLIP_BYTES)
+    await _speak(cache, "Hello")
+    await _speak(cache, "Goodbye")
+    await _speak(cache, "Hello")  # Now the most recently played
+
+    await _speak(cache, "Welcome")
+    stats = cache.stats()
+    assert stats["clips"] == 2 and stats["evictions"] == 1
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert cache.get("Goodbye", "rachel") is None
+    assert cache.get("Hello", "rachel") is not None
+
+
+async def test_clip_larger_than_the_cache_is_not_kept():
+    cache = SpeechCache(max_bytes=CLIP_BYTES)
+
+    assert await _speak(cache, "Thanks for calling") == encode_fake_speech("Thanks for calling")
+    assert cache.stats()["clips"] == 0 and cache.stats()["bytes"] == 0
@@ -0,0 +1,76 @@
+"""SQLiteDB behavior with several writers sharing one database file."""
+
+import sqlite3
+import threading
+import time
+import warnings
+from datetime import datetime
+import pytest
+from backend.database import db
+from backend.sqlite_database import SQLiteDB
+from .conftest import API
+
+WRITERS = 4
+UPDATES = 200
+
+
+def test_concurrent_updates_keep_every_change(tmp_path):
+    path = str(tmp_path / "voice_ai.db")
+    business = SQLiteDB(path).create_business({"name": "Shared"})
+
+    def write(writer: int) -> None:
+        # Own connection, as in another worker process
+        db = SQLiteDB(path)
+        for number in range(1, UPDATES + 1):
+            db.update_business(business["id"], {f"field_{writer}": number})
+        db.close()
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = SQLiteDB(path).get_business(business["id"])
+    assert {f"field_{writer}": stored.get(f"field_{writer}") for writer in range(WRITERS)} == {
+        f"field_{writer}": UPDATES for writer in range(WRITERS)
+    }
+
+
+def test_writer_gives_up_after_the_busy_timeout(tmp_path):
+    path = str(tmp_path / "voice_ai.db")
+    business = SQLiteDB(path).create_business({"name": "Locked"})
+    holder = sqlite3.connect(path)
+    holder.execute("BEGIN IMMEDIATE")
+
+    db = SQLiteDB(path, busy_timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        db.update_business(business["id"], {"name": "Renamed"})
+    assert time.monotonic() - start < 2
+    # Readers are not blocked by the writer in WAL mode
+    assert db.get_business(business["id"])["name"] == "Locked"
+
+    holder.rollback()
+    assert db.update_business(business["id"], {"name": "Renamed"})["name"] == "Renamed"
+
+
+def test_timestamps_match_the_record_format(tmp_path):
+    db = SQLiteDB(str(tmp_path / "voice_ai.db"))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        business = db.create_business({"name": "Dated"})
+        updated = db.update_business(business["id"], {"name": "Redated"})
+
+    assert datetime.fromisoformat(updated["updated_at"]) >= datetime.fromisoformat(business["created_at"])
+    assert "+" not in business["created_at"]
+
+
+async def test_locked_database_is_a_retryable_error(client, business, monkeypatch):
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(db, "get_business", locked)
+    response = await client.get(f"{API}/business/{business['id']}")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
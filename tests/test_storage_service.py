@@ -0,0 +1,59 @@
+"""StorageService under concurrent uploads from several processes."""
+
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from starlette.datastructures import UploadFile
+
+PROCESSES = 4
+UPLOADS = 50
+
+
+def _content(worker: int, number: int) -> bytes:
+    # Every other upload has the same content in every worker, so blobs are shared too
+    if number % 2:
+        return f"shared upload {number}".encode() * 500
+    return f"worker {worker} upload {number}".encode() * 500
+
+
+def _upload_all(upload_dir: str, business_id: str, worker: int) -> list:
+    """Store UPLOADS files all named basics.pdf at once; returns (path, size, sha256) per upload."""
+    from backend.config import settings
+    from backend.services.storage_service import StorageService
+
+    settings.upload_dir = upload_dir
+    storage = StorageService()
+
+    async def upload(number: int):
+        content = _content(worker, number)
+        stored = await storage.save_upload(
+            business_id, UploadFile(io.BytesIO(content), size=len(content), filename="basics.pdf"), 10**6
+        )
+        return stored.path, stored.size, stored.sha256
+
+    async def upload_all():
+        return await asyncio.gather(*(upload(number) for number in range(UPLOADS)))
+
+    return asyncio.run(upload_all())
+
+
+def test_concurrent_uploads_of_the_same_name_are_all_kept(tmp_path):
+    business_id = "0" * 32
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(PROCESSES) as pool:
+        results = pool.starmap(_upload_all, [(str(tmp_path), business_id, worker) for worker in range(PROCESSES)])
+
+    stored = [entry for worker_results in results for entry in worker_results]
+    assert len({path for path, _, _ in stored}) == PROCESSES * UPLOADS
+    for worker, worker_results in enumerate(results):
+        for number, (path, size, sha256) in enumerate(worker_results):
+            with open(path, "rb") as f:
+                content = f.read()
+            assert content == _content(worker, number)
+            assert (size, sha256) == (len(content), hashlib.sha256(content).hexdigest())
+    assert len(os.listdir(tmp_path / business_id)) == PROCESSES * UPLOADS
+    # One blob per distinct content
+    blobs = [name for prefix in os.listdir(tmp_path / "blobs") for name in os.listdir(tmp_path / "blobs" / prefix)]
+    assert len(blobs) == PROCESSES * UPLOADS // 2 + UPLOADS // 2
@@ -0,0 +1,98 @@
+"""TwilioService against the local fake Twilio API."""
+
+import asyncio
+import time
+import pytest
+from backend.config import settings
+from backend.models.phone_number import PhoneNumberType
+from backend.routes import phone_numbers
+from backend.services.twilio_service import TwilioService
+from tools.fake_twilio import FakeTwilioServer
+from .conftest import API
+
+
+@pytest.fixture
+def twilio(monkeypatch):
+    """Build a TwilioService talking to a fake Twilio API with the given latency."""
+    servers = []
+
+    def build(latency_ms: float, **overrides) -> TwilioService:
+        server = FakeTwilioServer(latency_ms=latency_ms).start()
+        servers.append(server)
+        monkeypatch.setattr(settings, "twilio_account_sid", "AC" + "0" * 32)
+        monkeypatch.setattr(settings, "twilio_auth_token", "token")
+        monkeypatch.setattr(settings, "twilio_api_base_url", server.base_url)
+        for name, value in overrides.items():
+            monkeypatch.setattr(settings, name, value)
+        service = TwilioService()
+        assert service.is_configured
+        return service
+
+    yield build
+    for server in servers:
+        server.stop()
+
+
+async def test_requests_are_served_while_a_slow_twilio_call_is_in_flight(twilio, monkeypatch, client, business):
+    service = twilio(latency_ms=1000)
+    monkeypatch.setattr(phone_numbers, "twilio_service", service)
+
+    search = asyncio.ensure_future(client.get(f"{API}/phone-numbers/available", params={"area_code": "415"}))
+    await asyncio.sleep(0.1)  # The search is now waiting on Twilio
+
+    latencies = []
+    for _ in range(20):
+        start = time.perf_counter()
+        response = await client.get(f"{API}/business/{business['id']}")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    assert not search.done()
+    assert max(latencies) < 0.1
+
+    response = await search
+    assert response.status_code == 200
+    # Numbers from the fake API, not the mock fallback
+    assert all(number["phone_number"].startswith("+1415555") for number in response.json()["numbers"])
+
+
+async def test_time_queued_for_a_slot_is_not_counted_as_twilio_latency(twilio):
+    # One call at a time, each 150 ms: the last of four waits 450 ms for its slot
+    service = twilio(latency_ms=150, twilio_max_concurrency=1, twilio_breaker_slow_call_seconds=0.3)
+    await asyncio.gather(*(
+        service.search_available_numbers(area_code=area_code) for area_code in ("212", "213", "312", "415")
+    ))
+    status = service.get_circuit_status()
+    assert status["calls_in_window"] == 4
+    assert status["slow_call_rate"] == 0.0
+
+
+async def test_cancelled_calls_are_not_recorded_as_failures(twilio):
+    service = twilio(latency_ms=500)
+    fetch = asyncio.ensure_future(
+        service._fetch_available_numbers("US", "415", PhoneNumberType.LOCAL, None, 20)
+    )
+    await asyncio.sleep(0.1)
+    fetch.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await fetch
+    assert service.get_circuit_status()["calls_in_window"] == 0
+
+
+async def test_last_good_search_is_served_while_the_circuit_is_open(twilio):
+    # Every search refetches, so only the circuit breaker stands between it and Twilio
+    service = twilio(
+        latency_ms=0, twilio_search_cache_ttl_seconds=0, twilio_search_cache_stale_seconds=0, twilio_breaker_min_calls=2
+    )
+    fresh = await service.search_available_numbers(area_code="415")
+    assert fresh
+
+    service._breaker.record_failure()
+    service._breaker.record_failure()
+    assert service.get_circuit_status()["state"] == "open"
+
+    assert await service.search_available_numbers(area_code="415") == fresh
+    assert service.get_circuit_status()["rejected_calls"] == 1
+    # A search never answered by Twilio gets mock numbers instead
+    mock = await service.search_available_numbers(area_code="212")
+    assert mock and all(number.phone_number.startswith("+1212") for number in mock)
+    assert service.get_circuit_status()["rejected_calls"] == 2
@@ -0,0 +1,85 @@
+"""Memory use of the upload endpoint, measured on a real server process."""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from .conftest import API
+
+FILE_SIZE = 50 * 1024 * 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss(pid: int) -> int:
+    """Peak resident set size of a process, in bytes."""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("VmHWM not reported")
+
+
+@pytest.fixture
+def server(tmp_path):
+    """A uvicorn server in its own process; yields (process, base URL)."""
+    port = _free_port()
+    env = dict(os.environ, UPLOAD_DIR=str(tmp_path / "uploads"), DATABASE_BACKEND="memory")
+    env.pop("JOURNAL_DIR", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f"{base_url}/health").raise_for_status()
+                break
+            except httpx.TransportError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Server did not start")
+                time.sleep(0.1)
+        yield process, base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc")
+def test_peak_rss_does_not_grow_with_upload_size(server, tmp_path):
+    process, base_url = server
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        business_id = client.post(f"{API}/business", json={"name": "Uploads"}).json()["id"]
+
+        def upload(path):
+            with open(path, "rb") as f:
+                response = client.post(f"{API}/knowledge-base/upload/{business_id}", files={"files": (path.name, f)})
+            assert response.status_code == 200
+            return response.json()["files"][0]
+
+        # Warm up: imports and buffers a first upload allocates
+        small = tmp_path / "small.txt"
+        small.write_bytes(os.urandom(2 * 1024 * 1024))
+        upload(small)
+        baseline = _peak_rss(process.pid)
+
+        large = tmp_path / "large.txt"
+        with open(large, "wb") as f:
+            for _ in range(FILE_SIZE // (1024 * 1024)):
+                f.write(os.urandom(1024 * 1024))
+        stored = upload(large)
+        growth = _peak_rss(process.pid) - baseline
+
+    assert stored["file_size"] == FILE_SIZE
+    assert growth < FILE_SIZE / 4, f"peak RSS grew by {growth / 2**20:.1f} MiB"
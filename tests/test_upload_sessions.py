@@ -0,0 +1,157 @@
+"""Resumable upload sessions: resending, ordering and completion."""
+
+import asyncio
+import fcntl
+import hashlib
+import os
+import random
+import time
+import pytest
+from backend.services.upload_sessions import upload_session_service
+from .conftest import API
+
+CHUNK_SIZE = 256 * 1024  # The smallest allowed
+
+
+@pytest.fixture
+def content():
+    return random.Random(17).randbytes(10 * CHUNK_SIZE + 1234)
+
+
+@pytest.fixture
+async def session(client, business, content):
+    response = await client.post(
+        f"{API}/knowledge-base/upload-sessions/{business['id']}",
+        json={"filename": "manual.txt", "file_size": len(content), "chunk_size": CHUNK_SIZE},
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+def _chunk(content: bytes, index: int) -> bytes:
+    return content[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+
+
+def _url(session: dict) -> str:
+    return f"{API}/knowledge-base/upload-sessions/{session['business_id']}/{session['upload_id']}"
+
+
+async def _put(client, session, index, data):
+    return await client.put(f"{_url(session)}/chunks/{index}", content=data)
+
+
+async def _download(client, record: dict) -> bytes:
+    response = await client.get(f"{API}/knowledge-base/{record['business_id']}/{record['id']}/content")
+    assert response.status_code == 200
+    return response.content
+
+
+async def test_truncated_chunk_can_be_sent_again(client, session, content):
+    for index in range(session["total_chunks"]):
+        if index != 3:
+            assert (await _put(client, session, index, _chunk(content, index))).status_code == 200
+    # Cut off: rejected and not counted as received
+    response = await _put(client, session, 3, _chunk(content, 3)[:1000])
+    assert response.status_code == 400
+    status = (await client.get(_url(session))).json()
+    assert status["missing_chunks"] == [3]
+    assert status["offset"] == 3 * CHUNK_SIZE
+
+    response = await _put(client, session, 3, _chunk(content, 3))
+    assert response.json()["missing_chunks"] == []
+    response = await client.post(f"{_url(session)}/complete")
+    assert response.status_code == 200
+    assert await _download(client, response.json()) == content
+
+
+async def test_chunks_sent_out_of_order_in_parallel(client, session, content):
+    indexes = list(range(session["total_chunks"]))
+    random.Random(3).shuffle(indexes)
+    responses = await asyncio.gather(*(_put(client, session, index, _chunk(content, index)) for index in indexes))
+    assert all(response.status_code == 200 for response in responses)
+
+    response = await client.post(f"{_url(session)}/complete")
+    assert response.status_code == 200
+    record = response.json()
+    assert record["file_size"] == len(content)
+    assert await _download(client, record) == content
+
+
+async def test_early_complete_is_a_conflict(client, session, content):
+    for index in (0, 1, 5):
+        await _put(client, session, index, _chunk(content, index))
+    response = await client.post(f"{_url(session)}/complete")
+    assert response.status_code == 409
+    assert "[2, 3, 4, 6, 7, 8, 9, 10]" in response.json()["detail"]
+    # The session is still there to be finished
+    assert (await client.get(_url(session))).json()["received_chunks"] == [0, 1, 5]
+
+
+async def test_session_is_completed_once(client, session, content, business):
+    for index in range(session["total_chunks"]):
+        await _put(client, session, index, _chunk(content, index))
+    responses = await asyncio.gather(*(client.post(f"{_url(session)}/complete") for _ in range(3)))
+
+    assert sorted(response.status_code for response in responses) == [200, 404, 404]
+    files = (await client.get(f"{API}/knowledge-base/{business['id']}")).json()
+    assert len(files) == 1
+    assert (await client.get(_url(session))).status_code == 404
+    assert (await _put(client, session, 0, _chunk(content, 0))).status_code == 404
+
+
+async def test_completion_waits_for_a_chunk_being_written(client, session, content):
+    for index in range(session["total_chunks"]):
+        await _put(client, session, index, _chunk(content, index))
+    status = upload_session_service.get_session(session["business_id"], session["upload_id"])
+
+    # A resent chunk 0 whose body arrives slowly, with different bytes
+    resent = bytes(len(_chunk(content, 0)))
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def body():
+        yield resent[:1000]
+        started.set()
+        await release.wait()
+        yield resent[1000:]
+
+    writer = asyncio.ensure_future(upload_session_service.write_chunk(status, 0, body()))
+    await started.wait()
+    completion = asyncio.ensure_future(upload_session_service.complete_session(status))
+    await asyncio.sleep(0.1)
+    assert not completion.done()
+
+    release.set()
+    with pytest.raises(FileNotFoundError):
+        await writer  # The session is gone by the time it would be marked received
+    stored = await completion
+    # The chunk was written before the file was hashed and linked, never after
+    with open(stored.path, "rb") as f:
+        data = f.read()
+    assert data == resent + content[CHUNK_SIZE:]
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+
+
+async def test_chunks_cannot_be_written_to_a_session_being_completed(session, content):
+    status = upload_session_service.get_session(session["business_id"], session["upload_id"])
+    path = upload_session_service.session_dir / session["upload_id"]
+    fd = os.open(path / "data", os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)  # As held by complete_session
+
+        async def body():
+            yield _chunk(content, 0)
+
+        with pytest.raises(FileNotFoundError):
+            await upload_session_service.write_chunk(status, 0, body())
+    finally:
+        os.close(fd)
+
+
+async def test_sessions_being_completed_do_not_expire(session):
+    claimed = upload_session_service.session_dir / f".{session['upload_id']}.completing"
+    os.rename(upload_session_service.session_dir / session["upload_id"], claimed)
+    long_ago = time.time() - 365 * 24 * 3600
+    os.utime(claimed, (long_ago, long_ago))
+
+    upload_session_service._expire_sessions()
+    assert claimed.exists()
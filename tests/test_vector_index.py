@@ -0,0 +1,95 @@
+"""Exact and IVF search of the vector index."""
+
+import numpy as np
+import pytest
+from backend.vector_index import VectorIndex
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _clustered(count: int, queries: int, dim: int = 64, seed: int = 0) -> tuple:
+    """Vectors and queries around shared centers, like embeddings of related chunks."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((100, dim))
+    vectors = centers[rng.integers(0, 100, count)] + 1.6 * rng.standard_normal((count, dim))
+    queries = centers[rng.integers(0, 100, queries)] + 1.6 * rng.standard_normal((queries, dim))
+    return _unit(vectors), _unit(queries)
+
+
+def _trained(vectors: np.ndarray) -> VectorIndex:
+    index = VectorIndex.from_arrays(vectors, np.ones(len(vectors), dtype=bool))
+    index.centroids, index.assignments, _ = index.fit()
+    return index
+
+
+def _recall(approximate: list, exact: list, k: int) -> float:
+    return float(np.mean([len(set(a[0]) & set(e[0])) / k for a, e in zip(approximate, exact)]))
+
+
+def test_exact_search_matches_brute_force():
+    vectors, queries = _clustered(2000, 20)
+    index = VectorIndex.from_arrays(vectors, np.ones(len(vectors), dtype=bool))
+
+    for (rows, scores), query in zip(index.search(queries, 10), queries):
+        expected = np.argsort(-(vectors @ query))[:10]
+        assert list(rows) == list(expected)
+        assert np.allclose(scores, vectors[expected] @ query)
+
+
+def test_ivf_recall_against_brute_force():
+    vectors, queries = _clustered(5000, 100)
+    index = _trained(vectors)
+    exact = index.search(queries, 10)
+    n_lists = len(index.centroids)
+
+    recalls = [_recall(index.search(queries, 10, nprobe), exact, 10) for nprobe in (1, 8, 16)]
+    assert recalls == sorted(recalls)
+    assert recalls[-1] >= 0.8
+    # Probing every list is exhaustive
+    assert _recall(index.search(queries, 10, n_lists), exact, 10) == 1.0
+    assert _recall(index.search(queries, 10, n_lists * 2), exact, 10) == 1.0
+
+
+def test_ivf_search_skips_removed_rows():
+    vectors, queries = _clustered(1000, 10)
+    index = _trained(vectors)
+    removed = [int(rows[0]) for rows, _ in index.search(queries, 1)]
+    index.remove(removed)
+
+    for exact, approximate in zip(index.search(queries, 10), index.search(queries, 10, len(index.centroids))):
+        assert not set(removed) & set(exact[0])
+        assert list(approximate[0]) == list(exact[0])
+
+    index.restore(removed)
+    assert [int(rows[0]) for rows, _ in index.search(queries, 1, len(index.centroids))] == removed
+
+
+def test_empty_index_returns_no_results():
+    index = VectorIndex(8)
+    queries = _unit(np.ones((2, 8)))
+
+    for rows, scores in index.search(queries, 5) + index.search(queries, 5, nprobe=4):
+        assert len(rows) == 0 and len(scores) == 0
+
+
+@pytest.mark.parametrize("nprobe", [None, 1, 10])
+def test_small_corpus_returns_every_live_vector(nprobe):
+    vectors, queries = _clustered(3, 1, dim=8)
+    index = _trained(vectors)
+    assert len(index.centroids) == 1
+    index.remove([1])
+
+    (rows, scores), = index.search(queries, 10, nprobe)
+    assert sorted(rows) == [0, 2]
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_single_vector_can_be_trained_and_found():
+    vectors = _unit(np.arange(1, 9, dtype=np.float64)[np.newaxis])
+    index = _trained(vectors)
+
+    (rows, scores), = index.search(vectors, 5, nprobe=1)
+    assert list(rows) == [0]
+    assert scores[0] == pytest.approx(1.0)
@@ -0,0 +1 @@
+"""Development tools: local fakes and load generators for the backend."""
@@ -0,0 +1,324 @@
+"""Simulated Twilio calls against the call engine, for load testing in one process.
+
+Each simulated call goes the way of a real one: the voice webhook is
+posted for the dialed number, the `<Connect><Stream>` TwiML it returns is
+followed, and the media stream is opened to the app over an in-memory
+ASGI websocket. The simulated Twilio side then behaves like Twilio does:
+
+- Every call sends a 20 ms μ-law frame every 20 ms: the caller's speech
+  while they talk, silence otherwise.
+- Audio from the assistant is "played" in real time. Marks are echoed
+  once the audio sent before them has played, and `clear` drops what is
+  still buffered.
+
+Callers speak fake speech (see `backend.voice_providers`), so the fake
+providers can transcribe it and callers can check that each reply answers
+what they said. Latencies are measured from the caller's side, next to the
+metrics the call engine records itself. The businesses are created in
+the configured database, so run it against the default in-memory one:
+
+    python -m tools.call_simulator --calls 300 --turns 3
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+import uuid
+import xml.etree.ElementTree as ElementTree
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from urllib.parse import urlparse
+import httpx
+from backend.audio import FRAME_MS, SILENT_FRAME, duration, frames
+from backend.main import app
+from backend.services.call_service import call_service
+from backend.services.speech_cache import speech_cache
+from backend.voice_providers import decode_fake_speech, encode_fake_speech
+
+SILENT_PAYLOAD = base64.b64encode(SILENT_FRAME).decode()
+MEDIA_MESSAGE = (
+    '{"event": "media", "sequenceNumber": "%d", '
+    '"media": {"track": "inbound", "chunk": "%d", "timestamp": "%d", "payload": "%s"}, "streamSid": "%s"}'
+)
+
+UTTERANCES = [
+    "What time do you open on Saturday",
+    "I would like to book a table for four",
+    "Do you have parking near the entrance",
+    "Can I change my appointment to Tuesday",
+    "How much is the monthly plan",
+    "Is the order ready for pickup",
+]
+
+
+def _percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return f"p50 {percentile(0.5):7.1f} ms   p95 {percentile(0.95):7.1f} ms   p99 {percentile(0.99):7.1f} ms   n={len(ordered)}"
+
+
+class SimulatedCall:
+    """Twilio's side of one call's media stream, and the caller on it."""
+    
+    def __init__(self, simulator: "CallSimulator", number: str, turns: int, rng: random.Random):
+        self.simulator = simulator
+        self.number = number
+        self.turns = turns
+        self.rng = rng
+        self.call_sid = "CA" + uuid.uuid4().hex
+        self.stream_sid = "MZ" + uuid.uuid4().hex
+        self.sequence = 0
+        self.chunk = 0
+        self.inbound: asyncio.Queue = asyncio.Queue()  # ASGI messages to the app
+        self.speech: Deque[bytes] = deque()  # Caller frames still to send
+        self.speaking = False
+        self.speech_ended_at = 0.0
+        self.audio = bytearray()  # Everything the assistant said
+        self.played_until = 0.0  # Loop time when the audio buffered so far has played
+        self.pending_marks: Dict[str, asyncio.TimerHandle] = {}
+        self.played: asyncio.Queue = asyncio.Queue()  # Names of echoed marks
+        self.first_audio: Optional[asyncio.Future] = None
+        self.closed = asyncio.Event()
+        self.errors: List[str] = []
+    
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+    
+    def _send_event(self, event: str, **fields) -> None:
+        self.sequence += 1
+        message = {"event": event, "sequenceNumber": str(self.sequence), **fields}
+        if event != "connected":
+            message["streamSid"] = self.stream_sid
+        self.inbound.put_nowait({"type": "websocket.receive", "text": json.dumps(message)})
+    
+    def send_frame(self) -> None:
+        """Send the next 20 ms of inbound audio; called by the simulator's clock."""
+        if self.speech:
+            frame = self.speech.popleft()
+            if not self.speech:
+                self.speech_ended_at = self.loop.time()
+                self.speaking = False
+        else:
+            frame = SILENT_FRAME
+        self.chunk += 1
+        self.sequence += 1
+        payload = SILENT_PAYLOAD if frame is SILENT_FRAME else base64.b64encode(frame).decode()
+        # Formatted directly: hundreds of calls send 50 frames a second each, and the simulator should not be the bottleneck
+        self.inbound.put_nowait({"type": "websocket.receive", "text": MEDIA_MESSAGE % (
+            self.sequence, self.chunk, self.chunk * FRAME_MS, payload, self.stream_sid
+        )})
+    
+    async def _receive(self) -> dict:
+        return await self.inbound.get()
+    
+    async def _send(self, message: dict) -> None:
+        if message["type"] == "websocket.send":
+            self._on_message(json.loads(message["text"]))
+        elif message["type"] == "websocket.close":
+            self.closed.set()
+    
+    def _on_message(self, message: dict) -> None:
+        event = message["event"]
+        now = self.loop.time()
+        if event == "media":
+            audio = base64.b64decode(message["media"]["payload"])
+            if self.first_audio is not None and not self.first_audio.done():
+                self.first_audio.set_result(now)
+            self.audio += audio
+            self.played_until = max(self.played_until, now) + duration(len(audio))
+        elif event == "mark":
+            name = message["mark"]["name"]
+            self.pending_marks[name] = self.loop.call_later(max(0.0, self.played_until - now), self._echo_mark, name)
+        elif event == "clear":
+            self.played_until = now
+            for name in list(self.pending_marks):
+                self.pending_marks[name].cancel()
+                self._echo_mark(name)
+    
+    def _echo_mark(self, name: str) -> None:
+        if self.pending_marks.pop(name, None) is None:
+            return
+        self._send_event("mark", mark={"name": name})
+        self.played.put_nowait(name)
+    
+    async def _answer(self) -> tuple:
+        """Post the voice webhook, returning the stream path and parameters from the TwiML."""
+        response = await self.simulator.client.post(
+            "/api/v1/calls/twilio/voice",
+            data={"CallSid": self.call_sid, "To": self.number, "From": "+15550009999", "Direction": "inbound"},
+        )
+        stream = ElementTree.fromstring(response.text).find("Connect/Stream")
+        if stream is None:
+            raise RuntimeError(f"Call to {self.number} was not connected: {response.text}")
+        parameters = {parameter.get("name"): parameter.get("value") for parameter in stream.findall("Parameter")}
+        return urlparse(stream.get("url")).path, parameters
+    
+    async def run(self) -> None:
+        """Place the call, hold a conversation and hang up."""
+        stats = self.simulator.caller_stats
+        path, parameters = await self._answer()
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 0),
+            "root_path": "",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": [(b"host", b"testserver")],
+            "subprotocols": [],
+        }
+        self.inbound.put_nowait({"type": "websocket.connect"})
+        stream = asyncio.ensure_future(app(scope, self._receive, self._send))
+        try:
+            self._send_event("connected", protocol="Call", version="1.0.0")
+            started_at = self.loop.time()
+            self.first_audio = self.loop.create_future()
+            self._send_event("start", start={
+                "streamSid": self.stream_sid,
+                "callSid": self.call_sid,
+                "tracks": ["inbound"],
+                "customParameters": parameters,
+                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+            })
+            self.simulator.active.add(self)
+            stats["time_to_first_audio"].append(await self.first_audio - started_at)
+            await self.played.get()  # Greeting
+            
+            for _ in range(self.turns):
+                await asyncio.sleep(self.rng.uniform(0.2, 1.0))
+                utterance = self.rng.choice(UTTERANCES)
+                heard_from = len(self.audio)
+                self.first_audio = self.loop.create_future()
+                self.speech.extend(frames(encode_fake_speech(utterance)))
+                self.speaking = True
+                first_audio_at = await self.first_audio
+                stats["turn_latency"].append(first_audio_at - self.speech_ended_at)
+                await self.played.get()
+                reply = decode_fake_speech(bytes(self.audio[heard_from:]))
+                if utterance not in reply:
+                    self.errors.append(f"Said {utterance!r}, heard back {reply!r}")
+        finally:
+            self.simulator.active.discard(self)
+            self._send_event("stop", stop={"callSid": self.call_sid})
+            self.inbound.put_nowait({"type": "websocket.disconnect", "code": 1000})
+            await stream
+
+
+class CallSimulator:
+    """Places simulated calls to the assistants of simulated businesses."""
+    
+    def __init__(self, businesses: int, seed: int = 0):
+        self.businesses = businesses
+        self.rng = random.Random(seed)
+        self.numbers: List[str] = []
+        self.active: set = set()
+        self.caller_stats: Dict[str, List[float]] = {"time_to_first_audio": [], "turn_latency": []}
+        self.clock_lag: List[float] = []
+        self.peak_active = 0
+        self.client = None
+    
+    async def setup(self) -> None:
+        """Create the businesses, each with a number and an assistant answering it."""
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+        for number in range(self.businesses):
+            business = (await self.client.post("/api/v1/business", json={"name": f"Business {number}"})).json()
+            phone = (await self.client.post(
+                f"/api/v1/phone-numbers/purchase/{business['id']}", json={"phone_number": f"+1555{number:07d}"}
+            )).json()
+            await self.client.post(f"/api/v1/voice-assistant/{business['id']}", json={
+                "name": "Receptionist",
+                "first_message": f"Thank you for calling Business {number}. How can I help you today?",
+                "system_prompt": "You are a friendly receptionist.",
+                "model_provider": "openai",
+                "model_name": "gpt-4o",
+                "voice": "rachel",
+                "end_call_message": "Thank you for calling. Goodbye!",
+                "max_call_duration_seconds": 600,
+                "phone_number_id": phone["id"],
+            })
+            self.numbers.append(phone["phone_number"])
+        # Greetings and goodbyes are synthesized once assistants are created, before calls come in
+        await speech_cache.wait_idle()
+    
+    async def _clock(self) -> None:
+        """Send every call's next inbound frame every 20 ms, as Twilio streams audio in real time."""
+        loop = asyncio.get_running_loop()
+        interval = FRAME_MS / 1000
+        tick = loop.time()
+        while True:
+            tick += interval
+            await asyncio.sleep(max(0.0, tick - loop.time()))
+            self.clock_lag.append(max(0.0, loop.time() - tick))
+            self.peak_active = max(self.peak_active, len(self.active))
+            for call in list(self.active):
+                call.send_frame()
+    
+    async def run(self, calls: int, turns: int, ramp_seconds: float) -> List[SimulatedCall]:
+        """Place calls, spread over the ramp-up time, and wait for all of them to end."""
+        clock = asyncio.ensure_future(self._clock())
+        simulated = []
+        tasks = []
+        try:
+            for number in range(calls):
+                call = SimulatedCall(self, self.numbers[number % len(self.numbers)], turns, random.Random(self.rng.random()))
+                simulated.append(call)
+                tasks.append(asyncio.ensure_future(call.run()))
+                await asyncio.sleep(ramp_seconds / calls)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            clock.cancel()
+        for call, result in zip(simulated, results):
+            if isinstance(result, BaseException):
+                call.errors.append(repr(result))
+        return simulated
+
+
+async def simulate(calls: int, turns: int, businesses: int, ramp_seconds: float, seed: int) -> None:
+    simulator = CallSimulator(businesses, seed)
+    await simulator.setup()
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    simulated = await simulator.run(calls, turns, ramp_seconds)
+    cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    await simulator.client.aclose()
+
+    errors = [error for call in simulated for error in call.errors]
+    stats = call_service.get_stats()
+    print(f"{calls} calls of {turns} turns to {businesses} businesses in {wall:.1f} s, CPU {cpu / wall:.0%} of one core")
+    print(f"Peak concurrent calls: {simulator.peak_active}, failed calls: {len(errors)}")
+    for error in errors[:5]:
+        print(f"  {error}")
+    print("Caller side:")
+    for metric, samples in simulator.caller_stats.items():
+        print(f"  {metric:22} {_percentiles(samples)}")
+    print(f"  {'20 ms clock lag':22} {_percentiles(simulator.clock_lag)}")
+    print("Call engine:")
+    for metric, summary in stats["latency"].items():
+        print(f"  {metric:22} p50 {summary['p50_ms']:7.1f} ms   p95 {summary['p95_ms']:7.1f} ms   "
+              f"p99 {summary['p99_ms']:7.1f} ms   n={summary['count']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run simulated concurrent calls against the call engine.")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=2, help="Caller utterances per call")
+    parser.add_argument("--businesses", type=int, default=50)
+    parser.add_argument("--ramp-seconds", type=float, default=2.0, help="Time over which calls are placed")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(simulate(args.calls, args.turns, args.businesses, args.ramp_seconds, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Local stand-in for the Twilio REST API, for load testing without network access.
+
+Implements the endpoints TwilioService uses:
+
+- GET    /2010-04-01/Accounts/{sid}.json
+- GET    /2010-04-01/Accounts/{sid}/AvailablePhoneNumbers/{country}/{Local|TollFree|Mobile}.json
+- POST   /2010-04-01/Accounts/{sid}/IncomingPhoneNumbers.json
+- DELETE /2010-04-01/Accounts/{sid}/IncomingPhoneNumbers/{PN sid}.json
+
+The inventory is deterministic, and latency, error rate and rate limiting
+can be configured. Point the backend at it with
+`TWILIO_API_BASE_URL=http://127.0.0.1:<port>` and any account SID/token.
+
+Run in-process with `FakeTwilioServer(...).start()`, or as a subprocess:
+
+    python -m tools.fake_twilio --port 8765 --latency-ms 80 --error-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+AREA_CODES = {
+    "212": ("New York", "NY"),
+    "213": ("Los Angeles", "CA"),
+    "312": ("Chicago", "IL"),
+    "415": ("San Francisco", "CA"),
+    "512": ("Austin", "TX"),
+    "615": ("Nashville", "TN"),
+    "617": ("Boston", "MA"),
+    "702": ("Las Vegas", "NV"),
+    "786": ("Miami", "FL"),
+    "206": ("Seattle", "WA"),
+}
+TOLL_FREE_PREFIXES = ["800", "833", "844", "855", "866", "877", "888"]
+
+ACCOUNT_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)\.json$")
+AVAILABLE_PATH = re.compile(
+    r"^/2010-04-01/Accounts/(?P<account>[^/]+)/AvailablePhoneNumbers/(?P<country>[A-Z]{2})/(?P<kind>Local|TollFree|Mobile)\.json$"
+)
+INCOMING_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/IncomingPhoneNumbers\.json$")
+INCOMING_ITEM_PATH = re.compile(r"^/2010-04-01/Accounts/(?P<account>[^/]+)/IncomingPhoneNumbers/(?P<sid>PN[0-9a-f]+)\.json$")
+
+
+class FakeTwilioServer:
+    """In-memory fake of the Twilio numbers API served over HTTP/1.1 keep-alive."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        numbers_per_area_code: int = 200,
+        latency_ms: float = 0.0,
+        latency_sigma: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_per_second: Optional[float] = None,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_per_second = rate_limit_per_second
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # kind -> ordered {phone_number: (locality, region)}
+        self.inventory: Dict[str, Dict[str, tuple]] = {"Local": {}, "Mobile": {}, "TollFree": {}}
+        for area_code, location in AREA_CODES.items():
+            for i in range(numbers_per_area_code):
+                self.inventory["Local"][f"+1{area_code}555{i:04d}"] = location
+                self.inventory["Mobile"][f"+1{area_code}556{i:04d}"] = location
+        for prefix in TOLL_FREE_PREFIXES:
+            for i in range(numbers_per_area_code):
+                self.inventory["TollFree"][f"+1{prefix}555{i:04d}"] = (None, None)
+        self.owned: Dict[str, dict] = {}  # sid -> incoming phone number
+
+        self._tokens = rate_limit_per_second or 0.0
+        self._last_refill = time.monotonic()
+        self.stats = {"requests": 0, "connections": 0, "errors": 0, "rate_limited": 0}
+
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTwilioServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-twilio", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve in the current thread."""
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    # Fault injection
+    def _sample_latency(self) -> float:
+        """Sample a response delay in seconds (lognormal around `latency_ms`)."""
+        if self.latency_ms <= 0:
+            return 0.0
+        with self._lock:
+            factor = self._random.lognormvariate(0.0, self.latency_sigma) if self.latency_sigma else 1.0
+        return self.latency_ms * factor / 1000
+
+    def _rate_limited(self) -> bool:
+        """Token bucket check; True if the request should get a 429."""
+        if not self.rate_limit_per_second:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate_limit_per_second,
+                self._tokens + (now - self._last_refill) * self.rate_limit_per_second,
+            )
+            self._last_refill = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def _should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    # API
+    def account(self, account_sid: str) -> dict:
+        return {
+            "sid": account_sid,
+            "friendly_name": "Fake Twilio Account",
+            "status": "active",
+            "type": "Full",
+            "uri": f"/2010-04-01/Accounts/{account_sid}.json",
+        }
+
+    def available(self, kind: str, country: str, query: dict) -> dict:
+        area_code = query.get("AreaCode")
+        contains = query.get("Contains")
+        page_size = int(query.get("PageSize", 50))
+        results = []
+        with self._lock:
+            for number, (locality, region) in self.inventory[kind].items():
+                if area_code and number[2:5] != area_code:
+                    continue
+                if contains and contains not in number:
+                    continue
+                results.append({
+                    "friendly_name": f"({number[2:5]}) {number[5:8]}-{number[8:]}",
+                    "phone_number": number,
+                    "locality": locality,
+                    "region": region,
+                    "iso_country": country,
+                    "capabilities": {"voice": True, "SMS": kind != "TollFree", "MMS": False, "fax": False},
+                    "beta": False,
+                })
+                if len(results) >= page_size:
+                    break
+        return {"available_phone_numbers": results, "uri": "", "end": len(results) - 1, "next_page_uri": None}
+
+    def purchase(self, account_sid: str, form: dict) -> Optional[dict]:
+        phone_number = form.get("PhoneNumber")
+        with self._lock:
+            for numbers in self.inventory.values():
+                if phone_number in numbers:
+                    numbers.pop(phone_number)
+                    break
+            else:
+                return None
+            sid = "PN" + uuid.uuid4().hex
+            record = {
+                "sid": sid,
+                "account_sid": account_sid,
+                "phone_number": phone_number,
+                "friendly_name": form.get("FriendlyName") or phone_number,
+                "status": "in-use",
+                "uri": f"/2010-04-01/Accounts/{account_sid}/IncomingPhoneNumbers/{sid}.json",
+            }
+            self.owned[sid] = record
+            return record
+
+    def release(self, sid: str) -> bool:
+        with self._lock:
+            record = self.owned.pop(sid, None)
+            if record is None:
+                return False
+            number = record["phone_number"]
+            kind = "TollFree" if number[2:5] in TOLL_FREE_PREFIXES else "Local"
+            self.inventory[kind][number] = AREA_CODES.get(number[2:5], (None, None))
+            return True
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.stats["connections"] += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status_code: int, payload: Optional[dict] = None):
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status_code: int, code: int, message: str):
+                self._send(status_code, {
+                    "code": code,
+                    "message": message,
+                    "more_info": f"https://www.twilio.com/docs/errors/{code}",
+                    "status": status_code,
+                })
+
+            def _handle(self, method: str):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length).decode() if length else ""
+                with server._lock:
+                    server.stats["requests"] += 1
+
+                if url.path == "/_fake/stats":
+                    return self._send(200, server.stats)
+
+                delay = server._sample_latency()
+                if delay:
+                    time.sleep(delay)
+                if server._rate_limited():
+                    with server._lock:
+                        server.stats["rate_limited"] += 1
+                    return self._error(429, 20429, "Too Many Requests")
+                if server._should_fail():
+                    with server._lock:
+                        server.stats["errors"] += 1
+                    return self._error(500, 20500, "Internal Server Error")
+
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if method == "GET" and (m := ACCOUNT_PATH.match(url.path)):
+                    return self._send(200, server.account(m["account"]))
+                if method == "GET" and (m := AVAILABLE_PATH.match(url.path)):
+                    return self._send(200, server.available(m["kind"], m["country"], query))
+                if method == "POST" and (m := INCOMING_PATH.match(url.path)):
+                    form = {k: v[0] for k, v in parse_qs(raw_body).items()}
+                    record = server.purchase(m["account"], form)
+                    if record is None:
+                        return self._error(400, 21422, f"PhoneNumber {form.get('PhoneNumber')} is not available")
+                    return self._send(201, record)
+                if method == "DELETE" and (m := INCOMING_ITEM_PATH.match(url.path)):
+                    if server.release(m["sid"]):
+                        return self._send(204)
+                    return self._error(404, 20404, "The requested resource was not found")
+                return self._error(404, 20404, "The requested resource was not found")
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Twilio REST API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--numbers-per-area-code", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Median response delay")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="Lognormal spread of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeTwilioServer(
+        host=args.host,
+        port=args.port,
+        numbers_per_area_code=args.numbers_per_area_code,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_per_second=args.rate_limit,
+        seed=args.seed,
+    )
+    print(f"Fake Twilio API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()